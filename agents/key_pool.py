@@ -0,0 +1,242 @@
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import groq
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from langchain_groq import ChatGroq
+from pydantic import ConfigDict, PrivateAttr
+
+
+def load_groq_api_keys() -> List[str]:
+    """GROQ_API_KEY and GROQ_API_KEY1..GROQ_API_KEY10, skipping unset ones."""
+    names = ["GROQ_API_KEY"] + [f"GROQ_API_KEY{i}" for i in range(1, 11)]
+    keys = [os.getenv(name) for name in names]
+    keys = [key for key in keys if key]
+    if not keys:
+        raise ValueError("No valid API keys available.")
+    return keys
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Groq reset headers look like '2m59.56s', '7.66s' or '120ms'."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers[name]) if name in headers else None
+    except ValueError:
+        return None
+
+
+class _KeyState:
+    def __init__(self, key: str):
+        self.key = key
+        self.label = f"...{key[-4:]}"
+        self.limit_requests = None
+        self.remaining_requests = None
+        self.requests_reset_at = 0.0
+        self.limit_tokens = None
+        self.remaining_tokens = None
+        self.tokens_reset_at = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_429 = 0
+        self.inflight = 0
+        self.requests = 0
+        self.rate_limited = 0
+
+    def headroom(self, now: float) -> float:
+        """Fraction of the request and token budgets left (the smaller of the two), minus in-flight calls."""
+        fractions = []
+        if self.limit_requests and self.remaining_requests is not None and now < self.requests_reset_at:
+            fractions.append(self.remaining_requests / self.limit_requests)
+        if self.limit_tokens and self.remaining_tokens is not None and now < self.tokens_reset_at:
+            fractions.append(self.remaining_tokens / self.limit_tokens)
+        headroom = min(fractions) if fractions else 1.0
+        per_call = 1.0 / self.limit_requests if self.limit_requests else 0.05
+        return headroom - self.inflight * per_call
+
+
+class GroqKeyPool:
+    """
+    Process-wide pool of Groq API keys. Request and token budgets are read from the x-ratelimit-*
+    headers of every response; each LLM call goes to the key with the most headroom. A key that
+    returns 429 is cooled down for its retry-after (or an exponential backoff) and skipped meanwhile.
+    """
+
+    def __init__(self, keys: List[str], base_cooldown: float = 2.0, max_cooldown: float = 120.0):
+        self._states = {key: _KeyState(key) for key in keys}
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._states)
+
+    def acquire(self, exclude=()) -> Tuple[str, float]:
+        """Picks a key and marks a call in flight; returns (key, seconds to wait before using it)."""
+        now = time.time()
+        with self._lock:
+            candidates = [s for s in self._states.values() if s.key not in exclude] or list(self._states.values())
+            ready = [s for s in candidates if s.cooldown_until <= now]
+            if ready:
+                best = max(ready, key=lambda s: (s.headroom(now), random.random()))
+                wait = 0.0
+            else:
+                best = min(candidates, key=lambda s: s.cooldown_until)
+                wait = best.cooldown_until - now
+            best.inflight += 1
+            best.requests += 1
+            if best.remaining_requests:
+                # Optimistic until the response headers arrive, so concurrent calls spread across keys
+                best.remaining_requests -= 1
+            return best.key, wait
+
+    def release(self, key: str):
+        with self._lock:
+            self._states[key].inflight = max(0, self._states[key].inflight - 1)
+
+    def record_response(self, key: str, status_code: int, headers):
+        now = time.time()
+        with self._lock:
+            state = self._states[key]
+            limit = _int_header(headers, "x-ratelimit-limit-requests")
+            remaining = _int_header(headers, "x-ratelimit-remaining-requests")
+            if remaining is not None:
+                state.limit_requests = limit or state.limit_requests
+                state.remaining_requests = remaining
+                state.requests_reset_at = now + (_parse_duration(headers.get("x-ratelimit-reset-requests")) or 60.0)
+            limit = _int_header(headers, "x-ratelimit-limit-tokens")
+            remaining = _int_header(headers, "x-ratelimit-remaining-tokens")
+            if remaining is not None:
+                state.limit_tokens = limit or state.limit_tokens
+                state.remaining_tokens = remaining
+                state.tokens_reset_at = now + (_parse_duration(headers.get("x-ratelimit-reset-tokens")) or 60.0)
+            if status_code == 429:
+                state.consecutive_429 += 1
+                state.rate_limited += 1
+                backoff = self.base_cooldown * 2 ** (state.consecutive_429 - 1) * random.uniform(1.0, 1.5)
+                retry_after = _parse_duration(headers.get("retry-after"))
+                state.cooldown_until = now + min(self.max_cooldown, retry_after or backoff)
+            elif status_code < 400:
+                state.consecutive_429 = 0
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "key": s.label,
+                    "headroom": round(max(0.0, s.headroom(now)), 3),
+                    "remaining_requests": s.remaining_requests,
+                    "limit_requests": s.limit_requests,
+                    "remaining_tokens": s.remaining_tokens,
+                    "limit_tokens": s.limit_tokens,
+                    "cooldown_seconds": round(max(0.0, s.cooldown_until - now), 1),
+                    "inflight": s.inflight,
+                    "requests": s.requests,
+                    "rate_limited": s.rate_limited,
+                }
+                for s in self._states.values()
+            ]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_key_pool() -> GroqKeyPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GroqKeyPool(load_groq_api_keys())
+        return _pool
+
+
+class PooledChatGroq(BaseChatModel):
+    """
+    ChatGroq that picks an API key from a GroqKeyPool for every call. One ChatGroq per key is built
+    lazily with max_retries=0 and HTTP clients whose response hooks feed the pool; on a 429 the call
+    moves on to the next best key instead of failing.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    pool: Any
+    llm_kwargs: Dict[str, Any] = {}
+    _clients: Dict[str, ChatGroq] = PrivateAttr(default_factory=dict)
+    _clients_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "groq-chat-pool"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.llm_kwargs.get("model_name")}
+
+    def _client(self, key: str) -> ChatGroq:
+        with self._clients_lock:
+            if key not in self._clients:
+                def on_response(response):
+                    self.pool.record_response(key, response.status_code, response.headers)
+
+                async def aon_response(response):
+                    on_response(response)
+
+                self._clients[key] = ChatGroq(
+                    groq_api_key=key,
+                    max_retries=0,
+                    http_client=httpx.Client(event_hooks={"response": [on_response]}),
+                    http_async_client=httpx.AsyncClient(event_hooks={"response": [aon_response]}),
+                    **self.llm_kwargs
+                )
+            return self._clients[key]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        tried = set()
+        while True:
+            key, wait = self.pool.acquire(exclude=tried)
+            try:
+                if wait > 0:
+                    time.sleep(wait)
+                return self._client(key)._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except groq.RateLimitError:
+                tried.add(key)
+                if len(tried) >= len(self.pool.keys):
+                    raise
+            finally:
+                self.pool.release(key)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        tried = set()
+        while True:
+            key, wait = self.pool.acquire(exclude=tried)
+            try:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return await self._client(key)._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except groq.RateLimitError:
+                tried.add(key)
+                if len(tried) >= len(self.pool.keys):
+                    raise
+            finally:
+                self.pool.release(key)
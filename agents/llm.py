@@ -3,20 +3,27 @@ import sys
 from dotenv import load_dotenv
 from langchain.tools import Tool
 from langchain.agents import initialize_agent, AgentType
-from langchain.memory import ConversationBufferMemory
-from langchain_groq import ChatGroq
 from langchain_core.exceptions import OutputParserException
+from langchain_core.callbacks import BaseCallbackHandler
 import time
 import random
+import asyncio
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
 from datetime import datetime
 from pytz import timezone
 
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from tools.retrieval import retrieval_tool_long, retrieval_tool_short
+from tools.retrieval import retrieval_tool_long, retrieval_tool_short, aretrieval_tool_long, aretrieval_tool_short
 from tools.google_search import google_search_tool
 from vector_stores.L_vecdB import LongTermDatabase
 from vector_stores.S_vecdB import ShortTermDatabase
+from agents.memory import TokenBudgetMemory
+from agents.key_pool import PooledChatGroq, get_key_pool
 # Load environment variables
 load_dotenv()
 
@@ -39,57 +46,179 @@ INSTRUCTIONS = (
         "Remember these are branch codes used in entry numbers: CHB (Chemical Engineering), CEB (Civil Engineering), CSB (Computer Science & Engineering), EEB (Electrical Engineering), HSB (Humanities & Social Sciences), MEB (Mechanical Engineering), MMB (Metallurgical & Materials Engineering), EPB (Engineering Physics), MCB (Mathematics & Computing), AIB(Artificial Intelligence & DATA Engineering).\n"
 )
 
+# Bounded pool for the work that is still blocking on the async path (web search, retrieval index loads, embeddings for caches)
+BLOCKING_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("BLOCKING_POOL_SIZE", 16)), thread_name_prefix="blocking")
+
+
+async def run_blocking(fn, *args):
+    """Runs a blocking call on BLOCKING_POOL and awaits it."""
+    return await asyncio.get_running_loop().run_in_executor(BLOCKING_POOL, fn, *args)
+
+
+class FinalAnswerExtractor:
+    """
+    Incrementally pulls the final answer out of the structured-chat agent's JSON blob as tokens arrive:
+    text is only released after `"action": "Final Answer", "action_input": "` has been seen, and stops
+    at the closing quote. JSON string escapes are decoded on the fly.
+    """
+
+    START = re.compile(r'"action"\s*:\s*"Final Answer"\s*,\s*"action_input"\s*:\s*"')
+    ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None  # index in buffer of the next answer character, once the answer has started
+        self.done = False
+
+    def feed(self, token: str) -> str:
+        if self.done:
+            return ""
+        self.buffer += token
+        if self.pos is None:
+            match = self.START.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+        out = []
+        while self.pos < len(self.buffer):
+            c = self.buffer[self.pos]
+            if c == '"':
+                self.done = True
+                break
+            if c == '\\':
+                if self.pos + 1 >= len(self.buffer):
+                    break  # wait for the rest of the escape
+                nxt = self.buffer[self.pos + 1]
+                if nxt == 'u':
+                    if self.pos + 6 > len(self.buffer):
+                        break
+                    out.append(chr(int(self.buffer[self.pos + 2:self.pos + 6], 16)))
+                    self.pos += 6
+                    continue
+                out.append(self.ESCAPES.get(nxt, nxt))
+                self.pos += 2
+                continue
+            out.append(c)
+            self.pos += 1
+        return "".join(out)
+
+
+class StreamingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns agent callbacks into stream events passed to `emit`:
+    {"type": "tool", "name", "input"} when a tool starts, {"type": "tool_end", "name"} when it returns,
+    and {"type": "token", "text"} for final-answer tokens as the LLM produces them.
+    """
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None]):
+        self.emit = emit
+        self._extractor = FinalAnswerExtractor()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._extractor = FinalAnswerExtractor()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._extractor = FinalAnswerExtractor()
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        text = self._extractor.feed(token)
+        if text:
+            self.emit({"type": "token", "text": text})
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.emit({"type": "tool", "name": (serialized or {}).get("name") or kwargs.get("name"), "input": input_str})
+
+    def on_tool_end(self, output, **kwargs):
+        self.emit({"type": "tool_end", "name": kwargs.get("name")})
+
+
+def to_sse(event: Dict[str, Any]) -> str:
+    """Formats a stream event as a Server-Sent Event."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+# Agent executors are stateless apart from memory, so one per (databases, model) is shared by every session
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+# Small, fast model that folds old turns into each session's running summary
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+_summary_llm = None
+
+
+def summarize_history(prompt: str) -> str:
+    global _summary_llm
+    with _agents_lock:
+        if _summary_llm is None:
+            _summary_llm = PooledChatGroq(
+                pool=get_key_pool(),
+                llm_kwargs=dict(model_name=MEMORY_SUMMARY_MODEL, temperature=0.0, max_tokens=512)
+            )
+    text = _summary_llm.invoke(prompt).content
+    # Reasoning models prefix their answer with a <think> block
+    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+
+
+def new_memory() -> TokenBudgetMemory:
+    """Per-session conversation memory; passed to the shared agent as chat_history at invoke time."""
+    return TokenBudgetMemory(summarize_fn=summarize_history)
+
 
-# Initialize the LLM Agent with Tools, Memory, and Instructions
 def wake_llm(longdb, shortdb, model = "deepseek-r1-distill-llama-70b"):
+    """Returns the process-wide agent executor for these databases and model, building it on first use."""
+    key = (id(longdb), id(shortdb), model)
+    with _agents_lock:
+        if key not in _agents:
+            _agents[key] = _build_agent(longdb, shortdb, model)
+        return _agents[key]
+
+
+# Initialize the LLM Agent with Tools and Instructions (memory is supplied per call)
+def _build_agent(longdb, shortdb, model):
     def retrieve_long(query):
         return retrieval_tool_long(query, longdb)
     def retrieve_short(query):
         return retrieval_tool_short(query, shortdb)
+    async def aretrieve_long(query):
+        return await aretrieval_tool_long(query, longdb, executor=BLOCKING_POOL)
+    async def aretrieve_short(query):
+        return await aretrieval_tool_short(query, shortdb, executor=BLOCKING_POOL)
+    async def agoogle_search(query):
+        return await run_blocking(google_search_tool, query)
 
     tools = [
         Tool(
             name="retrieval_tool_long",
             func=retrieve_long,
+            coroutine=aretrieve_long,
             description="Use this tool to retrieve information from the IIT Ropar long-term (archival/static) database."
         ),
         Tool(
             name="retrieval_tool_short",
             func=retrieve_short,
+            coroutine=aretrieve_short,
             description="Use this tool to retrieve information from the IIT Ropar short-term (recent/emails) database."
         ),
         Tool(
             name="google_search_tool",
             func=google_search_tool,
+            coroutine=agoogle_search,
             description="Use this tool to Google search if IIT Ropar database has no relevant information."
         )
     ]
 
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
-        output_key="output"
-    )
-
-    api_keys = [
-        os.getenv("GROQ_API_KEY"), os.getenv("GROQ_API_KEY1"), os.getenv("GROQ_API_KEY2"),
-        os.getenv("GROQ_API_KEY3"), os.getenv("GROQ_API_KEY4"), os.getenv("GROQ_API_KEY5"),
-        os.getenv("GROQ_API_KEY6"), os.getenv("GROQ_API_KEY7"), os.getenv("GROQ_API_KEY8"),
-        os.getenv("GROQ_API_KEY9"), os.getenv("GROQ_API_KEY10")
-    ]
-
-    valid_api_keys = [key for key in api_keys if key is not None]
-    if not valid_api_keys:
-        raise ValueError("No valid API keys available.")
-
-    random_api_key = random.choice(valid_api_keys)
-
-    llm = ChatGroq(
-        groq_api_key=random_api_key,
-        model_name=model,
-        temperature=0.7,
-        max_tokens=8192,
-        top_p=0.95,
+    # Every LLM call picks the Groq key with the most rate-limit headroom
+    llm = PooledChatGroq(
+        pool=get_key_pool(),
+        llm_kwargs=dict(
+            model_name=model,
+            temperature=0.7,
+            max_tokens=8192,
+            top_p=0.95,
+            # Tokens are only forwarded when a StreamingCallbackHandler is attached to the call
+            streaming=True,
+        )
     )
 
     llm_agent = initialize_agent(
@@ -97,7 +226,6 @@ def wake_llm(longdb, shortdb, model = "deepseek-r1-distill-llama-70b"):
         llm=llm,
         agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
         verbose=True,
-        memory=memory,
         agent_kwargs = {
             "prefix": INSTRUCTIONS,
             "examples": [
@@ -0,0 +1,155 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Clips `text` to at most `max_tokens`, keeping the beginning (or the end with keep_end=True)."""
+    if max_tokens <= 0:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return _encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[-max_chars:] if keep_end else text[:max_chars]
+
+
+SUMMARY_PROMPT = (
+    "Progressively summarize the conversation between a user and RAGnarok, IIT Ropar's AI assistant.\n"
+    "Extend the current summary with the new lines and return only the new summary, in at most {max_tokens} tokens. "
+    "Keep names, dates, numbers and open questions.\n\n"
+    "Current summary:\n{summary}\n\nNew lines:\n{lines}\n\nNew summary:"
+)
+
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", 400))
+MEMORY_RECENT_TOKENS = int(os.getenv("MEMORY_RECENT_TOKENS", 1200))
+
+# Summaries are written off the request path, on a small shared pool
+_summary_pool = ThreadPoolExecutor(max_workers=int(os.getenv("MEMORY_SUMMARY_WORKERS", 2)), thread_name_prefix="memory-summary")
+
+
+def _transcript(messages: List[BaseMessage]) -> str:
+    return "\n".join(f"{'User' if m.type == 'human' else 'RAGnarok'}: {m.content}" for m in messages)
+
+
+class TokenBudgetMemory:
+    """
+    Conversation memory with a hard token budget, used in place of ConversationBufferMemory.
+    The most recent turns are kept verbatim within `recent_tokens`; older turns are folded into a
+    running summary of at most `summary_tokens`, written by `summarize_fn(prompt)` on a background
+    pool. Turns waiting to be summarized are shown clipped, so chat_history never exceeds
+    summary_tokens + recent_tokens whatever the session length.
+    """
+
+    def __init__(
+        self,
+        summarize_fn: Optional[Callable[[str], str]] = None,
+        summary_tokens: int = MEMORY_SUMMARY_TOKENS,
+        recent_tokens: int = MEMORY_RECENT_TOKENS,
+        memory_key: str = "chat_history"
+    ):
+        self.summarize_fn = summarize_fn
+        self.summary_tokens = summary_tokens
+        self.recent_tokens = recent_tokens
+        self.memory_key = memory_key
+        self.summary = ""
+        self._recent: List[BaseMessage] = []
+        self._recent_token_count = 0
+        self._pending: List[BaseMessage] = []
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """Everything currently held: the summary (if any), turns awaiting summary and recent turns."""
+        with self._lock:
+            summary = [SystemMessage(content=self.summary)] if self.summary else []
+            return summary + self._pending + self._recent
+
+    def save_context(self, inputs: dict, outputs: dict):
+        turn = [HumanMessage(content=str(inputs["input"])), AIMessage(content=str(outputs["output"]))]
+        with self._lock:
+            self._recent.extend(turn)
+            self._recent_token_count += sum(count_tokens(m.content) for m in turn)
+            # Always keep the latest turn verbatim; older turns move to the summary queue
+            while self._recent_token_count > self.recent_tokens and len(self._recent) > 2:
+                for m in self._recent[:2]:
+                    self._recent_token_count -= count_tokens(m.content)
+                self._pending.extend(self._recent[:2])
+                del self._recent[:2]
+            start = bool(self._pending) and not self._summarizing
+            if start:
+                self._summarizing = True
+        if start:
+            _summary_pool.submit(self._summarize_pending)
+
+    def _summarize_pending(self):
+        while True:
+            with self._lock:
+                batch = list(self._pending)
+                summary = self.summary
+                if not batch:
+                    self._summarizing = False
+                    return
+            lines = _transcript(batch)
+            new_summary = None
+            if self.summarize_fn is not None:
+                try:
+                    new_summary = self.summarize_fn(SUMMARY_PROMPT.format(
+                        max_tokens=self.summary_tokens, summary=summary or "(none)", lines=lines
+                    ))
+                except Exception as e:
+                    print(f"Memory summarization failed, keeping a clipped transcript instead: {e}")
+            if not new_summary:
+                new_summary = f"{summary}\n{lines}".strip()
+            with self._lock:
+                self.summary = truncate_tokens(new_summary.strip(), self.summary_tokens, keep_end=True)
+                del self._pending[:len(batch)]
+
+    def load_memory_variables(self, inputs: Optional[dict] = None) -> dict:
+        with self._lock:
+            summary = self.summary
+            pending = list(self._pending)
+            recent = list(self._recent)
+            recent_token_count = self._recent_token_count
+        messages: List[BaseMessage] = []
+        # Summary and not-yet-summarized turns share the summary budget
+        history = summary
+        if pending:
+            history = f"{summary}\n{_transcript(pending)}".strip()
+        if history:
+            messages.append(SystemMessage(
+                content="Summary of earlier conversation: " + truncate_tokens(history, self.summary_tokens, keep_end=True)
+            ))
+        # The latest turn alone may exceed the recent budget; clip each of its messages to fit
+        per_message = self.recent_tokens // max(1, len(recent))
+        for m in recent:
+            content = m.content if recent_token_count <= self.recent_tokens else truncate_tokens(m.content, per_message)
+            messages.append(type(m)(content=content))
+        return {self.memory_key: messages}
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self._recent = []
+            self._recent_token_count = 0
+            self._pending = []
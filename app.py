@@ -7,7 +7,7 @@ logging.basicConfig(
 )
 
 from urllib import response
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import threading
@@ -31,7 +31,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'main_gr
 from vector_stores.L_vecdB import LongTermDatabase
 from vector_stores.S_vecdB import ShortTermDatabase
 from tools.email_scraper import EmailScraper
+from tools.email_filter import default_filter
+from tools.sumar import summarizer
 from pipeline.RAGnarok import RAGnarok
+from pipeline.ingest_jobs import IngestionJobQueue
+from pipeline.sessions import SessionStore
+from agents.llm import to_sse
+from agents.key_pool import get_key_pool
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "your-default-secret-key")
@@ -53,45 +59,79 @@ os.makedirs(SHORT_TERM_PREFIX, exist_ok=True)
 # Initialize databases with Qdrant-compatible arguments
 long_db = LongTermDatabase(collection_prefix=LONG_TERM_PREFIX)
 
+# Uploads are ingested in the background; one job at a time keeps Qdrant and the embedder from being swamped
+ingest_jobs = IngestionJobQueue(long_db, max_workers=int(os.environ.get("INGEST_WORKERS", 1)))
+
 # Update the fetch_latest_email callback to use EmailScraper
 
+# Seconds to wait on IMAP IDLE for new mail when nothing is pending (0 = plain polling)
+EMAIL_IDLE_TIMEOUT = float(os.environ.get("EMAIL_IDLE_TIMEOUT", 0))
+
+# One scraper, and so one long-lived IMAP connection, for every poll of the worker
+email_scraper = None
+
+def get_email_scraper():
+    global email_scraper
+    if email_scraper is None:
+        email_scraper = EmailScraper()
+    return email_scraper
+
 def fetch_latest_email():
     """
-    Fetch the latest email using the EmailScraper class. If summarization fails, skip the email.
+    Fetch the emails that arrived since the last call (UID-based incremental sync, so a burst of
+    emails between polls is not lost). Bodies are returned raw; summarize_emails runs as its own
+    pipeline stage in the short-term worker.
     """
-    from tools.sumar import summarize_text
     from datetime import datetime
-    scraper = EmailScraper()
-    print("Fetching latest email...")
-    emails = scraper.scrape_latest_emails(count=1)
+    print("Fetching new emails...")
+    # Blocked senders are dropped (and counted) once, by the filter stage of the short-term worker
+    emails = get_email_scraper().fetch_new_emails(idle_timeout=EMAIL_IDLE_TIMEOUT or None)
     if not emails:
-        app.logger.warning("No emails found when fetching latest email.")
-        return None
-    latest_email_id, latest_email = next(iter(emails.items()))
-    body = latest_email.get('body', '')
-    from_ = latest_email.get('from', '')
-    subject = latest_email.get('subject', '')
-    timestamp = latest_email.get('timestamp', datetime.utcnow().isoformat())
-    try:
-        summary = summarize_text(body)
-        # Concatenate 'from', 'subject', and 'timestamp' to the summarized body
-        summary = f"From: {from_}\nSubject: {subject}\nTimestamp: {timestamp}\n{summary}"
-    except Exception as e:
-        app.logger.warning(f"Summarization failed for email {latest_email_id}: {e}. Skipping email.")
+        app.logger.info("No new emails found.")
         return None
-    # Return as a list of dicts for objectwise ingestion, including 'from', 'subject', and 'timestamp'
-    return [{
-        'id': latest_email_id,
-        'body': summary,
-        'from': from_,
-        'subject': subject,
-        'timestamp': timestamp
-    }]
-
-# Pass the callback to ShortTermDatabase
+    return [
+        {
+            'id': email_id,
+            'body': latest_email.get('body', ''),
+            'from': latest_email.get('from', ''),
+            'subject': latest_email.get('subject', ''),
+            'timestamp': latest_email.get('timestamp', datetime.utcnow().isoformat())
+        }
+        for email_id, latest_email in emails.items()
+    ]
+
+def _email_document(email, summary):
+    # Concatenate 'from', 'subject', and 'timestamp' to the summarized body
+    return dict(email, body=f"From: {email['from']}\nSubject: {email['subject']}\nTimestamp: {email['timestamp']}\n{summary}")
+
+def summarize_emails(emails):
+    """
+    Summarizes a batch of fetched emails for ingestion. The shared summarizer submits the whole
+    batch at once, reuses cached summaries for duplicate bodies and, depending on SUMMARIZER_MODE,
+    uses the local extractive summary as a fallback or as a first version that is replaced in the
+    short-term DB once the remote summary arrives.
+    """
+    def on_refined(index, summary):
+        short_db.refine_email(_email_document(emails[index], summary))
+
+    summaries = summarizer.summarize_many([email['body'] for email in emails], on_refined=on_refined, return_exceptions=True)
+    documents = []
+    for email, summary in zip(emails, summaries):
+        if isinstance(summary, Exception):
+            # Only this email is dropped; it stays unacknowledged and the scraper delivers it again
+            app.logger.warning(f"Summarizing email {email['id']} failed: {summary}")
+            documents.append(None)
+        else:
+            documents.append(_email_document(email, summary))
+    return documents
+
+# Pass the callbacks to ShortTermDatabase; remote summary concurrency is bounded by SUMMARIZER_WORKERS
 short_db = ShortTermDatabase(
     collection_prefix=SHORT_TERM_PREFIX,
-    fetch_latest_email=fetch_latest_email
+    fetch_latest_email=fetch_latest_email,
+    summarize_emails=summarize_emails,
+    # The sync position is only persisted past an email once it is in the short-term DB
+    ack_emails=lambda email_ids: get_email_scraper().ack(email_ids)
 )
 
 # --- Short-term DB background worker management ---
@@ -134,16 +174,14 @@ def require_admin(f):
         return f(*args, **kwargs)
     return decorated
 
-# --- Global dictionary for user RAGnarok objects with last access time ---
-user_rag_dict = {}  # {user_uuid: {'rag': RAGnarok, 'last_access': timestamp}}
+# --- Bounded, thread-safe store of per-user RAGnarok sessions ---
 USER_RAG_TIMEOUT = 30 * 60  # 30 minutes in seconds
-
-def cleanup_user_rag_dict():
-    """Remove user sessions that have been inactive for more than USER_RAG_TIMEOUT seconds."""
-    now = time.time()
-    to_delete = [uuid for uuid, v in user_rag_dict.items() if now - v['last_access'] > USER_RAG_TIMEOUT]
-    for uuid in to_delete:
-        del user_rag_dict[uuid]
+USER_RAG_CAPACITY = int(os.getenv("USER_RAG_CAPACITY", 1000))
+user_sessions = SessionStore(
+    capacity=USER_RAG_CAPACITY,
+    idle_timeout=USER_RAG_TIMEOUT,
+    sizeof=lambda rag: rag.memory_bytes()
+)
 
 # --- Global model variable ---
 # model = 'deepseek-r1-distill-llama-70b'  # Default model
@@ -181,29 +219,43 @@ def upload_json():
             return jsonify({'error': 'Invalid file type. Only JSON files are allowed.'}), 400
 
         filename = secure_filename(file.filename)
-        filepath = os.path.join('uploads', filename)
-        os.makedirs('uploads', exist_ok=True)
+        # Keep the original file name (it identifies the source in the long-term DB) in a per-upload directory
+        upload_dir = os.path.join('uploads', uuid.uuid4().hex)
+        os.makedirs(upload_dir, exist_ok=True)
+        filepath = os.path.join(upload_dir, filename)
         file.save(filepath)
 
         app.logger.info(f"File {filename} saved successfully at {filepath}.")
 
-        # Add the uploaded JSON data to the long-term database
-        try:
-            app.logger.info(f"Adding data from {filename} to the long-term database...")
-            long_db.add_data(filepath)
-            app.logger.info(f"Data from {filename} added to the long-term database successfully.")
-        except Exception as e:
-            app.logger.error(f"Failed to add data from {filename} to the long-term database: {e}")
-            return jsonify({'error': 'Failed to process the file.', 'details': str(e)}), 500
+        # Ingest in the background; the job removes the file when it finishes
+        job_id = ingest_jobs.submit(filepath, filename=filename)
+        app.logger.info(f"Queued ingestion job {job_id} for {filename}.")
 
-        return jsonify({'message': 'File uploaded and data added to long-term DB.'}), 200
+        return jsonify({'message': 'File uploaded; ingestion into the long-term DB has been queued.', 'job_id': job_id}), 202
     except Exception as e:
         app.logger.error(f"Unexpected error during file upload: {e}")
         return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
-    finally:
-        # Clean up the uploaded file to save space
-        if os.path.exists(filepath):
-            os.remove(filepath)
+
+@app.route('/admin/ingest_jobs', methods=['GET'])
+@require_admin
+def list_ingest_jobs():
+    return jsonify({'jobs': ingest_jobs.list()})
+
+@app.route('/admin/ingest_jobs/<job_id>', methods=['GET'])
+@require_admin
+def get_ingest_job(job_id):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    return jsonify(job)
+
+@app.route('/admin/ingest_jobs/<job_id>/cancel', methods=['POST'])
+@require_admin
+def cancel_ingest_job(job_id):
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    return jsonify({'message': f'Cancellation requested for job {job_id}.', 'job': job})
 
 # Ensure the worker thread persists across sessions
 @app.route('/admin/start_shortterm_worker', methods=['POST'])
@@ -240,7 +292,10 @@ def worker_status():
     global global_worker_running
     running = global_worker_running
     status = {
-        'running': running
+        'running': running,
+        'email_filter': default_filter.stats(),
+        'pipeline': short_db.pipeline_stats(),
+        'summarizer': summarizer.stats()
     }
     if not running:
         app.logger.warning("Worker thread is not running.")
@@ -251,6 +306,21 @@ def worker_status():
 # # Ensure RAGnarok is instantiated correctly
 # rg = RAGnarok(long_db, short_db)
 
+def get_user_rag(user_uuid):
+    """Returns the user's session (RAGnarok in .value, per-user .lock), creating it if needed."""
+    app.logger.info(f"Received user_uuid: {user_uuid}")
+    return user_sessions.get_or_create(user_uuid, lambda: RAGnarok(long_db, short_db, model=model))
+
+@app.route('/admin/sessions', methods=['GET'])
+@require_admin
+def session_stats():
+    return jsonify(user_sessions.stats(per_session=request.args.get('detail') == 'true'))
+
+@app.route('/admin/llm_keys', methods=['GET'])
+@require_admin
+def llm_key_utilization():
+    return jsonify(get_key_pool().stats())
+
 @app.route('/chat', methods=['POST'])
 def chat():
     try:
@@ -262,23 +332,10 @@ def chat():
         if not user_uuid:
             return jsonify({'error': 'No user_uuid provided'}), 400
 
-        global user_rag_dict, model, api_keys
-        cleanup_user_rag_dict()  # Clean up expired sessions on each chat
-
-        app.logger.info(f"Received user_uuid: {user_uuid}")
-        app.logger.info(f"Current user_rag_dict keys: {list(user_rag_dict.keys())}")
-
-        now = time.time()
-        if user_uuid not in user_rag_dict:
-            user_rag_dict[user_uuid] = {
-                'rag': RAGnarok(long_db, short_db, model=model),
-                'last_access': now
-            }
-        else:
-            user_rag_dict[user_uuid]['last_access'] = now
-
-        user_rg = user_rag_dict[user_uuid]['rag']
-        response_text = user_rg.invoke(query)
+        user_session = get_user_rag(user_uuid)
+        # One agent run at a time per user; other users are not blocked
+        with user_session.lock:
+            response_text = user_session.value.invoke(query)
         app.logger.info(f"RAGnarok response: {response_text}")
 
         resp = make_response(jsonify({'response': response_text}), 200)
@@ -287,6 +344,40 @@ def chat():
         app.logger.error(f"Unexpected error in /chat endpoint: {e}", exc_info=True)
         return jsonify({'error': 'An unexpected error occurred. Please try again later.'}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming /chat: Server-Sent Events with tool progress ("tool"/"tool_end"), final-answer
+    tokens ("token") as the LLM produces them, and the complete answer ("final").
+    """
+    try:
+        data = request.get_json()
+        query = data.get('query')
+        user_uuid = data.get('user_uuid')
+        if not query:
+            return jsonify({'error': 'No query provided'}), 400
+        if not user_uuid:
+            return jsonify({'error': 'No user_uuid provided'}), 400
+
+        user_session = get_user_rag(user_uuid)
+
+        def generate():
+            # On client disconnect, closing the stream waits for the agent, so the lock is held until it is done
+            with user_session.lock:
+                for event in user_session.value.stream(query):
+                    if event['type'] == 'final':
+                        app.logger.info(f"RAGnarok response: {event['response']}")
+                    yield to_sse(event)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    except Exception as e:
+        app.logger.error(f"Unexpected error in /chat/stream endpoint: {e}", exc_info=True)
+        return jsonify({'error': 'An unexpected error occurred. Please try again later.'}), 500
+
 
 # --- Admin Authentication Endpoint ---
 @app.route('/admin/verify_credentials', methods=['POST'])
@@ -339,6 +430,9 @@ def cleanup():
     try:
         stop_shortterm_worker()
         short_db.close()
+        ingest_jobs.shutdown()
+        if email_scraper is not None:
+            email_scraper.close()
     except Exception:
         pass
     
@@ -5,11 +5,11 @@ import time
 import uuid
 import traceback
 import threading
-from typing import Optional, Dict, Any
+from typing import Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from werkzeug.utils import secure_filename
 
@@ -25,7 +25,12 @@ sys.path.extend([
 from vector_stores.L_vecdB import LongTermDatabase
 from vector_stores.S_vecdB import ShortTermDatabase
 from tools.email_scraper import EmailScraper
+from tools.email_filter import default_filter
 from pipeline.RAGnarok import RAGnarok
+from pipeline.ingest_jobs import IngestionJobQueue
+from pipeline.sessions import Session, SessionStore
+from agents.llm import to_sse
+from agents.key_pool import get_key_pool
 
 # --- Logging setup ---
 logging.basicConfig(
@@ -60,9 +65,16 @@ os.makedirs(SHORT_TERM_PREFIX, exist_ok=True)
 long_db = LongTermDatabase(collection_prefix=LONG_TERM_PREFIX)
 short_db = ShortTermDatabase(collection_prefix=SHORT_TERM_PREFIX, fetch_latest_email=lambda: None)
 
+# Background ingestion of uploaded JSON files (keeps add_data off the event loop)
+ingest_jobs = IngestionJobQueue(long_db, max_workers=int(os.getenv("INGEST_WORKERS", 1)))
+
 # Global state
-user_rag_dict: Dict[str, Dict[str, Any]] = {}
 USER_RAG_TIMEOUT = 30 * 60  # seconds
+user_sessions = SessionStore(
+    capacity=int(os.getenv("USER_RAG_CAPACITY", 1000)),
+    idle_timeout=USER_RAG_TIMEOUT,
+    sizeof=lambda rag: rag.memory_bytes()
+)
 model_name = os.getenv('MODEL_NAME', 'qwen/qwen3-32b')
 worker_thread: Optional[threading.Thread] = None
 worker_running = False
@@ -118,17 +130,10 @@ def shortterm_worker():
 #         worker_running = True
 #         logger.info("Short-term worker started on startup.")
 
-# Utility to clean sessions
-def cleanup_user_sessions():
-    now = time.time()
-    expired = [uid for uid, v in user_rag_dict.items() if now - v['last_access'] > USER_RAG_TIMEOUT]
-    for uid in expired:
-        user_rag_dict.pop(uid, None)
-
 # Admin-protected endpoints
 @fastapp.get("/admin/worker_status", dependencies=[Depends(require_admin)])
 async def worker_status():
-    return {'running': worker_running}
+    return {'running': worker_running, 'email_filter': default_filter.stats(), 'pipeline': short_db.pipeline_stats()}
 
 @fastapp.post("/admin/change_model", dependencies=[Depends(require_admin)])
 async def change_model(req: ChangeModelRequest):
@@ -137,23 +142,42 @@ async def change_model(req: ChangeModelRequest):
     logger.info(f"Model changed to: {model_name}")
     return {'message': f'Model updated to {model_name}'}
 
-@fastapp.post("/admin/upload_json", dependencies=[Depends(require_admin)])
+@fastapp.post("/admin/upload_json", dependencies=[Depends(require_admin)], status_code=202)
 async def upload_json(file: UploadFile = File(...)):
     if not file.filename.endswith('.json'):
         raise HTTPException(400, 'Only JSON files allowed')
-    upload_dir = 'uploads'
+    # Keep the original file name (it identifies the source in the long-term DB) in a per-upload directory
+    upload_dir = os.path.join('uploads', uuid.uuid4().hex)
     os.makedirs(upload_dir, exist_ok=True)
-    path = os.path.join(upload_dir, secure_filename(file.filename))
+    filename = secure_filename(file.filename)
+    path = os.path.join(upload_dir, filename)
     with open(path, 'wb') as f:
         f.write(await file.read())
-    try:
-        long_db.add_data(path)
-        logger.info(f"Uploaded and ingested: {path}")
-    except Exception as e:
-        raise HTTPException(500, f'Ingestion failed: {e}')
-    finally:
-        os.remove(path)
-    return {'message': 'File uploaded and ingested'}
+    job_id = ingest_jobs.submit(path, filename=filename)
+    logger.info(f"Uploaded {path}; queued ingestion job {job_id}")
+    return {'message': 'File uploaded; ingestion queued', 'job_id': job_id}
+
+@fastapp.get("/admin/ingest_jobs", dependencies=[Depends(require_admin)])
+async def list_ingest_jobs():
+    return {'jobs': ingest_jobs.list()}
+
+@fastapp.get("/admin/ingest_jobs/{job_id}", dependencies=[Depends(require_admin)])
+async def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, 'Unknown job id')
+    return job
+
+@fastapp.post("/admin/ingest_jobs/{job_id}/cancel", dependencies=[Depends(require_admin)])
+async def cancel_ingest_job(job_id: str):
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, 'Unknown job id')
+    return {'message': f'Cancellation requested for job {job_id}', 'job': job}
+
+@fastapp.on_event("shutdown")
+def shutdown_event():
+    ingest_jobs.shutdown()
 
 @fastapp.get("/admin/logs", dependencies=[Depends(require_admin)])
 async def get_logs():
@@ -161,28 +185,51 @@ async def get_logs():
         raise HTTPException(404, 'Log not found')
     return FileResponse('rag.log', filename='rag.txt', media_type='text/plain')
 
+def get_user_rag(user_uuid: str) -> Session:
+    return user_sessions.get_or_create(user_uuid, lambda: RAGnarok(long_db, short_db, model=model_name))
+
+@fastapp.get("/admin/sessions", dependencies=[Depends(require_admin)])
+async def session_stats(detail: bool = False):
+    return user_sessions.stats(per_session=detail)
+
+@fastapp.get("/admin/llm_keys", dependencies=[Depends(require_admin)])
+async def llm_key_utilization():
+    return get_key_pool().stats()
+
 # Public chat endpoint
 @fastapp.post("/chat")
 async def chat(req: ChatRequest):
     if not req.query or not req.user_uuid:
         raise HTTPException(400, 'query and user_uuid required')
-    cleanup_user_sessions()
-    now = time.time()
-    if req.user_uuid not in user_rag_dict:
-        user_rag_dict[req.user_uuid] = {
-            'rag': RAGnarok(long_db, short_db, model=model_name),
-            'last_access': now
-        }
-    else:
-        user_rag_dict[req.user_uuid]['last_access'] = now
-    rag = user_rag_dict[req.user_uuid]['rag']
+    session = get_user_rag(req.user_uuid)
     try:
-        result = rag.invoke(req.query)
+        # Fully async path: Groq, Qdrant and tool calls are awaited, blocking leftovers run on a bounded pool.
+        # The per-user lock keeps two tabs of the same user from interleaving in one conversation memory.
+        async with session.async_lock:
+            result = await session.value.ainvoke(req.query)
     except Exception as e:
         logger.error(f"RAG invocation failed: {e}")
         raise HTTPException(500, 'RAG processing error')
     return {'response': result}
 
+@fastapp.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Server-Sent Events: tool progress, final-answer tokens as they are generated, then the full answer."""
+    if not req.query or not req.user_uuid:
+        raise HTTPException(400, 'query and user_uuid required')
+    session = get_user_rag(req.user_uuid)
+
+    async def events():
+        async with session.async_lock:
+            async for event in session.value.astream(req.query):
+                yield to_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @fastapp.get("/")
 async def root():
     return PlainTextResponse("RAG-narok FastAPI backend running.")
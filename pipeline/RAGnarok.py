@@ -1,5 +1,8 @@
 import sys
 import os
+import queue
+import asyncio
+import threading
 from dotenv import load_dotenv
 from chromadb.config import Settings
 from datetime import datetime
@@ -8,12 +11,15 @@ from pytz import timezone
 # Set up environment and paths
 load_dotenv()
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'vector_stores')))
 
 # Import from project structure
-from agents.llm import wake_llm
+from agents.llm import wake_llm, new_memory, run_blocking, StreamingCallbackHandler
 from vector_stores.L_vecdB import LongTermDatabase
 from vector_stores.S_vecdB import ShortTermDatabase
 from langchain_core.exceptions import OutputParserException
+from embedding import get_dense_embedding
+from pipeline.answer_cache import SemanticAnswerCache
 
 
 # # Initialize vector DBs
@@ -21,22 +27,159 @@ from langchain_core.exceptions import OutputParserException
 # shortdb = ShortTermDatabase(client_settings=Settings(persist_directory="shortterm_db"))
 
 
+# Opt-in: answers are shared across users, so only self-contained first questions are ever cached
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+
+
 class RAGnarok:
+    # Shared by every session: near-identical questions are answered from here without running the agent
+    answer_cache = None
+    _answer_cache_lock = threading.Lock()
+
     def __init__(self, longdb, shortdb, model="deepseek-r1-distill-llama-70b"):
+        # The agent executor is shared process-wide; the conversation memory is this session's only state
         self.llm_agent = wake_llm(longdb, shortdb, model=model)
+        self.memory = new_memory()
+        if ANSWER_CACHE_ENABLED:
+            with RAGnarok._answer_cache_lock:
+                if RAGnarok.answer_cache is None:
+                    RAGnarok.answer_cache = SemanticAnswerCache(
+                        embed_fn=get_dense_embedding,
+                        version_fn=lambda: (longdb.data_version, shortdb.data_version),
+                        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92)),
+                        ttl=float(os.getenv("ANSWER_CACHE_TTL", 30 * 60))
+                    )
+
+    def memory_bytes(self) -> int:
+        """Approximate size of this session's conversation history, for session-store accounting."""
+        return sum(len(str(m.content).encode("utf-8")) for m in self.memory.messages)
+
+    def _answer_cache_for(self, query: str):
+        """
+        The shared answer cache, or None when this query must not use it: follow-ups depend on this
+        session's history (another user's cached answer would leak), and time-relative or anaphoric
+        queries are not answered by the query text alone.
+        """
+        cache = RAGnarok.answer_cache if ANSWER_CACHE_ENABLED else None
+        if cache is None or self.memory.messages or not cache.cacheable(query):
+            return None
+        return cache
+
+    def invoke(self, query: str, callbacks=None) -> str:
+        cache = self._answer_cache_for(query)
+        query_vec = cache.embed(query) if cache else None
+        cached = cache.lookup(query_vec) if cache else None
+        if cached is not None:
+            # Keep the conversation coherent even though the agent did not run
+            self.memory.save_context({"input": query}, {"output": cached})
+            return cached
+        answer = self._run_agent(query, callbacks=callbacks)
+        if cache and not answer.startswith("[❌"):
+            cache.store(query_vec, answer)
+        return answer
+
+    def stream(self, query: str):
+        """
+        Yields stream events while the agent runs: tool progress, final-answer tokens as the LLM
+        produces them, then {"type": "final", "response"} with the complete answer. If the consumer
+        stops early (client disconnect), closing the generator waits for the agent to finish, so a
+        caller holding the session lock around it keeps it until this session's memory is settled.
+        """
+        events = queue.Queue()
+        handler = StreamingCallbackHandler(events.put)
+        result = {}
+
+        def run():
+            try:
+                result["response"] = self.invoke(query, callbacks=[handler])
+            finally:
+                events.put(None)
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+            yield {"type": "final", "response": result.get("response", "[❌ Error] No response.")}
+        finally:
+            worker.join()
+
+    async def astream(self, query: str):
+        """Async stream(): same events, produced by ainvoke on the running event loop; closing it early also waits for the agent."""
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        handler = StreamingCallbackHandler(lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+        task = asyncio.create_task(self.ainvoke(query, callbacks=[handler]))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            yield {"type": "final", "response": task.result()}
+        finally:
+            await asyncio.wait({task})
+
+    async def ainvoke(self, query: str, callbacks=None) -> str:
+        """
+        Async invoke: the agent, the LLM calls and the retrieval tools run natively async;
+        the remaining blocking work (query embedding for the answer cache) is offloaded to a bounded pool.
+        """
+        cache = self._answer_cache_for(query)
+        query_vec = await run_blocking(cache.embed, query) if cache else None
+        cached = cache.lookup(query_vec) if cache else None
+        if cached is not None:
+            self.memory.save_context({"input": query}, {"output": cached})
+            return cached
+        answer = await self._arun_agent(query, callbacks=callbacks)
+        if cache and not answer.startswith("[❌"):
+            cache.store(query_vec, answer)
+        return answer
+
+    def _agent_inputs(self, query: str, current_time: str) -> dict:
+        # Combine current_time into the input key; chat history comes from this session's memory
+        return {
+            "input": f"{query} (Current time: {current_time})",
+            **self.memory.load_memory_variables({})
+        }
+
+    def _remember(self, query: str, response) -> str:
+        # Response could be a string or a dict
+        if isinstance(response, dict):
+            output = response["output"] if "output" in response else str(response)
+        else:
+            output = str(response)
+        self.memory.save_context({"input": query}, {"output": output})
+        return output
+
+    async def _arun_agent(self, query: str, callbacks=None) -> str:
+        try:
+            current_time = datetime.now(timezone('Asia/Kolkata')).strftime('%A, %Y-%m-%d %H:%M:%S')
+            response = await self.llm_agent.ainvoke(
+                self._agent_inputs(query, current_time),
+                config={"callbacks": callbacks} if callbacks else None
+            )
+            return self._remember(query, response)
+
+        except OutputParserException as e:
+            raw_output = getattr(e, "llm_output", "Unavailable")
+            return f"[❌ Parsing Error] {str(e)}\n[Raw Output]: {raw_output}"
+
+        except Exception as e:
+            return f"[❌ Error] {str(e)}"
 
-    def invoke(self, query: str) -> str:
+    def _run_agent(self, query: str, callbacks=None) -> str:
         try:
             current_time = datetime.now(timezone('Asia/Kolkata')).strftime('%A, %Y-%m-%d %H:%M:%S')
-            # Combine current_time into the input key
-            response = self.llm_agent.invoke({"input": f"{query} (Current time: {current_time})"})
-
-            # Response could be a string or a dict
-            if isinstance(response, dict):
-                if "output" in response:
-                    return response["output"]
-                return str(response)
-            return str(response)
+            response = self.llm_agent.invoke(
+                self._agent_inputs(query, current_time),
+                config={"callbacks": callbacks} if callbacks else None
+            )
+            return self._remember(query, response)
 
         except OutputParserException as e:
             raw_output = getattr(e, "llm_output", "Unavailable")
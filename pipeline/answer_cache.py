@@ -0,0 +1,119 @@
+import re
+import time
+import threading
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+# Answers to these depend on when they are asked
+TIME_SENSITIVE_WORDS = frozenset(
+    "today tonight tomorrow yesterday now currently current latest recent recently new newest upcoming "
+    "week month year weekend morning evening schedule deadline deadlines".split()
+)
+# Words that point back into the conversation; a short query built on them means nothing on its own
+ANAPHORIC_WORDS = frozenset(
+    "he him his she her hers they them their it its this that these those there more else again also "
+    "above previous earlier same one ones".split()
+)
+MAX_ANAPHORIC_QUERY_WORDS = 8
+
+
+class SemanticAnswerCache:
+    """
+    Process-wide cache of final answers, looked up by embedding similarity of the normalized query.
+    Vectors live in one preallocated, L2-normalized NumPy matrix, so a lookup is a single
+    matrix-vector product. Entries expire after `ttl` seconds and the whole cache is dropped
+    whenever `version_fn()` changes (i.e. the long- or short-term collection was modified).
+    The cache only sees the query text, so callers must bypass it for queries that are not
+    self-contained: see `cacheable`, and skip it once a session has chat history.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], Optional[list]],
+        version_fn: Callable[[], Hashable] = lambda: None,
+        threshold: float = 0.92,
+        ttl: float = 30 * 60,
+        max_entries: int = 1024
+    ):
+        self.embed_fn = embed_fn
+        self.version_fn = version_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # allocated on first store, once the dimension is known
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._answers = [None] * max_entries
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    @classmethod
+    def cacheable(cls, query: str) -> bool:
+        """False for time-relative queries and short ones that lean on earlier turns ("tell me more")."""
+        words = cls.normalize(query).split()
+        if len(words) < 2 or TIME_SENSITIVE_WORDS.intersection(words):
+            return False
+        return not (len(words) <= MAX_ANAPHORIC_QUERY_WORDS and ANAPHORIC_WORDS.intersection(words))
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        vec = self.embed_fn(self.normalize(query))
+        if not vec:
+            return None
+        vec = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else None
+
+    def _check_version(self):
+        version = self.version_fn()
+        if version != self._version:
+            self._expires[:] = 0.0
+            self._answers = [None] * self.max_entries
+            self._version = version
+
+    def lookup(self, vec: Optional[np.ndarray]) -> Optional[str]:
+        """Cached answer of the most similar live entry with cosine >= threshold, else None."""
+        if vec is None:
+            return None
+        with self._lock:
+            self._check_version()
+            if self._vectors is None or self._vectors.shape[1] != vec.shape[0]:
+                self.misses += 1
+                return None
+            sims = self._vectors @ vec
+            sims[self._expires <= time.time()] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self.hits += 1
+                return self._answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, vec: Optional[np.ndarray], answer: str):
+        if vec is None:
+            return
+        with self._lock:
+            self._check_version()
+            if self._vectors is None or self._vectors.shape[1] != vec.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+                self._expires[:] = 0.0
+            # Reuse an expired slot if there is one, otherwise the one closest to expiry
+            slot = int(np.argmin(self._expires))
+            self._vectors[slot] = vec
+            self._expires[slot] = time.time() + self.ttl
+            self._answers[slot] = answer
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "live_entries": int(np.count_nonzero(self._expires > time.time())),
+            }
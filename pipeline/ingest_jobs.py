@@ -0,0 +1,133 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback to abort a running ingestion job."""
+
+
+class IngestionJobQueue:
+    """
+    Runs LongTermDatabase.add_data jobs on a bounded executor so upload requests return immediately.
+    Each job records its status (queued/running/completed/failed/cancelled), the ingestion pipeline
+    stats (including docs/sec) and any error. Running jobs are cancelled cooperatively at the next
+    progress report; queued jobs are cancelled before they start.
+    """
+
+    def __init__(self, long_db, max_workers: int = 1, max_history: int = 100):
+        self.long_db = long_db
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._futures = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, filename: Optional[str] = None, cleanup: bool = True) -> str:
+        """Queues ingestion of `path`; the file (and its directory, if emptied) is removed afterwards when cleanup is True."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "filename": filename or os.path.basename(path),
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": {},
+                "docs_per_sec": 0.0,
+                "error": None,
+            }
+            self._cancel_events[job_id] = threading.Event()
+            self._paths[job_id] = (path, cleanup)
+            self._trim_history()
+            self._futures[job_id] = self._executor.submit(self._run, job_id, path, cleanup)
+        return job_id
+
+    def _trim_history(self):
+        finished = [jid for jid, job in self._jobs.items() if job["status"] in ("completed", "failed", "cancelled")]
+        while len(self._jobs) > self.max_history and finished:
+            jid = finished.pop(0)
+            self._jobs.pop(jid, None)
+            self._futures.pop(jid, None)
+            self._cancel_events.pop(jid, None)
+            self._paths.pop(jid, None)
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, path: str, cleanup: bool):
+        cancel_event = self._cancel_events[job_id]
+        try:
+            if cancel_event.is_set():
+                self._update(job_id, status="cancelled", finished_at=time.time())
+                return
+            self._update(job_id, status="running", started_at=time.time())
+
+            def on_progress(stats):
+                self._update(job_id, progress=stats, docs_per_sec=stats.get("docs_per_sec", 0.0))
+                # Once the pipeline has drained, a late cancel must not skip add_data's orphan cleanup
+                if cancel_event.is_set() and not stats.get("finished"):
+                    raise JobCancelled(f"Job {job_id} cancelled.")
+
+            logging.info(f"Ingestion job {job_id}: adding {path} to the long-term database...")
+            stats = self.long_db.add_data(path, progress_callback=on_progress)
+            self._update(job_id, status="completed", progress=stats,
+                         docs_per_sec=stats.get("docs_per_sec", 0.0), finished_at=time.time())
+            logging.info(f"Ingestion job {job_id} completed: {stats}")
+        except JobCancelled:
+            self._update(job_id, status="cancelled", finished_at=time.time())
+            logging.info(f"Ingestion job {job_id} cancelled.")
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            logging.error(f"Ingestion job {job_id} failed: {e}")
+        finally:
+            if cleanup:
+                self._cleanup(path)
+
+    @staticmethod
+    def _cleanup(path: str):
+        if os.path.exists(path):
+            os.remove(path)
+        parent = os.path.dirname(path)
+        if parent and os.path.isdir(parent) and not os.listdir(parent):
+            shutil.rmtree(parent, ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Requests cancellation; returns the job record, or None for an unknown job."""
+        with self._lock:
+            if job_id not in self._jobs:
+                return None
+            self._cancel_events[job_id].set()
+            future = self._futures.get(job_id)
+            if future is not None and future.cancel():
+                # Never started: mark it here and drop the uploaded file
+                self._jobs[job_id].update(status="cancelled", finished_at=time.time())
+                path, cleanup = self._paths[job_id]
+                if cleanup:
+                    self._cleanup(path)
+            return dict(self._jobs[job_id])
+
+    def shutdown(self):
+        for event in self._cancel_events.values():
+            event.set()
+        self._executor.shutdown(wait=False)
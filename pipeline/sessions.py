@@ -0,0 +1,126 @@
+import time
+import heapq
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class Session:
+    """One user's session: the stored value plus locks that serialize that user's agent runs."""
+
+    __slots__ = ("key", "value", "created_at", "last_access", "lock", "_async_lock")
+
+    def __init__(self, key: str, value: Any):
+        self.key = key
+        self.value = value
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.lock = threading.RLock()
+        self._async_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def async_lock(self) -> asyncio.Lock:
+        """asyncio counterpart of `lock`, for handlers running on an event loop."""
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        return self._async_lock
+
+
+class SessionStore:
+    """
+    Bounded, thread-safe session store.
+    Sessions are kept in LRU order and evicted once `capacity` is exceeded; idle sessions expire after
+    `idle_timeout` seconds, tracked with a min-heap of deadlines so each request only pops the sessions
+    that are actually due instead of scanning all of them. `sizeof(value)` estimates a session's memory
+    footprint for stats().
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000,
+        idle_timeout: float = 30 * 60,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.sizeof = sizeof
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._deadlines = []  # (expires_at, key); stale entries are skipped when popped
+        self._lock = threading.Lock()
+        self.created = 0
+        self.hits = 0
+        self.evictions_capacity = 0
+        self.evictions_idle = 0
+
+    def _expire(self, now: float):
+        while self._deadlines and self._deadlines[0][0] <= now:
+            expires_at, key = heapq.heappop(self._deadlines)
+            session = self._sessions.get(key)
+            if session is not None and session.last_access + self.idle_timeout <= now:
+                del self._sessions[key]
+                self.evictions_idle += 1
+        # Every access pushes a deadline; rebuild once stale ones dominate the heap
+        if len(self._deadlines) > 4 * max(len(self._sessions), 16):
+            self._deadlines = [(s.last_access + self.idle_timeout, k) for k, s in self._sessions.items()]
+            heapq.heapify(self._deadlines)
+
+    def get_or_create(self, key: str, factory: Callable[[], Any]) -> Session:
+        """Returns the live session for `key`, creating it with `factory()` if needed."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                session.last_access = now
+                heapq.heappush(self._deadlines, (now + self.idle_timeout, key))
+                self.hits += 1
+                return session
+        # Build outside the store lock so a slow factory does not block other users
+        value = factory()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = Session(key, value)
+                self._sessions[key] = session
+                self.created += 1
+                while len(self._sessions) > self.capacity:
+                    self._sessions.popitem(last=False)
+                    self.evictions_capacity += 1
+            self._sessions.move_to_end(key)
+            session.last_access = time.time()
+            heapq.heappush(self._deadlines, (session.last_access + self.idle_timeout, key))
+            return session
+
+    def get(self, key: str) -> Optional[Session]:
+        with self._lock:
+            self._expire(time.time())
+            return self._sessions.get(key)
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(key, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self, per_session: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.time())
+            sessions = list(self._sessions.values())
+            stats = {
+                "sessions": len(sessions),
+                "capacity": self.capacity,
+                "idle_timeout": self.idle_timeout,
+                "created": self.created,
+                "hits": self.hits,
+                "evictions_capacity": self.evictions_capacity,
+                "evictions_idle": self.evictions_idle,
+            }
+        if self.sizeof is not None:
+            sizes = {s.key: self.sizeof(s.value) for s in sessions}
+            stats["memory_bytes"] = sum(sizes.values())
+            if per_session:
+                stats["per_session_bytes"] = sizes
+        return stats
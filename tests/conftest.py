@@ -0,0 +1,61 @@
+import os
+import re
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'vector_stores'))
+
+# Must be set before `embedding` is imported: the cache path and backend are read at import time
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="ragnarok-tests-"), "embeddings.sqlite3")
+os.environ["EMBEDDING_BACKEND"] = "fake"
+os.environ.setdefault("QDRANT_API_KEY", "test")
+
+import embedding_backends  # noqa: E402
+
+DIM = 768
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _token_vector(token):
+    vec = np.zeros(DIM, dtype=np.float32)
+    vec[zlib.crc32(token.encode("utf-8")) % DIM] = 1.0
+    return vec
+
+
+class FakeBackend(embedding_backends.EmbeddingBackend):
+    """Deterministic bag-of-words embeddings, so tests run without the Space or any model."""
+
+    name = "fake"
+
+    def __init__(self):
+        self.calls = {"/embed_dense": 0, "/embed_sparse": 0, "/embed_colbert": 0}
+
+    def version(self, api_name):
+        return "fake-1"
+
+    def embed(self, texts, api_name, batch_size=None, max_workers=None):
+        self.calls[api_name] += len(texts)
+        return [self._embed_one(text, api_name) for text in texts]
+
+    def _embed_one(self, text, api_name):
+        tokens = _tokens(text) or ["empty"]
+        if api_name == "/embed_sparse":
+            weights = {}
+            for t in tokens:
+                weights[t] = weights.get(t, 0.0) + 1.0
+            return weights
+        if api_name == "/embed_colbert":
+            return [_token_vector(t).tolist() for t in tokens]
+        vec = sum(_token_vector(t) for t in tokens)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+
+embedding_backends.BACKENDS[FakeBackend.name] = FakeBackend
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from pipeline.answer_cache import SemanticAnswerCache
+
+VECTORS = {
+    "what are the hostel fees": [1.0, 0.0, 0.0],
+    "how much are hostel fees": [0.99, 0.1, 0.0],
+    "when does the library close": [0.0, 1.0, 0.0],
+}
+
+
+def make_cache(**kwargs):
+    return SemanticAnswerCache(embed_fn=lambda q: VECTORS.get(q), **kwargs)
+
+
+def test_similar_query_hits_and_unrelated_one_misses():
+    cache = make_cache(threshold=0.9)
+    cache.store(cache.embed("What are the hostel fees?"), "Rs. 40,000 per semester")
+    assert cache.lookup(cache.embed("How much are hostel fees")) == "Rs. 40,000 per semester"
+    assert cache.lookup(cache.embed("When does the library close?")) is None
+    assert cache.lookup(cache.embed("unknown query")) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["live_entries"] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = make_cache(ttl=0.05)
+    vec = cache.embed("what are the hostel fees")
+    cache.store(vec, "answer")
+    assert cache.lookup(vec) == "answer"
+    time.sleep(0.1)
+    assert cache.lookup(vec) is None
+
+
+def test_data_version_change_drops_every_entry():
+    version = [1]
+    cache = make_cache(version_fn=lambda: version[0])
+    vec = cache.embed("what are the hostel fees")
+    cache.store(vec, "answer")
+    version[0] = 2
+    assert cache.lookup(vec) is None
+
+
+def test_full_cache_replaces_the_entry_closest_to_expiry():
+    cache = make_cache(max_entries=2)
+    fees = cache.embed("what are the hostel fees")
+    library = cache.embed("when does the library close")
+    cache.store(fees, "fees")
+    cache.store(library, "library")
+    cache.store(fees, "fees again")
+    assert cache.lookup(library) == "library"
+    assert cache.lookup(fees) == "fees again"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What are the hostel fees?", True),
+    ("When does the central library close during exams", True),
+    ("hi", False),
+    ("Any new notices today?", False),
+    ("What is the latest placement update", False),
+    ("Tell me more", False),
+    ("What about them?", False),
+    ("When is it due", False),
+])
+def test_cacheable(query, expected):
+    assert SemanticAnswerCache.cacheable(query) is expected
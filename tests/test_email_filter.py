@@ -0,0 +1,45 @@
+from tools.email_filter import DEFAULT_BLOCKLIST, HeaderFilter, as_filter
+
+
+def test_match_is_case_insensitive_over_sender_and_subject():
+    f = HeaderFilter(["linkedin", "Security alert"])
+    assert f.match("Jobs <jobs@LinkedIn.com>", "New roles") == "linkedin"
+    assert f.match("accounts@example.com", "SECURITY ALERT for your account") == "Security alert"
+    assert f.match("dean@college.edu", "Exam schedule") is None
+    assert f.match(None, None) is None
+
+
+def test_most_specific_rule_is_credited():
+    f = HeaderFilter(["unstop", "Team Unstop"])
+    assert f.match("Team Unstop <hello@unstop.news>", "") == "Team Unstop"
+
+
+def test_rules_are_escaped_and_deduplicated():
+    f = HeaderFilter(["a.b", "a.b", " ", ""])
+    assert f.rules == ["a.b"]
+    assert f.match("axb", "") is None
+    assert f.match("a.b", "") == "a.b"
+
+
+def test_stats_count_checks_and_drops_per_rule():
+    f = HeaderFilter(["noreply", "kaggle"])
+    f.match("noreply@x.com", "")
+    f.match("noreply@y.com", "")
+    f.match("prof@college.edu", "")
+    assert f.stats() == {"checked": 3, "dropped": 2, "drops_per_rule": {"noreply": 2}}
+
+
+def test_empty_filter_passes_everything():
+    assert HeaderFilter([]).match("noreply@x.com", "Security alert") is None
+
+
+def test_default_blocklist_keeps_feedback_mail():
+    f = HeaderFilter(DEFAULT_BLOCKLIST)
+    assert f.match("dean@college.edu", "Course feedback form") is None
+
+
+def test_as_filter():
+    f = HeaderFilter(["x"])
+    assert as_filter(f) is f
+    assert as_filter(None) is None
+    assert as_filter(["x"]).rules == ["x"]
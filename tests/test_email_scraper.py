@@ -0,0 +1,144 @@
+import json
+
+import pytest
+
+from tools import email_scraper
+from tools.email_scraper import EmailScraper, _uid_set
+
+
+def _expand(uid_set):
+    uids = []
+    for part in uid_set.split(","):
+        a, _, b = part.partition(":")
+        uids.extend(range(int(a), int(b or a) + 1))
+    return uids
+
+
+class FakeIMAP:
+    """Just enough of imaplib.IMAP4 for UID SEARCH/FETCH on one folder of single-part messages."""
+
+    capabilities = ()
+
+    def __init__(self, mailbox):
+        self.mailbox = mailbox  # uid -> (from, subject, body)
+        self.untagged_responses = {}
+
+    def noop(self):
+        return "OK", [b""]
+
+    def select(self, folder, readonly=False):
+        return "OK", [str(len(self.mailbox)).encode()]
+
+    def response(self, code):
+        return code, [b"7"]
+
+    def logout(self):
+        pass
+
+    def uid(self, command, *args):
+        if command == "search":
+            criterion = args[-1]
+            uids = sorted(self.mailbox)
+            if criterion.startswith("UID "):
+                low = int(criterion[4:].split(":")[0])
+                uids = [u for u in uids if u >= low] or uids[-1:]
+            return "OK", [" ".join(map(str, uids)).encode()]
+        uid_set, items = args
+        data = []
+        for seq, uid in enumerate(u for u in _expand(uid_set) if u in self.mailbox):
+            from_, subject, body = self.mailbox[uid]
+            if "HEADER" in items:
+                header = f"From: {from_}\r\nSubject: {subject}\r\n\r\n".encode()
+                data.append((f"{seq + 1} (UID {uid} BODY[HEADER] {{{len(header)}}}".encode(), header))
+            else:
+                data.append((f"{seq + 1} (UID {uid} BODY[1] {{{len(body)}}}".encode(), body.encode()))
+            data.append(b")")
+        return "OK", data
+
+
+@pytest.fixture
+def mailbox():
+    return {uid: (f"dean{uid}@college.edu", f"Notice {uid}", f"Body of notice {uid}") for uid in range(1, 6)}
+
+
+@pytest.fixture
+def make_scraper(tmp_path, monkeypatch, mailbox):
+    monkeypatch.setattr(email_scraper, "EMAIL_SYNC_STATE_PATH", str(tmp_path / "state.json"))
+    monkeypatch.setattr(email_scraper, "EMAIL_DEAD_LETTER_PATH", str(tmp_path / "dead_letter.jsonl"))
+
+    def make(ack_timeout=600, max_deliveries=3):
+        scraper = EmailScraper(username="user", password="secret")
+        scraper._connect = lambda: FakeIMAP(mailbox)
+        scraper.ack_timeout = ack_timeout
+        scraper.max_deliveries = max_deliveries
+        return scraper
+    return make
+
+
+def fetch(scraper, **kwargs):
+    return sorted(map(int, scraper.fetch_new_emails(initial_count=5, **kwargs)))
+
+
+def test_uid_set():
+    assert _uid_set([3, 4, 5, 9]) == "3:5,9"
+    assert _expand("3:5,9") == [3, 4, 5, 9]
+
+
+def test_acknowledged_emails_are_not_delivered_again(make_scraper, mailbox):
+    scraper = make_scraper()
+    assert fetch(scraper) == [1, 2, 3, 4, 5]
+    assert fetch(scraper) == []
+    scraper.ack(["1", "2", "3", "4", "5"])
+    mailbox[6] = ("dean@college.edu", "Late notice", "Body")
+    assert fetch(scraper) == [6]
+    assert fetch(make_scraper()) == [6]  # unacknowledged at restart
+
+
+def test_partial_failure_then_restart_redelivers_only_the_failed_email(make_scraper, mailbox):
+    scraper = make_scraper()
+    assert fetch(scraper) == [1, 2, 3, 4, 5]
+    scraper.ack(["1", "2", "4", "5"])  # 3 failed to embed
+    mailbox[6] = ("dean@college.edu", "New notice", "Body")
+
+    restarted = make_scraper()
+    assert fetch(restarted) == [3, 6]
+    restarted.ack(["3", "6"])
+    assert fetch(make_scraper()) == []
+
+
+def test_unacknowledged_email_is_redelivered_after_the_timeout(make_scraper):
+    scraper = make_scraper(ack_timeout=0)
+    assert fetch(scraper) == [1, 2, 3, 4, 5]
+    scraper.ack(["1", "2", "4", "5"])
+    assert fetch(scraper) == [3]
+    scraper.ack(["3"])
+    assert fetch(scraper) == []
+
+
+def test_email_that_keeps_failing_goes_to_the_dead_letter_log(make_scraper, tmp_path):
+    scraper = make_scraper(ack_timeout=0, max_deliveries=2)
+    assert fetch(scraper) == [1, 2, 3, 4, 5]
+    scraper.ack(["1", "2", "4", "5"])
+    assert fetch(scraper) == [3]  # second and last delivery
+    assert fetch(scraper) == []
+    records = [json.loads(line) for line in (tmp_path / "dead_letter.jsonl").read_text().splitlines()]
+    assert [(r["uid"], r["deliveries"], r["folder"]) for r in records] == [(3, 2, "INBOX")]
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert state["INBOX"]["pending"] == {}
+    assert state["INBOX"]["last_uid"] == 5
+    assert fetch(make_scraper()) == []
+
+
+def test_delivery_count_survives_restarts(make_scraper, tmp_path):
+    assert fetch(make_scraper(max_deliveries=2)) == [1, 2, 3, 4, 5]
+    assert fetch(make_scraper(max_deliveries=2)) == [1, 2, 3, 4, 5]  # crashed before any ack
+    assert fetch(make_scraper(max_deliveries=2)) == []
+    assert len((tmp_path / "dead_letter.jsonl").read_text().splitlines()) == 5
+
+
+def test_blocked_emails_are_never_pending(make_scraper, tmp_path):
+    scraper = make_scraper()
+    assert sorted(map(int, scraper.fetch_new_emails(initial_count=5, blocklist=["dean3@"]))) == [1, 2, 4, 5]
+    scraper.ack(["1", "2", "4", "5"])
+    state = json.loads((tmp_path / "state.json").read_text())
+    assert state["INBOX"] == {"uidvalidity": 7, "last_uid": 5, "pending": {}}
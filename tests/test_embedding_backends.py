@@ -0,0 +1,70 @@
+import importlib.util
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import embedding_backends
+from embedding_backends import EmbeddingBackend, GradioBackend, LocalBackend, bm25_term_weights
+from hybrid_search import to_sparse_vector
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        EmbeddingBackend()
+
+
+def test_bm25_term_weights_saturate_with_term_frequency():
+    weights = bm25_term_weights("Exam exam EXAM schedule")
+    assert set(weights) == {"exam", "schedule"}
+    assert weights["schedule"] < weights["exam"] < 1.2 + 1.0
+    assert bm25_term_weights("?!") == {}
+
+
+def test_local_sparse_terms_share_the_spaces_index_space():
+    # The Space returns {term: weight}; local weights must hash to the same indices
+    space = to_sparse_vector({"hostel": 0.7, "fees": 0.4})
+    local = to_sparse_vector(bm25_term_weights("hostel fees"))
+    assert sorted(local.indices) == sorted(space.indices)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("fastembed") is not None, reason="fastembed is installed")
+def test_local_backend_explains_how_to_install_fastembed():
+    with pytest.raises(RuntimeError, match="pip install fastembed"):
+        LocalBackend()
+
+
+class SlowSpace:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def predict(self, text, api_name):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+        return [float(len(text))]
+
+
+def test_gradio_requests_in_flight_are_capped_across_callers(monkeypatch):
+    monkeypatch.setattr(embedding_backends, "_request_pool", ThreadPoolExecutor(max_workers=2))
+    space = SlowSpace()
+    backend = GradioBackend.__new__(GradioBackend)  # skip connecting to the Space
+    backend.space, backend.client = "test", space
+    results = {}
+
+    def embed(name, texts):
+        results[name] = backend.embed(texts, "/embed_dense", max_workers=8)
+
+    callers = [threading.Thread(target=embed, args=(n, ["a" * n, "bb" * n, "ccc" * n])) for n in (1, 2, 3)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert space.peak == 2
+    assert results[2] == [[2.0], [4.0], [6.0]]
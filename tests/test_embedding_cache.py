@@ -0,0 +1,77 @@
+from embedding_cache import EmbeddingCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return EmbeddingCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_key_depends_on_text_api_and_model_version():
+    key = EmbeddingCache.make_key("hello", "/embed_dense", "v1")
+    assert key == EmbeddingCache.make_key("hello", "/embed_dense", "v1")
+    assert key != EmbeddingCache.make_key("hello", "/embed_sparse", "v1")
+    assert key != EmbeddingCache.make_key("hello", "/embed_dense", "v2")
+    assert key != EmbeddingCache.make_key("hello!", "/embed_dense", "v1")
+
+
+def test_get_set_and_none_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.set("k", [0.1, 0.2])
+    cache.set("failed", None)
+    assert cache.get("k") == [0.1, 0.2]
+    assert cache.get("failed") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["disk_entries"] == 1
+
+
+def test_entries_persist_across_instances(tmp_path):
+    make_cache(tmp_path).set("k", {"indices": [1], "values": [0.5]})
+    assert make_cache(tmp_path).get("k") == {"indices": [1], "values": [0.5]}
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2, memory_entries=1)
+    cache.set("a", [1])
+    cache.set("b", [2])
+    cache.get("a")  # a is now more recent than b
+    cache.set("c", [3])
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["disk_entries"] == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+
+
+def test_frequently_read_keys_survive_eviction(tmp_path):
+    cache = make_cache(tmp_path, max_entries=3, memory_entries=10)
+    for key in "abc":
+        cache.set(key, [key])
+    for _ in range(5):
+        assert cache.get("a") == ["a"]  # memory hits
+    cache.set("d", ["d"])
+    assert cache.get("a") == ["a"]
+    assert cache.get("b") is None
+
+
+def test_read_times_are_written_in_batches(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.TOUCH_BATCH = 3
+    for key in "abc":
+        cache.set(key, [key])
+    before = cache._conn.total_changes
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    assert cache._conn.total_changes == before
+    cache.get("c")
+    assert cache._conn.total_changes == before + 3
+
+
+def test_clear(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("k", [1])
+    cache.clear()
+    assert cache.get("k") is None
+    assert cache.stats()["disk_entries"] == 0
@@ -0,0 +1,45 @@
+from tools.extractive import extractive_summary, split_sentences, textrank_scores
+
+EMAIL = (
+    "The hostel fee payment deadline has been extended to April 15. "
+    "Students who have not paid the hostel fee must pay before the deadline to avoid a fine. "
+    "The mess menu for next week is attached. "
+    "Late hostel fee payment will attract a fine of Rs. 500 per day. "
+    "Regards, Hostel Office."
+)
+
+
+def test_split_sentences_keeps_repeats_once():
+    text = "Exam on Monday. Bring your ID.\nexam on monday.\nThanks"
+    assert split_sentences(text) == ["Exam on Monday.", "Bring your ID.", "Thanks"]
+
+
+def test_short_text_is_returned_whole():
+    assert extractive_summary("Exam on Monday. Bring your ID.") == "Exam on Monday. Bring your ID."
+    assert extractive_summary("") == ""
+    assert extractive_summary(None) == ""
+
+
+def test_summary_fits_budget_and_keeps_original_order():
+    summary = extractive_summary(EMAIL, max_chars=150)
+    assert 0 < len(summary) <= 150
+    sentences = split_sentences(EMAIL)
+    picked = [s for s in sentences if s in summary]
+    assert picked
+    assert [sentences.index(s) for s in picked] == sorted(sentences.index(s) for s in picked)
+    assert "hostel fee" in summary.lower()
+
+
+def test_single_overlong_sentence_is_clipped():
+    text = "word " * 400
+    summary = extractive_summary(text, max_chars=100)
+    assert len(summary) <= 100
+    assert summary.endswith("...")
+
+
+def test_textrank_favours_central_sentences():
+    sentences = split_sentences(EMAIL)
+    scores = textrank_scores(sentences)
+    assert abs(scores.sum() - 1.0) < 1e-3
+    menu = sentences.index("The mess menu for next week is attached.")
+    assert scores[menu] < max(scores)
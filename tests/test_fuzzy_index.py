@@ -0,0 +1,46 @@
+from fuzzy_index import FuzzyTermIndex, _within_one_edit
+
+
+def test_within_one_edit():
+    assert _within_one_edit("exam", "exam")
+    assert _within_one_edit("exam", "exams")
+    assert _within_one_edit("exam", "exm")
+    assert _within_one_edit("exam", "exan")
+    assert not _within_one_edit("exam", "exxan")
+    assert not _within_one_edit("exam", "examss")
+
+
+def test_match_finds_documents_within_one_edit():
+    index = FuzzyTermIndex()
+    index.add_document(1, "Mid-semester examination schedule")
+    index.add_document(2, "Hostel mess menu")
+    assert index.match(["examinaton"]) == {"1": ["examination"]}
+    assert index.match(["hostle"]) == {}  # a transposition is two edits
+    assert index.match(["hostels", "menu"]) == {"2": ["hostel", "menu"]}
+
+
+def test_short_words_are_ignored():
+    index = FuzzyTermIndex(min_token_len=3)
+    index.add_document("a", "an ox is on it")
+    assert len(index.tokenize("an ox is on it")) == 0
+    assert index.match(["ox"]) == {}
+
+
+def test_removing_the_last_document_drops_its_tokens():
+    index = FuzzyTermIndex()
+    index.add_document("a", "library timings")
+    index.add_document("b", "library fine")
+    index.remove_document("a")
+    assert index.similar_tokens("timing") == set()
+    assert index.match(["library"]) == {"b": ["library"]}
+    index.remove_document("b")
+    assert index.similar_tokens("library") == set()
+    assert len(index) == 0
+
+
+def test_re_adding_a_document_replaces_its_tokens():
+    index = FuzzyTermIndex()
+    index.add_document("a", "placement drive")
+    index.add_document("a", "internship drive")
+    assert index.match(["placement"]) == {}
+    assert index.match(["internship"]) == {"a": ["internship"]}
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from ingestion import AdaptiveBatchSizer, IngestionPipeline, iter_json_chunks
+
+
+def test_batch_sizer_grows_additively_and_halves_on_slow_or_failed_batches():
+    sizer = AdaptiveBatchSizer(initial=16, minimum=2, maximum=40, target_latency=1.0)
+    sizer.record(0.1)
+    assert sizer.size == 20
+    sizer.record(5.0)
+    assert sizer.size == 10
+    sizer.record(0.1, ok=False)
+    assert sizer.size == 5
+    for _ in range(20):
+        sizer.record(0.1)
+    assert sizer.size == 40
+    for _ in range(10):
+        sizer.record(0.1, ok=False)
+    assert sizer.size == 2
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_iter_json_chunks_list_dict_and_long_documents(tmp_path, stream):
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps([{"a": "x" * 30}, {"b": 1}]), encoding="utf-8")
+    chunks = list(iter_json_chunks(str(path), max_chunk_chars=20, stream=stream))
+    assert [cid for cid, _ in chunks] == ["docs_0_0", "docs_0_1", "docs_1"]
+    assert all(len(text) <= 20 for _, text in chunks)
+
+    path.write_text(json.dumps({"k1": "v1", "k2": "v2"}), encoding="utf-8")
+    assert [cid for cid, _ in iter_json_chunks(str(path), stream=stream)] == ["docs_k1", "docs_k2"]
+
+
+@pytest.mark.parametrize("data", [
+    ["first notice", "second notice", "x" * 50],
+    [{"a": 1}, "mixed", {"b": 2.5}],
+    [{"a": 1}, {"b": [1, 2.5, None, True]}],
+    [],
+    {"k1": ["v", 1], "k2": {"nested": "x" * 50}},
+    "just a string",
+    42,
+])
+def test_iter_json_chunks_stream_and_non_stream_agree(tmp_path, data):
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    streamed = list(iter_json_chunks(str(path), max_chunk_chars=20, stream=True))
+    loaded = list(iter_json_chunks(str(path), max_chunk_chars=20, stream=False))
+    assert streamed == loaded
+
+
+def test_list_holding_non_objects_is_one_document(tmp_path):
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps(["a", "b"]), encoding="utf-8")
+    assert list(iter_json_chunks(str(path))) == [("docs_0", '["a", "b"]')]
+
+
+def test_pipeline_embeds_upserts_and_reports():
+    upserted = []
+    reports = []
+    pipeline = IngestionPipeline(
+        embed_fn=lambda batch: [None if cid == "bad" else cid for cid, _ in batch],
+        upsert_fn=upserted.extend,
+        embed_batch_size=3,
+        progress_callback=reports.append,
+        progress_every=0.0
+    )
+    chunks = [(f"c{i}", "text") for i in range(10)] + [("bad", "text")]
+    stats = pipeline.run(chunks)
+    assert sorted(upserted) == sorted(f"c{i}" for i in range(10))
+    assert stats["chunks_read"] == 11
+    assert stats["embed_failures"] == 1
+    assert stats["points_upserted"] == 10
+    assert reports[-1]["finished"] is True
+    assert not any(r["finished"] for r in reports[:-1])
+
+
+def test_pipeline_retries_failed_upserts_then_raises():
+    attempts = []
+
+    def flaky(points):
+        attempts.append(len(points))
+        if len(attempts) == 1:
+            raise RuntimeError("transient")
+
+    pipeline = IngestionPipeline(embed_fn=lambda batch: [cid for cid, _ in batch], upsert_fn=flaky)
+    pipeline.run([("a", "t"), ("b", "t")])
+    assert pipeline.stats["upsert_retries"] == 1
+    assert pipeline.stats["points_upserted"] == 2
+
+    def broken(points):
+        raise RuntimeError("down")
+
+    pipeline = IngestionPipeline(embed_fn=lambda batch: [cid for cid, _ in batch], upsert_fn=broken, max_retries=0)
+    with pytest.raises(RuntimeError):
+        pipeline.run([("a", "t")])
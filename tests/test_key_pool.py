@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from agents.key_pool import GroqKeyPool, _parse_duration, load_groq_api_keys
+
+
+@pytest.mark.parametrize("value, seconds", [("2m59.56s", 179.56), ("7.66s", 7.66), ("120ms", 0.12), ("1h", 3600.0), ("30", 30.0)])
+def test_parse_duration(value, seconds):
+    assert _parse_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_duration_rejects_missing_or_malformed_values(value):
+    assert _parse_duration(value) is None
+
+
+def test_load_keys_skips_unset(monkeypatch):
+    for name in ["GROQ_API_KEY"] + [f"GROQ_API_KEY{i}" for i in range(1, 11)]:
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(ValueError):
+        load_groq_api_keys()
+    monkeypatch.setenv("GROQ_API_KEY", "a")
+    monkeypatch.setenv("GROQ_API_KEY3", "b")
+    assert load_groq_api_keys() == ["a", "b"]
+
+
+def headers(remaining, limit=100):
+    return {"x-ratelimit-limit-requests": str(limit), "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": "60s"}
+
+
+def test_calls_go_to_the_key_with_most_headroom():
+    pool = GroqKeyPool(["k1", "k2"])
+    pool.record_response("k1", 200, headers(5))
+    pool.record_response("k2", 200, headers(80))
+    key, wait = pool.acquire()
+    assert (key, wait) == ("k2", 0.0)
+    pool.release(key)
+
+
+def test_rate_limited_key_is_cooled_down_and_skipped():
+    pool = GroqKeyPool(["k1", "k2"])
+    pool.record_response("k1", 200, headers(90))
+    pool.record_response("k2", 200, headers(10))
+    pool.record_response("k1", 429, {"retry-after": "30"})
+    for _ in range(3):
+        key, wait = pool.acquire()
+        assert (key, wait) == ("k2", 0.0)
+        pool.release(key)
+    stats = {s["key"]: s for s in pool.stats()}
+    assert stats["...k1"]["rate_limited"] == 1
+    assert 29 <= stats["...k1"]["cooldown_seconds"] <= 30
+
+
+def test_when_every_key_is_cooling_down_the_soonest_one_is_returned_with_a_wait():
+    pool = GroqKeyPool(["k1", "k2"], base_cooldown=1.0)
+    pool.record_response("k1", 429, {"retry-after": "10"})
+    pool.record_response("k2", 429, {"retry-after": "2"})
+    key, wait = pool.acquire()
+    assert key == "k2"
+    assert 1.5 < wait <= 2.0
+
+
+def test_exclude_moves_a_retry_to_another_key():
+    pool = GroqKeyPool(["k1", "k2"])
+    first, _ = pool.acquire()
+    second, _ = pool.acquire(exclude={first})
+    assert {first, second} == {"k1", "k2"}
+    pool.release(first)
+    pool.release(second)
+    assert all(s["inflight"] == 0 for s in pool.stats())
+
+
+def test_in_flight_calls_spread_across_keys():
+    pool = GroqKeyPool(["k1", "k2"])
+    pool.record_response("k1", 200, headers(50))
+    pool.record_response("k2", 200, headers(50))
+    keys = {pool.acquire()[0] for _ in range(4)}
+    assert keys == {"k1", "k2"}
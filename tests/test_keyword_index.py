@@ -0,0 +1,15 @@
+from qdrant_client.models import MatchText
+
+from keyword_index import keyword_filter, query_terms
+
+
+def test_query_terms_drop_stopwords_short_tokens_and_repeats():
+    assert query_terms("What is the mess menu for the week?") == ["mess", "menu", "week"]
+    assert query_terms("Tell me about CS-301 exam, the CS-301 EXAM") == ["301", "exam"]
+    assert query_terms("is it on?") == []
+
+
+def test_keyword_filter_matches_any_term():
+    f = keyword_filter(["mess", "menu"])
+    assert [c.match for c in f.should] == [MatchText(text="mess"), MatchText(text="menu")]
+    assert all(c.key == "document" for c in f.should)
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+from qdrant_client import QdrantClient
+
+import embedding
+import embedding_backends
+import L_vecdB
+
+
+@pytest.fixture
+def long_db(monkeypatch):
+    monkeypatch.setattr(L_vecdB, "QdrantClient", lambda **kwargs: QdrantClient(":memory:"))
+    db = L_vecdB.LongTermDatabase(api_key="test")
+    db._sparse_backfill.join()
+    return db
+
+
+class SmallDenseBackend(embedding_backends.BACKENDS["fake"]):
+    def version(self, api_name):
+        return "fake-384"
+
+    def _embed_one(self, text, api_name):
+        vec = super()._embed_one(text, api_name)
+        return vec[:384] if api_name == "/embed_dense" else vec
+
+
+def test_startup_fails_on_a_dense_size_mismatch(monkeypatch):
+    monkeypatch.setattr(L_vecdB, "QdrantClient", lambda **kwargs: QdrantClient(":memory:"))
+    monkeypatch.setattr(embedding, "backend", SmallDenseBackend())
+    with pytest.raises(RuntimeError, match="384-dim dense vectors"):
+        L_vecdB.LongTermDatabase(api_key="test")
+
+
+def write_json(path, docs):
+    path.write_text(json.dumps(docs), encoding="utf-8")
+    return str(path)
+
+
+def stored_documents(db):
+    points, _ = db.client.scroll(db.collection_name, limit=100, with_payload=True)
+    return sorted(p.payload["document"] for p in points)
+
+
+DOCS = [
+    {"title": "Hostel fees", "text": "Hostel fee payment deadline is March 31"},
+    {"title": "Library", "text": "The library is open until midnight during exams"},
+    {"title": "Placement", "text": "Placement season starts with a resume workshop"},
+]
+
+
+def test_add_data_indexes_every_document(long_db, tmp_path):
+    stats = long_db.add_data(write_json(tmp_path / "notices.json", DOCS))
+    assert stats["points_upserted"] == 3
+    assert stats["chunks_unchanged"] == 0
+    assert stats["finished"] is True
+    assert len(stored_documents(long_db)) == 3
+    assert long_db.data_version > 0
+
+
+def test_reingest_skips_unchanged_and_removes_orphans(long_db, tmp_path):
+    path = tmp_path / "notices.json"
+    long_db.add_data(write_json(path, DOCS))
+    calls_before = embedding.backend.calls["/embed_dense"]
+
+    edited = [dict(DOCS[0], text="Hostel fee payment deadline moved to April 15"), DOCS[1]]
+    stats = long_db.add_data(write_json(path, edited))
+
+    assert stats["points_upserted"] == 1
+    assert stats["chunks_unchanged"] == 1
+    assert stats["chunks_deleted"] == 1
+    # Only the edited chunk was embedded again
+    assert embedding.backend.calls["/embed_dense"] - calls_before == 1
+    documents = stored_documents(long_db)
+    assert len(documents) == 2
+    assert any("April 15" in d for d in documents)
+    assert not any("Placement" in d for d in documents)
+
+
+def test_reingest_of_identical_file_writes_nothing(long_db, tmp_path):
+    path = write_json(tmp_path / "notices.json", DOCS)
+    long_db.add_data(path)
+    version = long_db.data_version
+    stats = long_db.add_data(path)
+    assert stats["points_upserted"] == 0
+    assert stats["chunks_unchanged"] == 3
+    assert long_db.data_version == version
+
+
+def test_smart_query_ranks_matching_document_first(long_db, tmp_path):
+    long_db.add_data(write_json(tmp_path / "notices.json", DOCS))
+    results = long_db.smart_query("library midnight exams", topk=5, top_l=3)
+    assert results
+    assert "library" in results[0].lower()
+
+
+def test_smart_query_without_late_rerank_or_keywords(long_db, tmp_path):
+    long_db.add_data(write_json(tmp_path / "notices.json", DOCS))
+    results = long_db.smart_query("resume workshop placement", topk=5, top_l=3, use_late=False, doc_search=False)
+    assert results
+    assert "placement" in results[0].lower()
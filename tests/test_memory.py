@@ -0,0 +1,68 @@
+import time
+
+from agents.memory import TokenBudgetMemory, count_tokens, truncate_tokens
+
+
+def wait_for_summary(memory, timeout=5.0):
+    deadline = time.time() + timeout
+    while memory._summarizing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def history_tokens(memory):
+    return sum(count_tokens(m.content) for m in memory.load_memory_variables()["chat_history"])
+
+
+def test_truncate_tokens_keeps_start_or_end():
+    text = " ".join(f"word{i}" for i in range(200))
+    head = truncate_tokens(text, 10)
+    tail = truncate_tokens(text, 10, keep_end=True)
+    assert count_tokens(head) <= 10 and text.startswith(head)
+    assert count_tokens(tail) <= 10 and text.endswith(tail)
+    assert truncate_tokens("short", 10) == "short"
+    assert truncate_tokens("anything", 0) == ""
+
+
+def test_recent_turns_are_kept_verbatim_within_budget():
+    memory = TokenBudgetMemory(recent_tokens=1000)
+    memory.save_context({"input": "hi"}, {"output": "hello"})
+    messages = memory.load_memory_variables()["chat_history"]
+    assert [m.content for m in messages] == ["hi", "hello"]
+    assert [m.type for m in messages] == ["human", "ai"]
+
+
+def test_older_turns_are_folded_into_the_summary():
+    prompts = []
+
+    def summarize(prompt):
+        prompts.append(prompt)
+        return f"summary after {len(prompts)} call(s)"
+
+    memory = TokenBudgetMemory(summarize_fn=summarize, summary_tokens=50, recent_tokens=60)
+    for i in range(10):
+        memory.save_context({"input": f"question {i} " + "about fees " * 5}, {"output": f"answer {i} " + "rupees " * 5})
+        wait_for_summary(memory)
+    messages = memory.load_memory_variables()["chat_history"]
+    assert prompts
+    assert messages[0].type == "system" and "summary after" in messages[0].content
+    assert messages[-2].content.startswith("question 9")
+    assert history_tokens(memory) <= 50 + 60 + 10  # plus the summary prefix
+
+
+def test_history_stays_bounded_when_summarization_fails():
+    def broken(prompt):
+        raise RuntimeError("LLM down")
+
+    memory = TokenBudgetMemory(summarize_fn=broken, summary_tokens=40, recent_tokens=40)
+    for i in range(30):
+        memory.save_context({"input": "long question " * 20}, {"output": "long answer " * 20})
+    wait_for_summary(memory)
+    assert history_tokens(memory) <= 40 + 40 + 10
+
+
+def test_clear():
+    memory = TokenBudgetMemory()
+    memory.save_context({"input": "hi"}, {"output": "hello"})
+    memory.clear()
+    assert memory.messages == []
+    assert memory.load_memory_variables() == {"chat_history": []}
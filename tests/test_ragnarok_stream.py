@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("gradio_client")
+
+from pipeline.RAGnarok import RAGnarok  # noqa: E402
+
+
+def slow_rag(release, finished):
+    rag = RAGnarok.__new__(RAGnarok)  # no databases or LLM needed
+
+    def invoke(query, callbacks=None):
+        callbacks[0].emit({"type": "tool", "tool": "retrieval_tool_long"})
+        release.wait(5)
+        finished.set()
+        return "answer"
+    rag.invoke = invoke
+    return rag
+
+
+def test_stream_runs_to_completion():
+    release, finished = threading.Event(), threading.Event()
+    release.set()
+    events = list(slow_rag(release, finished).stream("hello"))
+    assert events[-1] == {"type": "final", "response": "answer"}
+
+
+def test_closing_the_stream_waits_for_the_agent():
+    release, finished = threading.Event(), threading.Event()
+    session_lock = threading.Lock()
+    rag = slow_rag(release, finished)
+
+    def respond():
+        # What app.py's generator does; the client disconnects after the first event
+        with session_lock:
+            stream = rag.stream("hello")
+            next(stream)
+            stream.close()
+
+    client = threading.Thread(target=respond)
+    client.start()
+    client.join(0.2)
+    assert client.is_alive() and session_lock.locked()  # still held while the agent runs
+    release.set()
+    client.join(5)
+    assert finished.is_set() and not session_lock.locked()
+
+
+def test_closing_the_async_stream_waits_for_the_agent():
+    finished = []
+    rag = RAGnarok.__new__(RAGnarok)
+
+    async def ainvoke(query, callbacks=None):
+        callbacks[0].emit({"type": "tool", "tool": "retrieval_tool_long"})
+        await asyncio.sleep(0.1)
+        finished.append(query)
+        return "answer"
+    rag.ainvoke = ainvoke
+
+    async def respond():
+        stream = rag.astream("hello")
+        await stream.__anext__()
+        await stream.aclose()
+        return list(finished)
+
+    assert asyncio.run(respond()) == ["hello"]
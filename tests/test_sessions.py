@@ -0,0 +1,55 @@
+import time
+
+from pipeline.sessions import SessionStore
+
+
+def test_get_or_create_reuses_live_sessions():
+    store = SessionStore(capacity=10)
+    built = []
+
+    def factory():
+        built.append(1)
+        return {"history": []}
+
+    first = store.get_or_create("alice", factory)
+    second = store.get_or_create("alice", factory)
+    assert first is second
+    assert len(built) == 1
+    assert store.stats()["created"] == 1
+    assert store.stats()["hits"] == 1
+
+
+def test_least_recently_used_session_is_evicted_at_capacity():
+    store = SessionStore(capacity=2)
+    store.get_or_create("a", dict)
+    store.get_or_create("b", dict)
+    store.get_or_create("a", dict)  # b is now the least recently used
+    store.get_or_create("c", dict)
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.stats()["evictions_capacity"] == 1
+
+
+def test_idle_sessions_expire_but_active_ones_stay():
+    store = SessionStore(idle_timeout=0.2)
+    store.get_or_create("idle", dict)
+    store.get_or_create("active", dict)
+    time.sleep(0.12)
+    store.get_or_create("active", dict)
+    time.sleep(0.12)
+    assert store.get("idle") is None
+    assert store.get("active") is not None
+    assert store.stats()["evictions_idle"] == 1
+
+
+def test_remove_and_memory_stats():
+    store = SessionStore(sizeof=len)
+    store.get_or_create("a", lambda: "x" * 10)
+    store.get_or_create("b", lambda: "y" * 5)
+    stats = store.stats(per_session=True)
+    assert stats["memory_bytes"] == 15
+    assert stats["per_session_bytes"] == {"a": 10, "b": 5}
+    assert store.remove("a") is True
+    assert store.remove("a") is False
+    assert store.stats()["sessions"] == 1
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from qdrant_client import QdrantClient
+
+import S_vecdB
+from tools.email_filter import HeaderFilter
+
+
+@pytest.fixture
+def short_db(monkeypatch):
+    monkeypatch.setattr(S_vecdB, "QdrantClient", lambda **kwargs: QdrantClient(":memory:"))
+    db = S_vecdB.ShortTermDatabase(qdrant_api_key="test")
+    db._sparse_backfill.join()
+    return db
+
+
+def test_flush_removes_every_point_and_invalidates_caches(short_db):
+    # More than one scroll page
+    emails = [{"id": f"<msg-{i}@college.edu>", "body": f"Notice {i} about the hostel exam"} for i in range(300)]
+    short_db.add_emails_batch(emails, batch_size=100)
+    assert short_db.client.count(collection_name=short_db.collection_name).count == 300
+    assert short_db._fuzzy_index.match(["hostels"])
+    version = short_db.data_version
+
+    short_db.flush_to_long_term()
+
+    assert short_db.client.count(collection_name=short_db.collection_name).count == 0
+    assert short_db._fuzzy_index.match(["hostels"]) == {}
+    assert short_db.data_version > version
+
+
+def test_flush_of_an_empty_collection(short_db):
+    short_db.flush_to_long_term()
+    assert short_db.client.count(collection_name=short_db.collection_name).count == 0
+
+
+def test_filter_stage_checks_each_email_once_and_acks_blocked_ones(short_db, monkeypatch):
+    monkeypatch.setattr(S_vecdB, "default_filter", HeaderFilter(["noreply"]))
+    acked = []
+    short_db.ack_emails = acked.extend
+    emails = [
+        {"id": "1", "from": "dean@college.edu", "subject": "Exam schedule", "body": "..."},
+        {"id": "2", "from": "noreply@github.com", "subject": "New sign-in", "body": "..."},
+    ]
+    kept = short_db._filter_emails(emails)
+    assert [email["id"] for email in kept] == ["1"]
+    assert acked == ["2"]
+    assert S_vecdB.default_filter.stats() == {"checked": 2, "dropped": 1, "drops_per_rule": {"noreply": 1}}
+
+
+class NoHitsAsyncClient:
+    async def query_points(self, **kwargs):
+        return []
+
+
+def test_async_query_loads_the_fuzzy_index_on_the_given_pool(short_db):
+    short_db.add_emails_batch([{"id": "1", "body": "Hostel fees are due on Friday"}])
+    short_db._async_client = NoHitsAsyncClient()
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval-test")
+    threads = []
+    ensure = short_db._ensure_fuzzy_index
+    short_db._ensure_fuzzy_index = lambda: threads.append(threading.current_thread().name) or ensure()
+
+    assert asyncio.run(short_db.asmart_query("hostels", executor=pool)) == []
+    assert len(threads) == 1 and threads[0].startswith("retrieval-test")
+    assert short_db._fuzzy_index_ready
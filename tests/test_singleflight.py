@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def slow(x):
+        runs.append(x)
+        release.wait(2)
+        return x * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow, 21))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == [42] * 5
+    assert runs == [21]
+    assert flight.stats() == {"calls": 1, "shared": 4}
+
+
+def test_errors_reach_every_waiter_and_nothing_is_cached():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("k", boom)
+    # The failed call is not remembered: the next caller runs fn again
+    assert flight.do("k", lambda: "ok") == "ok"
+    assert flight.stats()["calls"] == 2
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats() == {"calls": 2, "shared": 0}
+
+
+def test_async_callers_share_one_task():
+    flight = SingleFlight()
+    runs = []
+
+    async def slow():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("k", slow) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["done"] * 4
+    assert len(runs) == 1
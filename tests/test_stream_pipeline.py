@@ -0,0 +1,66 @@
+import threading
+import time
+
+from stream_pipeline import Stage, StreamingPipeline
+
+
+def make_source(items):
+    batches = [items[i:i + 3] for i in range(0, len(items), 3)]
+    lock = threading.Lock()
+
+    def source():
+        with lock:
+            return batches.pop(0) if batches else []
+    return source
+
+
+def test_items_flow_through_every_stage():
+    sink = []
+    pipeline = StreamingPipeline(
+        source=make_source(list(range(10))),
+        stages=[
+            Stage("double", lambda batch: [x * 2 for x in batch], workers=2, batch_size=4, linger=0.01),
+            Stage("multiples_of_4", lambda batch: [x for x in batch if x % 4 == 0]),
+            Stage("sink", lambda batch: sink.extend(batch) or batch),
+        ],
+        poll_interval=0.01
+    )
+    pipeline.start()
+    for _ in range(200):
+        if pipeline.stages[0].items_in == 10 and pipeline.stages[2].items_in == 5:
+            break
+        time.sleep(0.01)
+    pipeline.stop(timeout=5)
+    assert not pipeline.running
+    assert sorted(sink) == [0, 4, 8, 12, 16]
+    stats = pipeline.stats()["stages"]
+    assert stats["fetch"]["out"] == 10
+    assert stats["double"]["out"] == 10
+    assert stats["multiples_of_4"]["dropped"] == 5
+
+
+def test_failing_batches_are_retried_then_dropped():
+    attempts = []
+
+    def flaky(batch):
+        attempts.append(batch)
+        if len(attempts) == 1:
+            raise RuntimeError("transient")
+        return batch
+
+    def broken(batch):
+        raise RuntimeError("down")
+
+    pipeline = StreamingPipeline(
+        source=make_source([1, 2]),
+        stages=[Stage("flaky", flaky, batch_size=2, linger=0.05, retries=1), Stage("broken", broken)],
+        poll_interval=0.01
+    )
+    pipeline.start()
+    for _ in range(300):
+        if pipeline.stages[1].errors == 2:
+            break
+        time.sleep(0.01)
+    pipeline.stop(timeout=5)
+    assert pipeline.stages[0].items_out == 2
+    assert pipeline.stages[1].errors == 2
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("gradio_client")
+
+from tools.sumar import SummarizerService  # noqa: E402
+
+
+def make_service(remote, **kwargs):
+    kwargs.setdefault("local", lambda text: "local summary")
+    service = SummarizerService(**kwargs)
+    service._remote = remote
+    return service
+
+
+def counting_remote(calls, delay=0.0):
+    lock = threading.Lock()
+
+    def remote(text):
+        with lock:
+            calls.append(text)
+        time.sleep(delay)
+        return f"summary of {text.split()[0]}"
+    return remote
+
+
+def test_results_are_cached_by_normalized_text():
+    calls = []
+    service = make_service(counting_remote(calls))
+    assert service.summarize("exam  notice\n") == "summary of exam"
+    assert service.summarize("exam notice") == "summary of exam"
+    assert len(calls) == 1
+    assert service.stats()["cache_hits"] == 1
+
+
+def test_concurrent_requests_for_the_same_text_share_one_call():
+    calls = []
+    service = make_service(counting_remote(calls, delay=0.05), workers=4)
+    summaries = service.summarize_many(["fee notice", "fee notice", "mess menu"])
+    assert summaries == ["summary of fee", "summary of fee", "summary of mess"]
+    assert sorted(calls) == ["fee notice", "mess menu"]
+
+
+def test_slow_calls_fall_back_to_the_local_summary_and_are_not_cached():
+    calls = []
+    service = make_service(counting_remote(calls, delay=0.3), timeout=0.05, mode="fallback")
+    assert service.summarize("slow notice") == "local summary"
+    assert service.stats()["timeouts"] == 1
+    assert service.stats()["fallbacks"] == 1
+    time.sleep(0.4)
+    # The late remote result is cached once it arrives
+    assert service.summarize("slow notice") == "summary of slow"
+
+
+def test_remote_mode_raises_on_failure():
+    def broken(text):
+        raise RuntimeError("Space down")
+
+    service = make_service(broken, mode="remote")
+    with pytest.raises(RuntimeError):
+        service.summarize("anything")
+    assert service.stats()["failures"] == 1
+
+
+def test_local_mode_never_calls_the_space():
+    calls = []
+    service = make_service(counting_remote(calls), mode="local")
+    assert service.summarize_many(["a notice", "b notice"]) == ["local summary", "local summary"]
+    assert calls == []
+    assert service.stats()["local"] == 2
+
+
+def test_refine_mode_answers_locally_then_reports_the_remote_summary():
+    refined = {}
+    done = threading.Event()
+
+    def on_refined(index, summary):
+        refined[index] = summary
+        done.set()
+
+    service = make_service(counting_remote([], delay=0.05), mode="refine")
+    assert service.summarize_many(["fee notice"], on_refined=on_refined) == ["local summary"]
+    assert done.wait(2)
+    assert refined == {0: "summary of fee"}
+    # Once cached, the remote summary is returned directly
+    assert service.summarize_many(["fee notice"], on_refined=on_refined) == ["summary of fee"]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        SummarizerService(mode="fast")
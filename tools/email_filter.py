@@ -0,0 +1,66 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+# Senders/subjects dropped before they are summarized or embedded.
+# Rules are case-insensitive substrings, so keep them specific: a bare "feed" would also drop "Feedback".
+DEFAULT_BLOCKLIST = [
+    "no-reply@accounts.google.com", "Security alert", "unstop", "linkedin", "kaggle", "Team Unstop",
+    "Canva", "noreply@github.com", "noreply", "onrender", "UptimeRobot"
+]
+
+
+class HeaderFilter:
+    """
+    Compiled blocklist over envelope headers (From, Subject). All rules are folded into one
+    case-insensitive regex alternation, so a check is a single scan of the header text no matter
+    how many rules there are; drops are counted per rule.
+    """
+
+    def __init__(self, rules: Iterable[str]):
+        self.rules = list(OrderedDict.fromkeys(r.strip() for r in rules if r and r.strip()))
+        # Longer rules first so the most specific one is credited when several match at one position
+        ordered = sorted(range(len(self.rules)), key=lambda i: -len(self.rules[i]))
+        self._pattern = re.compile(
+            "|".join(f"(?P<r{i}>{re.escape(self.rules[i].casefold())})" for i in ordered)
+        ) if self.rules else None
+        self._drops = [0] * len(self.rules)
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    def match(self, from_: Optional[str], subject: Optional[str]) -> Optional[str]:
+        """Returns the rule that blocks this email (and counts the drop), or None if it passes."""
+        with self._lock:
+            self._checked += 1
+        if self._pattern is None:
+            return None
+        m = self._pattern.search(f"{from_ or ''}\n{subject or ''}".casefold())
+        if not m:
+            return None
+        index = int(m.lastgroup[1:])
+        with self._lock:
+            self._drops[index] += 1
+        return self.rules[index]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self._checked,
+                "dropped": sum(self._drops),
+                "drops_per_rule": {rule: n for rule, n in zip(self.rules, self._drops) if n},
+            }
+
+
+def as_filter(blocklist) -> Optional[HeaderFilter]:
+    """Accepts a HeaderFilter, a list of rules, or None."""
+    if blocklist is None or isinstance(blocklist, HeaderFilter):
+        return blocklist
+    return HeaderFilter(blocklist)
+
+
+# Applied by the short-term worker's filter stage (and the scraper CLI); EMAIL_BLOCKLIST (comma-separated) overrides the defaults
+default_filter = HeaderFilter(
+    os.getenv("EMAIL_BLOCKLIST").split(",") if os.getenv("EMAIL_BLOCKLIST") else DEFAULT_BLOCKLIST
+)
@@ -1,21 +1,111 @@
 import os
+import sys
+import re
+import json
+import time
+import select
 import imaplib
+import threading
 import email
+from collections import OrderedDict
 from email.header import decode_header
 from dotenv import load_dotenv
 import logging
 
+# Add the project root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.email_filter import as_filter, default_filter
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Load environment variables from .env file
 load_dotenv()
 
+# UIDVALIDITY, last-seen UID and unacknowledged UIDs per folder, so incremental syncs survive restarts
+EMAIL_SYNC_STATE_PATH = os.getenv("EMAIL_SYNC_STATE_PATH", ".email_sync_state.json")
+
+# Emails not acknowledged within EMAIL_ACK_TIMEOUT seconds are delivered again, up to EMAIL_MAX_DELIVERIES
+# times; then they are appended to the dead-letter log (one JSON object per line) and given up on
+EMAIL_ACK_TIMEOUT = float(os.getenv("EMAIL_ACK_TIMEOUT", 600))
+EMAIL_MAX_DELIVERIES = int(os.getenv("EMAIL_MAX_DELIVERIES", 3))
+EMAIL_DEAD_LETTER_PATH = os.getenv("EMAIL_DEAD_LETTER_PATH", ".email_dead_letter.jsonl")
+
+# Gmail drops an IDLE after ~29 minutes; re-issue it before that
+MAX_IDLE_SECONDS = 25 * 60
+
+# UIDs per FETCH command: one round trip per batch instead of one per message
+FETCH_BATCH_SIZE = int(os.getenv("EMAIL_FETCH_BATCH_SIZE", 200))
+
+# Only the envelope headers and the first MIME part are downloaded; attachments never are
+HEADER_ITEMS = "(UID BODY.PEEK[HEADER])"
+BODY_ITEMS = "(UID BODY.PEEK[1.MIME] BODY.PEEK[1])"
+
+_FETCH_ITEM = re.compile(rb"(BODY\[[^\]]*\])(?:<\d+>)? \{\d+\}$")
+
 # Function to clean text
 def clean(text):
     return "".join(c if c.isalnum() else "_" for c in text)
 
+
+def decode_subject(msg):
+    subject, encoding = decode_header(msg["Subject"] or "")[0]
+    if isinstance(subject, bytes):
+        subject = subject.decode(encoding if encoding else "utf-8", errors="replace")
+    return subject
+
+
+def first_text(msg):
+    """Body is the first decodable (leaf) part of the message."""
+    if msg.is_multipart():
+        for part in msg.walk():
+            try:
+                return part.get_payload(decode=True).decode()
+            except:
+                pass
+        return ""
+    return msg.get_payload(decode=True).decode()
+
+
+def _uid_set(uids):
+    """Compresses sorted UIDs into an IMAP sequence set, e.g. [3, 4, 5, 9] -> '3:5,9'."""
+    ranges = []
+    for uid in uids:
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(f"{a}:{b}" if a != b else str(a) for a, b in ranges)
+
+
+def _parse_fetch(data):
+    """Groups a multi-item FETCH response into {uid: {item_name: bytes}}; the UID may come before or after the items."""
+    messages = []
+    for part in data or []:
+        prefix, payload = part if isinstance(part, tuple) else (part, None)
+        if not isinstance(prefix, bytes):
+            continue
+        if re.match(rb"\d+ \(", prefix):
+            messages.append({})
+        if not messages:
+            continue
+        match = re.search(rb"UID (\d+)", prefix)
+        if match:
+            messages[-1]["UID"] = int(match.group(1))
+        item = _FETCH_ITEM.search(prefix)
+        if item and payload is not None:
+            messages[-1][item.group(1).decode()] = payload
+    return {m.pop("UID"): m for m in messages if "UID" in m}
+
+
 class EmailScraper:
+    """
+    Gmail IMAP client over one long-lived connection: it is opened on first use, checked with NOOP,
+    and transparently re-established (and the command retried once) if the server dropped it.
+    Messages are fetched in batched UID FETCH commands, headers first and then only the first MIME
+    part of the messages that pass the blocklist.
+    """
+
     def __init__(self, username=None, password=None):
         """
         Initialize the EmailScraper with optional username and password.
@@ -27,124 +117,315 @@ class EmailScraper:
         if not self.username or not self.password:
             raise ValueError("Gmail credentials are not provided or set in environment variables.")
 
+        self.state_path = EMAIL_SYNC_STATE_PATH
+        self.ack_timeout = EMAIL_ACK_TIMEOUT
+        self.max_deliveries = EMAIL_MAX_DELIVERIES
+        self.dead_letter_path = EMAIL_DEAD_LETTER_PATH
+        self._imap = None
+        self._selected = None
+        self._uidvalidity = None
+        self._lock = threading.RLock()
+        # Delivery tracking for fetch_new_emails: per folder, the highest UID handed out and, for every UID
+        # handed out but not yet acknowledged, [redelivery due time, deliveries so far]. Both are persisted
+        # with the sync state. Separate lock: acks must not wait behind IMAP IDLE.
+        self._cursor = {}
+        self._pending = {}
+        self._sync_lock = threading.Lock()
+
     def _connect(self):
         """Connect to the Gmail IMAP server and login."""
         imap = imaplib.IMAP4_SSL("imap.gmail.com")
         imap.login(self.username, self.password)
         return imap
 
+    def _connection(self, folder):
+        if self._imap is not None:
+            try:
+                self._imap.noop()
+                # Unsolicited EXISTS/RECENT/FETCH updates would otherwise pile up on a long-lived connection
+                self._imap.untagged_responses.clear()
+            except (imaplib.IMAP4.abort, OSError):
+                self._drop()
+        if self._imap is None:
+            self._imap = self._connect()
+            self._selected = None
+        if self._selected != folder:
+            self._imap.select(folder, readonly=True)
+            self._selected = folder
+            self._uidvalidity = int(self._imap.response("UIDVALIDITY")[1][0] or 0)
+        return self._imap
+
+    def _drop(self):
+        imap, self._imap, self._selected = self._imap, None, None
+        if imap is not None:
+            try:
+                imap.logout()
+            except Exception:
+                pass
+
+    def _run(self, folder, fn):
+        """Runs fn(imap) on the live connection, reconnecting and retrying once if it was lost."""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    return fn(self._connection(folder))
+                except (imaplib.IMAP4.abort, OSError) as e:
+                    logging.warning(f"IMAP connection lost ({e}); reconnecting.")
+                    self._drop()
+                    if attempt:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._drop()
+
+    def _fetch_emails(self, imap, uids, blocklist=None):
+        """
+        Batched fetch of `uids`: headers for all of them, then the first MIME part of those the blocklist
+        (a HeaderFilter or a list of rules) lets through. Returns {uid: email dict} in the order of `uids`.
+        """
+        header_filter = as_filter(blocklist)
+        email_data = OrderedDict()
+        for i in range(0, len(uids), FETCH_BATCH_SIZE):
+            batch = sorted(uids[i:i + FETCH_BATCH_SIZE])
+            status, data = imap.uid("fetch", _uid_set(batch), HEADER_ITEMS)
+            headers = {}
+            for uid, items in _parse_fetch(data).items():
+                msg = email.message_from_bytes(items.get("BODY[HEADER]", b""))
+                subject, from_ = decode_subject(msg), msg.get("From")
+                rule = header_filter.match(from_, subject) if header_filter else None
+                if rule:
+                    logging.info(f"Blocked email from: {from_}, subject: {subject} (rule: {rule})")
+                    continue
+                headers[uid] = (msg, items.get("BODY[HEADER]", b""))
+            if not headers:
+                continue
+            status, data = imap.uid("fetch", _uid_set(sorted(headers)), BODY_ITEMS)
+            bodies = _parse_fetch(data)
+            for uid in uids[i:i + FETCH_BATCH_SIZE]:
+                if uid not in headers:
+                    continue
+                msg, raw_header = headers[uid]
+                items = bodies.get(uid, {})
+                try:
+                    # Part 1 is the whole body of a single-part message; otherwise it carries its own MIME headers
+                    part_headers = items.get("BODY[1.MIME]", b"") if msg.get_content_maintype() == "multipart" else raw_header
+                    body = first_text(email.message_from_bytes(part_headers + items.get("BODY[1]", b"")))
+                except Exception as e:
+                    logging.error(f"Error processing email UID {uid}: {e}")
+                    continue
+                subject, from_, date = decode_subject(msg), msg.get("From"), msg.get("Date")
+                email_data[str(uid)] = {
+                    "subject": subject,
+                    "from": from_,
+                    "body": body,
+                    "date": date,
+                    "metadata": {
+                        "subject": subject,
+                        "from": from_,
+                        "date": date
+                    }
+                }
+        return email_data
+
     def scrape_emails(self, folder="INBOX"):
         """Scrape all emails from the specified folder."""
         try:
-            imap = self._connect()
-            imap.select(folder)
-
-            status, messages = imap.search(None, "ALL")
-            messages = messages[0].split()
-
-            for mail in messages:
-                res, msg = imap.fetch(mail, "(RFC822)")
-                for response in msg:
-                    if isinstance(response, tuple):
-                        msg = email.message_from_bytes(response[1])
-                        subject, encoding = decode_header(msg["Subject"])[0]
-                        if isinstance(subject, bytes):
-                            subject = subject.decode(encoding if encoding else "utf-8")
-                        print("Subject:", subject)
-
-                        from_ = msg.get("From")
-                        print("From:", from_)
-
-                        if msg.is_multipart():
-                            for part in msg.walk():
-                                try:
-                                    body = part.get_payload(decode=True).decode()
-                                    print("Body:", body)
-                                except:
-                                    pass
-                        else:
-                            body = msg.get_payload(decode=True).decode()
-                            print("Body:", body)
-
-            imap.close()
-            imap.logout()
+            def scrape(imap):
+                status, data = imap.uid("search", None, "ALL")
+                return self._fetch_emails(imap, [int(u) for u in data[0].split()])
+
+            for email_id, mail in self._run(folder, scrape).items():
+                print("Subject:", mail["subject"])
+                print("From:", mail["from"])
+                print("Body:", mail["body"])
 
         except Exception as e:
             print("An error occurred:", e)
 
     def scrape_latest_emails(self, folder="INBOX", count=5, blocklist=None):
-        """Scrape the latest emails with optional blocklist filtering."""
+        """Scrape the latest emails (newest first, keyed by UID) with optional blocklist filtering."""
         try:
-            imap = self._connect()
-            imap.select(folder)
+            def scrape(imap):
+                status, data = imap.uid("search", None, "ALL")
+                latest = [int(u) for u in data[0].split()][-count:]
+                return self._fetch_emails(imap, list(reversed(latest)), blocklist)
 
-            status, messages = imap.search(None, "ALL")
-            messages = messages[0].split()
-            latest_emails = messages[-count:]
+            return self._run(folder, scrape)
 
-            email_data = {}
-            blocklist = blocklist or []
+        except Exception as e:
+            logging.error(f"An error occurred: {e}")
+            return {}
 
-            for mail in reversed(latest_emails):
-                try:
-                    res, msg = imap.fetch(mail, "(RFC822)")
-                    for response in msg:
-                        if isinstance(response, tuple):
-                            msg = email.message_from_bytes(response[1])
-                            subject, encoding = decode_header(msg["Subject"])[0]
-                            if isinstance(subject, bytes):
-                                subject = subject.decode(encoding if encoding else "utf-8")
-
-                            from_ = msg.get("From")
-                            date = msg.get("Date")
-
-                            body = ""
-                            if msg.is_multipart():
-                                for part in msg.walk():
-                                    try:
-                                        body = part.get_payload(decode=True).decode()
-                                        break
-                                    except:
-                                        pass
-                            else:
-                                body = msg.get_payload(decode=True).decode()
-
-                            if any(keyword in (subject or "") for keyword in blocklist) or \
-                               any(keyword in (from_ or "") for keyword in blocklist):
-                                logging.info(f"Blocked email from: {from_}, subject: {subject}")
-                                continue
-
-                            email_data[mail.decode()] = {
-                                "subject": subject,
-                                "from": from_, 
-                                "body": body,
-                                "date": date,
-                                "metadata": {
-                                    "subject": subject,
-                                    "from": from_,
-                                    "date": date
-                                }
-                            }
-                except Exception as e:
-                    logging.error(f"Error processing email ID {mail.decode()}: {e}")
+    # --- UID-based incremental sync ---
+
+    def _load_sync_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_sync_state(self, state):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def _new_uids(imap, last_uid):
+        # "n:*" always matches the newest message even when its UID is below n, so filter again
+        status, data = imap.uid("search", None, f"UID {last_uid + 1}:*")
+        if status != "OK" or not data or not data[0]:
+            return []
+        return sorted(uid for uid in map(int, data[0].split()) if uid > last_uid)
+
+    @staticmethod
+    def _idle(imap, timeout):
+        """
+        IMAP IDLE (RFC 2177): blocks until the server reports new mail (EXISTS) or `timeout` seconds pass.
+        Returns True if new mail was announced, False on timeout or if the server does not support IDLE.
+        """
+        if "IDLE" not in imap.capabilities:
+            return False
+        tag = imap._new_tag()
+        imap.send(tag + b" IDLE\r\n")
+        if not imap.readline().startswith(b"+"):
+            return False
+        got_mail = False
+        deadline = time.monotonic() + min(timeout, MAX_IDLE_SECONDS)
+        try:
+            while not got_mail:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # select() on the socket (not a timed-out readline) keeps the buffered reader usable
+                pending = getattr(imap.sock, "pending", lambda: 0)()
+                if not pending and not select.select([imap.sock], [], [], remaining)[0]:
+                    break
+                got_mail = imap.readline().rstrip().endswith(b"EXISTS")
+        finally:
+            imap.send(b"DONE\r\n")
+            while not imap.readline().startswith(tag):
+                pass
+        return got_mail
+
+    def _commit_sync_state(self, state, folder):
+        """Persists the highest UID handed out and the delivery count of every UID not acknowledged yet."""
+        state[folder]["last_uid"] = max(state[folder]["last_uid"], self._cursor.get(folder, 0))
+        state[folder]["pending"] = {str(uid): entry[1] for uid, entry in sorted(self._pending.get(folder, {}).items())}
+        self._save_sync_state(state)
 
-            imap.close()
-            imap.logout()
+    def _dead_letter(self, folder, uid, deliveries):
+        logging.error(f"Email UID {uid} in {folder} was not processed after {deliveries} deliveries; see {self.dead_letter_path}")
+        record = {"folder": folder, "uid": uid, "uidvalidity": self._uidvalidity, "deliveries": deliveries,
+                  "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
 
+    def _due_for_redelivery(self, folder, limit):
+        """Unacknowledged UIDs whose ack timed out, oldest first; those out of deliveries are dead-lettered instead."""
+        pending = self._pending.get(folder, {})
+        now = time.monotonic()
+        redeliver = []
+        for uid in sorted(uid for uid, (due_at, _) in pending.items() if due_at <= now):
+            if pending[uid][1] >= self.max_deliveries:
+                self._dead_letter(folder, uid, pending.pop(uid)[1])
+            elif len(redeliver) < limit:
+                redeliver.append(uid)
+        return redeliver
+
+    def fetch_new_emails(self, folder="INBOX", blocklist=None, initial_count=1, max_batch=50, idle_timeout=None):
+        """
+        Incremental sync: returns only the emails that arrived since the last call (keyed by UID, oldest first),
+        searched with `UID last_uid+1:*` and fetched in batches. UIDVALIDITY, the last UID handed out and the
+        unacknowledged UIDs are persisted in EMAIL_SYNC_STATE_PATH; on the first sync, or if UIDVALIDITY changed,
+        the newest `initial_count` emails are returned. With idle_timeout set and nothing to return, waits up to
+        that many seconds on IMAP IDLE for new mail. At most max_batch emails are returned per call; the rest
+        follow on the next call.
+        Delivery is at-least-once: an email that is not passed to ack() within ack_timeout seconds (or before a
+        restart) is returned again, up to max_deliveries times in total, after which it is recorded in the
+        dead-letter log and dropped. Emails dropped by the blocklist count as acknowledged.
+        """
+        state = self._load_sync_state()
+
+        def sync(imap):
+            uidvalidity = self._uidvalidity
+            folder_state = state.get(folder)
+            if not folder_state or folder_state.get("uidvalidity") != uidvalidity:
+                status, data = imap.uid("search", None, "ALL")
+                uids = sorted(map(int, data[0].split())) if status == "OK" and data and data[0] else []
+                folder_state = {"uidvalidity": uidvalidity, "last_uid": uids[-initial_count - 1] if len(uids) > initial_count else 0}
+                with self._sync_lock:
+                    self._cursor.pop(folder, None)
+                    self._pending.pop(folder, None)
+            state[folder] = folder_state
+            with self._sync_lock:
+                if folder not in self._pending:
+                    # Handed out before a restart and never acknowledged: due for redelivery right away
+                    self._pending[folder] = {int(uid): [0.0, n] for uid, n in folder_state.get("pending", {}).items()}
+                last_uid = max(folder_state["last_uid"], self._cursor.get(folder, 0))
+                redeliver = self._due_for_redelivery(folder, max_batch)
+                next_due = min((due_at for due_at, _ in self._pending[folder].values()), default=None)
+
+            uids = self._new_uids(imap, last_uid)
+            if not uids and not redeliver and idle_timeout:
+                # Wake up in time for the next redelivery
+                wait = idle_timeout if next_due is None else min(idle_timeout, max(0.0, next_due - time.monotonic()))
+                if wait and self._idle(imap, wait):
+                    uids = self._new_uids(imap, last_uid)
+            uids = uids[:max_batch - len(redeliver)]
+            wanted = redeliver + uids
+            email_data = self._fetch_emails(imap, wanted, blocklist) if wanted else OrderedDict()
+            with self._sync_lock:
+                if uids:
+                    self._cursor[folder] = uids[-1]
+                pending = self._pending[folder]
+                for uid in redeliver:
+                    # Deleted from the mailbox, or blocked since: nothing left to deliver
+                    if str(uid) not in email_data:
+                        pending.pop(uid, None)
+                due_at = time.monotonic() + self.ack_timeout
+                for uid in map(int, email_data):
+                    if uid in pending:
+                        pending[uid] = [due_at, pending[uid][1] + 1]
+                    elif uid not in redeliver:  # a redelivered UID missing here was acknowledged meanwhile
+                        pending[uid] = [due_at, 1]
+                self._commit_sync_state(state, folder)
             return email_data
 
+        try:
+            return self._run(folder, sync)
         except Exception as e:
             logging.error(f"An error occurred: {e}")
-            return {}
+            return OrderedDict()
+
+    def ack(self, uids, folder="INBOX"):
+        """Marks emails returned by fetch_new_emails as processed, so they are not delivered again."""
+        with self._sync_lock:
+            pending = self._pending.get(folder)
+            if not pending:
+                return
+            acked = False
+            for uid in uids:
+                try:
+                    acked = pending.pop(int(uid), None) is not None or acked
+                except (TypeError, ValueError):
+                    continue
+            if not acked:
+                return
+            state = self._load_sync_state()
+            if folder in state:
+                self._commit_sync_state(state, folder)
 
 if __name__ == "__main__":
     import json
 
-    blocklist = ["no-reply@accounts.google.com", "Security alert", "unstop", "linkedin", "kaggle", "Team Unstop", "Canva", "noreply@github.com", "noreply", "feed"]
     logging.info("Fetching the latest 10,000 emails...")
 
     scraper = EmailScraper()
-    emails = scraper.scrape_latest_emails(count=10000, blocklist=blocklist)
+    emails = scraper.scrape_latest_emails(count=10000, blocklist=default_filter)
+    logging.info(f"Header filter: {default_filter.stats()}")
 
     # Save the emails to a JSON file
     output_file = "latest_emails.json"
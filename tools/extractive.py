@@ -0,0 +1,91 @@
+import re
+import numpy as np
+
+EXTRACTIVE_MAX_CHARS = 600
+MAX_SENTENCES = 200  # similarity is quadratic in sentences; later ones rarely make the summary anyway
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\s*\n\s*")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by for from has have he her his i if in into is it its me my no not "
+    "of on or our she so that the their them they this to us was we were what when which who will with "
+    "you your".split()
+)
+
+
+def split_sentences(text: str):
+    """Sentences and lines of the text; repeats (quoted replies, forwarded chains) are kept once."""
+    seen = set()
+    sentences = []
+    for s in _SENTENCE_SPLIT.split(text):
+        s = s.strip() if s else ""
+        if len(s) > 1 and s.casefold() not in seen:
+            seen.add(s.casefold())
+            sentences.append(s)
+    return sentences
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rsplit(" ", 1)[0] + "..."
+
+
+def textrank_scores(sentences, damping: float = 0.85, iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """
+    TextRank over the cosine similarity of sentence TF-IDF vectors: the stationary distribution of
+    a random walk that moves between sentences in proportion to their similarity.
+    """
+    tokens = [[t for t in _TOKEN.findall(s.lower()) if t not in _STOPWORDS] for s in sentences]
+    vocab = {}
+    rows, cols = [], []
+    for i, words in enumerate(tokens):
+        for w in words:
+            rows.append(i)
+            cols.append(vocab.setdefault(w, len(vocab)))
+    n = len(sentences)
+    if not vocab:
+        return np.full(n, 1.0 / n)
+    counts = np.zeros((n, len(vocab)), dtype=np.float32)
+    np.add.at(counts, (np.array(rows), np.array(cols)), 1.0)
+    df = np.count_nonzero(counts, axis=0)
+    tfidf = np.log1p(counts) * (np.log((1.0 + n) / (1.0 + df)) + 1.0)
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf /= np.where(norms == 0, 1.0, norms)
+    sim = tfidf @ tfidf.T
+    np.fill_diagonal(sim, 0.0)
+    out = sim.sum(axis=1, keepdims=True)
+    # Sentences similar to nothing jump uniformly, so the walk stays a proper distribution
+    transition = np.where(out > 0, sim / np.where(out == 0, 1.0, out), 1.0 / n)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1.0 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def extractive_summary(text: str, max_chars: int = EXTRACTIVE_MAX_CHARS) -> str:
+    """
+    Picks the highest-ranked sentences (TextRank, slightly favouring the opening of the text) that
+    fit in max_chars and returns them in their original order. Runs in-process in milliseconds.
+    """
+    text = text or ""
+    sentences = split_sentences(text)[:MAX_SENTENCES]
+    if not sentences:
+        return _clip(" ".join(text.split()), max_chars)
+    if sum(len(s) + 1 for s in sentences) <= max_chars:
+        return " ".join(sentences)
+    scores = textrank_scores(sentences)
+    # Emails put what matters first: mild position prior
+    scores = scores * (1.0 + 0.5 / (1.0 + np.arange(len(sentences))))
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        length = len(sentences[i]) + 1
+        if used + length <= max_chars:
+            chosen.append(i)
+            used += length
+    if not chosen:
+        return _clip(sentences[int(np.argmax(scores))], max_chars)
+    return " ".join(sentences[i] for i in sorted(chosen))
@@ -1,15 +1,56 @@
 import requests
 import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# --- Google Search Tool (SerpAPI integration) ---
-def google_search2(query):
-    """
-    Uses Zenserp API to perform a Google Search and return the top results as a string.
-    This is a fallback if SerpAPI is not available.
-    """
+# One pooled session for every provider: TLS connections are reused instead of re-established per search
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=int(os.getenv("SEARCH_POOL_SIZE", 16)))
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+SEARCH_TIMEOUT = (3.05, float(os.getenv("SEARCH_READ_TIMEOUT", 8)))  # (connect, read) seconds
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", 1.5))  # start the next provider if none answered by then
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 15 * 60))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 256))
+
+_search_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_POOL_SIZE", 16)), thread_name_prefix="search")
+
+
+class SearchError(Exception):
+    """A provider failed or returned no results."""
+
+
+def _format_results(results):
+    return '\n\n'.join(f"- {title}\n{snippet}\n{link}" for title, snippet, link in results[:3])
+
+
+def _serpapi(query):
+    api_key = os.getenv('SERPAPI_API_KEY')
+    if not api_key:
+        raise SearchError('[Google Search: Missing SERPAPI_API_KEY]')
+    params = {
+        'q': query,
+        'api_key': api_key,
+        'engine': 'google',
+        'num': 3
+    }
+    resp = session.get("https://serpapi.com/search", params=params, timeout=SEARCH_TIMEOUT)
+    resp.raise_for_status()
+    results = resp.json().get('organic_results', [])
+    if not results:
+        raise SearchError('[Google Search: No results found]')
+    return [(r.get('title', ''), r.get('snippet', ''), r.get('link', '')) for r in results]
+
+
+def _zenserp(query):
     headers = {
         "apikey": os.getenv('ZEN_API_KEY')
     }
@@ -17,96 +58,188 @@ def google_search2(query):
         "q": query,
         "num": 3
     }
+    response = session.get('https://app.zenserp.com/api/v2/search', headers=headers, params=params, timeout=SEARCH_TIMEOUT)
+    response.raise_for_status()
+    results = response.json().get('organic', [])
+    if not results:
+        raise SearchError('[Zenserp Search: No results found]')
+    return [(r.get('title', ''), r.get('description', ''), r.get('url', '')) for r in results]
+
+
+def _google_cse(query):
+    api_key = os.getenv('GOOGLE_SEARCH_ENGINE_API_KEY')
+    search_engine_id = os.getenv('GOOGLE_SEARCH_ENGINE_ID')
+    if not api_key or not search_engine_id:
+        raise SearchError('[Google Custom Search API: Missing API key or Search Engine ID]')
+    params = {"key": api_key, "cx": search_engine_id, "q": query}
+    response = session.get("https://www.googleapis.com/customsearch/v1", params=params, timeout=SEARCH_TIMEOUT)
+    response.raise_for_status()
+    results = response.json().get('items', [])
+    if not results:
+        raise SearchError('[Google Custom Search API: No results found]')
+    return [(item.get('title', ''), item.get('snippet', ''), item.get('link', '')) for item in results]
+
+
+class ProviderStats:
+    """EWMA of each provider's latency; failures count as a full timeout so flaky providers sink."""
+
+    def __init__(self, names, alpha: float = 0.3):
+        self.alpha = alpha
+        self.latency = {name: None for name in names}
+        self.failures = {name: 0 for name in names}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, latency: float, ok: bool):
+        with self._lock:
+            sample = latency if ok else sum(SEARCH_TIMEOUT)
+            prev = self.latency[name]
+            self.latency[name] = sample if prev is None else self.alpha * sample + (1 - self.alpha) * prev
+            if not ok:
+                self.failures[name] += 1
+
+    def order(self, names):
+        """Fastest first; providers never measured keep their configured position ahead of slow ones."""
+        with self._lock:
+            return sorted(names, key=lambda n: self.latency[n] if self.latency[n] is not None else 0.0)
+
+    def snapshot(self):
+        with self._lock:
+            return {n: {"ewma_latency": self.latency[n], "failures": self.failures[n]} for n in self.latency}
+
+
+PROVIDERS = OrderedDict([
+    ("serpapi", _serpapi),
+    ("zenserp", _zenserp),
+    ("google_cse", _google_cse),
+])
+provider_stats = ProviderStats(PROVIDERS)
+
+
+class SearchCache:
+    """TTL + LRU cache of formatted search results, keyed by the normalized query."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    def get(self, query: str):
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, query: str, value: str):
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+search_cache = SearchCache()
+
+
+def _timed(name, query):
+    t0 = time.monotonic()
     try:
-        response = requests.get('https://app.zenserp.com/api/v2/search', headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get('organic', [])
-        if not results:
-            return '[Zenserp Search: No results found]'
-        out = []
-        for r in results[:3]:
-            title = r.get('title', '')
-            link = r.get('url', '')
-            snippet = r.get('description', '')
-            out.append(f"- {title}\n{snippet}\n{link}")
-        return '\n\n'.join(out)
+        results = PROVIDERS[name](query)
+    except Exception:
+        provider_stats.record(name, time.monotonic() - t0, ok=False)
+        raise
+    provider_stats.record(name, time.monotonic() - t0, ok=True)
+    return results
+
+
+def hedged_search(query, hedge_delay: float = SEARCH_HEDGE_DELAY):
+    """
+    Queries providers fastest-first (by EWMA latency). The next provider is started as soon as one
+    fails, or when none has answered within hedge_delay; the first non-empty result wins and the
+    providers not yet started are cancelled (in-flight requests are left to finish in the background).
+    """
+    order = provider_stats.order(list(PROVIDERS))
+    running = {}
+    last_error = None
+    try:
+        while order or running:
+            if order and (not running or last_error is not None):
+                name = order.pop(0)
+                running[_search_pool.submit(_timed, name, query)] = name
+                last_error = None
+            done, _ = wait(running, timeout=hedge_delay if order else None, return_when=FIRST_COMPLETED)
+            if not done:
+                # Hedge: nobody answered in time, start the next provider alongside
+                name = order.pop(0)
+                running[_search_pool.submit(_timed, name, query)] = name
+                continue
+            for future in done:
+                name = running.pop(future)
+                try:
+                    return _format_results(future.result())
+                except Exception as e:
+                    last_error = e
+                    print(f"Search provider {name} failed: {e}")
+    finally:
+        for future in running:
+            future.cancel()
+    if isinstance(last_error, SearchError):
+        return str(last_error)
+    return f'[Google Search Error: {last_error}]'
+
+
+# --- Google Search Tool (SerpAPI, Zenserp and Google Custom Search, hedged) ---
+def google_search2(query):
+    """
+    Uses Zenserp API to perform a Google Search and return the top results as a string.
+    """
+    try:
+        return _format_results(_zenserp(query))
+    except SearchError as e:
+        return str(e)
     except Exception as e:
         return f'[Zenserp Search Error: {str(e)}]'
 
+
 def google_search3(query):
     """
     Uses Google Custom Search API to perform a Google Search and return the top results as a string.
     Requires GOOGLE_SEARCH_ENGINE_API_KEY and GOOGLE_SEARCH_ENGINE_ID in environment variables.
     """
-    api_key = os.getenv('GOOGLE_SEARCH_ENGINE_API_KEY')
-    search_engine_id = os.getenv('GOOGLE_SEARCH_ENGINE_ID')
-    if not api_key or not search_engine_id:
-        return '[Google Custom Search API: Missing API key or Search Engine ID]'
-
-    url = f"https://www.googleapis.com/customsearch/v1?key={api_key}&cx={search_engine_id}&q={query}"
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get('items', [])
-        if not results:
-            return '[Google Custom Search API: No results found]'
-        out = []
-        for item in results[:3]:
-            title = item.get('title', '')
-            link = item.get('link', '')
-            snippet = item.get('snippet', '')
-            out.append(f"- {title}\n{snippet}\n{link}")
-        return '\n\n'.join(out)
+        return _format_results(_google_cse(query))
+    except SearchError as e:
+        return str(e)
     except Exception as e:
         return f'[Google Custom Search API Error: {str(e)}]'
 
+
 def google_search_tool(query):
     """
-    Uses SerpAPI to perform a Google Search and return the top results as a string.
-    Falls back to Zenserp and then Google Custom Search API if not available.
+    Google Search across SerpAPI, Zenserp and Google Custom Search, hedged so the first good
+    answer wins, and cached per normalized query for SEARCH_CACHE_TTL seconds.
     """
-    api_key = os.getenv('SERPAPI_API_KEY')
-    if not api_key:
-        # Fallback to Zenserp
-        zenserp_result = google_search2(query)
-        if "Zenserp Search Error" in zenserp_result or "No results found" in zenserp_result:
-            # Fallback to Google Custom Search API
-            return google_search3(query)
-        return zenserp_result
-
-    url = "https://serpapi.com/search"
-    params = {
-        'q': query,
-        'api_key': api_key,
-        'engine': 'google',
-        'num': 3
-    }
-    try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        results = data.get('organic_results', [])
-        if not results:
-            return '[Google Search: No results found]'
-        out = []
-        for r in results[:3]:
-            title = r.get('title', '')
-            link = r.get('link', '')
-            snippet = r.get('snippet', '')
-            out.append(f"- {title}\n{snippet}\n{link}")
-        return '\n\n'.join(out)
-    except Exception as e:
-        # Fallback to Zenserp on error
-        zenserp_result = google_search2(query)
-        if "Zenserp Search Error" in zenserp_result or "No results found" in zenserp_result:
-            # Fallback to Google Custom Search API
-            return google_search3(query)
-        return zenserp_result
+    cached = search_cache.get(query)
+    if cached is not None:
+        return cached
+    result = hedged_search(query)
+    if not result.startswith('['):
+        search_cache.set(query, result)
+    return result
 
 if __name__ == "__main__":
     query = input("Enter your search query: ")
-    print("\nZenserp Results:\n")
+    print("\nSearch Results:\n")
     print(google_search_tool(query))
-
@@ -1,37 +1,133 @@
 import sys
 import os
+import time
+import threading
+from collections import OrderedDict
 
 # Add the project root directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 
-def retrieval_tool_long(query, long_db):
+class RetrievalCache:
     """
-    Retrieves results by querying only the long-term database.
-    Args:
-        query (str): The input query.
-        long_db (LongTermDatabase): The long database object to query.
-    Returns:
-        str: Formatted results from the long-term database.
+    In-process LRU cache of formatted retrieval tool output, keyed by (tool, normalized query).
+    Each entry remembers the data_version of the database it was read from and is only served
+    while that version is unchanged, so writes invalidate it immediately. The TTL is only a
+    safety bound on how long an entry may live.
     """
-    query = query.split()[0]  # Use only the first word of the query
-    long_results = long_db.smart_query(query, topk=15, top_l=10, use_late=True, doc_search=True)
+
+    def __init__(self, max_entries: int = 512, ttl: float = 6 * 60 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (data_version, expires_at, output)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return query.strip().lower()
+
+    def get(self, tool: str, query: str, data_version: int):
+        key = (tool, self.normalize(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != data_version or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, tool: str, query: str, data_version: int, output: str):
+        key = (tool, self.normalize(query))
+        with self._lock:
+            self._entries[key] = (data_version, time.time() + self.ttl, output)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+retrieval_cache = RetrievalCache(
+    max_entries=int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", 512)),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL", 6 * 60 * 60))
+)
+
+
+def _format_results(query, results, label):
     max_context_tokens = 1024
     max_context_chars = max_context_tokens * 4
     total_chars = 0
     limited = []
-    for res in long_results:
+    for res in results:
         if total_chars + len(res) > max_context_chars:
             break
         limited.append(res)
         total_chars += len(res)
-    output_lines = [f"This is the query by the user: '{query}' (Long-term DB)"]
+    output_lines = [f"This is the query by the user: '{query}' ({label})"]
     if limited:
         output_lines.extend([f"{i+1}. {res}" for i, res in enumerate(limited)])
     else:
         output_lines.append("No results found.")
     return "\n".join(output_lines)
 
+
+# Shared by the sync and async tools so the two paths cannot drift apart
+QUERY_KWARGS = dict(topk=15, top_l=10, use_late=True, doc_search=True)
+DB_LABELS = {"long": "Long-term DB", "short": "Short-term DB"}
+
+
+def _lookup(tool, query, db):
+    """Returns (query, data_version, cached output or None)."""
+    query = query.split()[0]  # Use only the first word of the query
+    # Read the version before querying so a concurrent write can only make the entry look stale
+    version = db.data_version
+    return query, version, retrieval_cache.get(tool, query, version)
+
+
+def _store(tool, query, version, results):
+    output = _format_results(query, results, DB_LABELS[tool])
+    retrieval_cache.set(tool, query, version, output)
+    return output
+
+
+def _retrieve(tool, query, db):
+    query, version, cached = _lookup(tool, query, db)
+    if cached is not None:
+        return cached
+    return _store(tool, query, version, db.smart_query(query, **QUERY_KWARGS))
+
+
+async def _aretrieve(tool, query, db, executor):
+    query, version, cached = _lookup(tool, query, db)
+    if cached is not None:
+        return cached
+    return _store(tool, query, version, await db.asmart_query(query, executor=executor, **QUERY_KWARGS))
+
+
+def retrieval_tool_long(query, long_db):
+    """
+    Retrieves results by querying only the long-term database.
+    Args:
+        query (str): The input query.
+        long_db (LongTermDatabase): The long database object to query.
+    Returns:
+        str: Formatted results from the long-term database.
+    """
+    return _retrieve("long", query, long_db)
+
 def retrieval_tool_short(query, short_db):
     """
     Retrieves results by querying only the short-term database.
@@ -41,23 +137,22 @@ def retrieval_tool_short(query, short_db):
     Returns:
         str: Formatted results from the short-term database.
     """
-    query = query.split()[0]  # Use only the first word of the query
-    short_results = short_db.smart_query(query, topk=15, top_l=10, use_late=True, doc_search=True)
-    max_context_tokens = 1024 
-    max_context_chars = max_context_tokens * 4
-    total_chars = 0
-    limited = []
-    for res in short_results:
-        if total_chars + len(res) > max_context_chars:
-            break
-        limited.append(res)
-        total_chars += len(res)
-    output_lines = [f"This is the query by the user: '{query}' (Short-term DB)"]
-    if limited:
-        output_lines.extend([f"{i+1}. {res}" for i, res in enumerate(limited)])
-    else:
-        output_lines.append("No results found.")
-    return "\n".join(output_lines)
+    return _retrieve("short", query, short_db)
+
+
+async def aretrieval_tool_long(query, long_db, executor=None):
+    """
+    Async retrieval_tool_long: same caching and formatting, queried through long_db.asmart_query.
+    `executor` is the shared bounded pool for any blocking step (agents.llm passes BLOCKING_POOL).
+    """
+    return await _aretrieve("long", query, long_db, executor)
+
+async def aretrieval_tool_short(query, short_db, executor=None):
+    """
+    Async retrieval_tool_short: same caching and formatting, queried through short_db.asmart_query.
+    `executor` is the shared bounded pool for any blocking step (agents.llm passes BLOCKING_POOL).
+    """
+    return await _aretrieve("short", query, short_db, executor)
 
 
 if __name__ == "__main__":
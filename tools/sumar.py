@@ -1,22 +1,223 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, List, Optional
+
 from gradio_client import Client
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tools.extractive import EXTRACTIVE_MAX_CHARS, extractive_summary
+
+SUMMARIZER_SPACE = os.getenv("SUMMARIZER_SPACE", "IotaCluster/Summarizer")
+SUMMARIZER_WORKERS = int(os.getenv("SUMMARIZER_WORKERS", 4))
+SUMMARIZER_TIMEOUT = float(os.getenv("SUMMARIZER_TIMEOUT", 30))
+SUMMARIZER_CACHE_SIZE = int(os.getenv("SUMMARIZER_CACHE_SIZE", 2048))
+# remote: Space only | fallback: Space, local summary on failure | local: in-process only
+# refine: local summary right away, replaced through on_refined once the Space answers
+SUMMARIZER_MODE = os.getenv("SUMMARIZER_MODE", "fallback")
+SUMMARIZER_MODES = ("remote", "fallback", "local", "refine")
+
+
+def local_summary(text: str) -> str:
+    return extractive_summary(text, max_chars=int(os.getenv("LOCAL_SUMMARY_CHARS", EXTRACTIVE_MAX_CHARS)))
+
+
+class SummarizerService:
+    """
+    Summarizes text through the IotaCluster/Summarizer Gradio Space.
+    One Client (the Space handshake and config download happen once) is shared by a bounded pool of
+    `workers` threads. Results are cached by a hash of the whitespace-normalized text, so forwarded
+    and duplicate notices are summarized once, and concurrent requests for the same text share one
+    call. A call that fails or takes longer than `timeout` seconds returns `fallback(text)` instead;
+    fallback results are not cached, so the text is sent to the Space again next time.
+    `mode` (SUMMARIZER_MODES) selects how the in-process extractive summarizer is used: never
+    ("remote"), on failure ("fallback"), exclusively ("local"), or as a fast first answer that
+    summarize_many's on_refined callback replaces when the remote summary arrives ("refine").
+    """
+
+    def __init__(
+        self,
+        space: str = SUMMARIZER_SPACE,
+        workers: int = SUMMARIZER_WORKERS,
+        timeout: float = SUMMARIZER_TIMEOUT,
+        cache_size: int = SUMMARIZER_CACHE_SIZE,
+        mode: str = SUMMARIZER_MODE,
+        local: Callable[[str], str] = local_summary
+    ):
+        if mode not in SUMMARIZER_MODES:
+            raise ValueError(f"Unknown summarizer mode {mode!r}; expected one of {SUMMARIZER_MODES}")
+        self.space = space
+        self.mode = mode
+        self.local = local
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.fallback = None if mode == "remote" else local
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarizer")
+        self._client: Optional[Client] = None
+        self._client_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "cache_hits": 0, "remote_calls": 0, "timeouts": 0, "failures": 0, "fallbacks": 0,
+                       "local": 0, "refined": 0}
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(re.sub(r"\s+", " ", text).strip().encode("utf-8")).hexdigest()
+
+    def _get_client(self) -> Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = Client(self.space)
+            return self._client
+
+    def _remote(self, text: str) -> str:
+        client = self._get_client()
+        try:
+            return client.predict(
+                text=text,
+                api_name="/predict"
+            )
+        except Exception:
+            # Reconnect on the next call in case the Space restarted
+            with self._client_lock:
+                if self._client is client:
+                    self._client = None
+            raise
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _submit(self, key: str, text: str):
+        """Returns a cached summary (str) or the in-flight future computing it."""
+        with self._lock:
+            self._stats["requests"] += 1
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                return self._cache[key]
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            self._stats["remote_calls"] += 1
+            future = self._inflight[key] = self._pool.submit(self._remote, text)
+        # Outside the lock: the callback runs inline if the call has already finished
+        future.add_done_callback(lambda f, key=key: self._finish(key, f))
+        return future
+
+    def _finish(self, key: str, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.cancelled() or future.exception() is not None or not future.result():
+                return
+            self._cache[key] = future.result()
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _resolve(self, pending, text: str, deadline: Optional[float]) -> str:
+        if isinstance(pending, str):
+            return pending
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            result = pending.result(timeout=timeout)
+            if result:
+                return result
+            error = ValueError("empty summary")
+        except FutureTimeout as e:
+            self._count("timeouts")
+            error = e
+        except Exception as e:
+            self._count("failures")
+            error = e
+        if self.fallback is None:
+            raise error
+        print(f"Summarizer unavailable ({type(error).__name__}: {error}); using fallback summary")
+        self._count("fallbacks")
+        return self.fallback(text)
+
+    def summarize(self, text: str) -> str:
+        return self.summarize_many([text])[0]
+
+    def _local(self, text: str) -> str:
+        self._count("local")
+        return self.local(text)
+
+    def _refine_later(self, index: int, future, on_refined: Callable[[int, str], None]):
+        def done(f):
+            if f.cancelled() or f.exception() is not None or not f.result():
+                self._count("failures")
+                return
+            self._count("refined")
+            try:
+                on_refined(index, f.result())
+            except Exception as e:
+                print(f"Refined summary callback failed: {e}")
+        future.add_done_callback(done)
+
+    def summarize_many(
+        self,
+        texts: List[str],
+        on_refined: Optional[Callable[[int, str], None]] = None,
+        return_exceptions: bool = False
+    ) -> list:
+        """
+        Submits every text at once (up to `workers` run concurrently) and returns the summaries in
+        order. The whole batch shares one `timeout` deadline. Without a fallback ("remote" mode) a
+        failed summary raises, or with return_exceptions=True takes the exception's place in the list.
+        In "refine" mode texts without a cached remote summary get a local one immediately and
+        `on_refined(index, summary)` is called from a pool thread when the remote one arrives.
+        """
+        if self.mode == "local":
+            return [self._local(text) for text in texts]
+        pending = [self._submit(self._key(text), text) for text in texts]
+        if self.mode == "refine":
+            results = []
+            for index, (p, text) in enumerate(zip(pending, texts)):
+                if isinstance(p, str):
+                    results.append(p)
+                    continue
+                if on_refined is not None:
+                    self._refine_later(index, p, on_refined)
+                results.append(self._local(text))
+            return results
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        results = []
+        for p, text in zip(pending, texts):
+            try:
+                results.append(self._resolve(p, text, deadline))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, cached=len(self._cache), inflight=len(self._inflight))
+
+
+# Shared by the API process and the short-term worker
+summarizer = SummarizerService()
+
+
 def summarize_text(text):
     """
     Summarizes the given text using the IotaCluster/Summarizer Gradio API (new endpoint).
     Args:
         text (str): The text to summarize.
     Returns:
-        str: The summarized text from the API.
+        str: The summary (from the API, or the local extractive summarizer depending on SUMMARIZER_MODE).
     """
-    client = Client("IotaCluster/Summarizer")
-    result = client.predict(
-        text=text,
-        api_name="/predict"
-    )
-    return result
+    return summarizer.summarize(text)
 
 # Example usage
 if __name__ == "__main__":
     summary = summarize_text("Hello!!")
     print(summary)
-    
@@ -1,10 +1,12 @@
 import os
 import json
+import hashlib
+import threading
 import numpy as np
 import time
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
     Distance,
     VectorParams,
@@ -13,7 +15,12 @@ from qdrant_client.models import (
     Modifier,
     MultiVectorConfig,
     MultiVectorComparator,
-    HnswConfigDiff
+    HnswConfigDiff,
+    FieldCondition,
+    Filter,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList
 )
 
 # Fix import for both direct and module execution
@@ -24,8 +31,25 @@ from embedding import (
     get_dense_embedding,
     get_sparse_embedding,
     get_late_embedding,
+    get_dense_embeddings,
+    get_late_embeddings,
+    get_sparse_embeddings,
+    get_query_embeddings,
+    check_vector_dimensions,
+    aget_query_embeddings,
     to_valid_qdrant_id
 )
+from keyword_index import ensure_text_index, query_terms
+from ingestion import IngestionPipeline, iter_json_chunks
+from singleflight import SingleFlight
+from hybrid_search import (
+    SPARSE_VECTORS_CONFIG,
+    build_hybrid_query,
+    build_point_vectors,
+    ensure_sparse_vectors,
+    hits_from_results,
+    start_sparse_backfill
+)
 
 load_dotenv()
 
@@ -42,10 +66,20 @@ class LongTermDatabase:
             raise RuntimeError("Missing QDRANT_API_KEY environment variable.")
 
         self.client = QdrantClient(url=url, api_key=self.api_key)
+        # Used by asmart_query; created lazily inside the running event loop
+        self._qdrant_url = url
+        self._async_client: Optional[AsyncQdrantClient] = None
         self.collection_name = "long_rag"
         self.vector_size = vector_size
-        # Only dense vectors are used
+        # Bumped on every write so caches built on query results know when they are stale
+        self.data_version = 0
+        self._version_lock = threading.Lock()
+        # Concurrent identical smart_query calls share one in-flight search
+        self._flights = SingleFlight()
         self._ensure_collection()
+        check_vector_dimensions(self.client, self.collection_name)
+        # Points stored before the sparse vector existed get one in the background
+        self._sparse_backfill = start_sparse_backfill(self.client, self.collection_name, get_sparse_embeddings, lambda _: self._bump_version())
 
     def _ensure_collection(self):
         existing = [c.name for c in self.client.get_collections().collections]
@@ -62,175 +96,200 @@ class LongTermDatabase:
                         ),
                         hnsw_config=HnswConfigDiff(m=0)
                     )
-                }
+                },
+                sparse_vectors_config=SPARSE_VECTORS_CONFIG
+            )
+        else:
+            ensure_sparse_vectors(self.client, self.collection_name)
+        # Inverted index used by doc_search keyword lookups
+        ensure_text_index(self.client, self.collection_name)
+        # Keyword index on the source file, used to load a file's ingestion manifest
+        if "source" not in (self.client.get_collection(self.collection_name).payload_schema or {}):
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="source",
+                field_schema=PayloadSchemaType.KEYWORD
             )
 
     def _batch_get_embeddings(self, docs: List[str]):
-        dense_embs = [get_dense_embedding(doc) for doc in docs]
-        late_embs = [get_late_embedding(doc) for doc in docs]
-        return list(zip(dense_embs, late_embs))
+        dense_embs = get_dense_embeddings(docs)
+        late_embs = get_late_embeddings(docs)
+        sparse_embs = get_sparse_embeddings(docs)
+        return list(zip(dense_embs, late_embs, sparse_embs))
+
+    @staticmethod
+    def _content_hash(doc: str) -> str:
+        return hashlib.sha256(doc.encode('utf-8')).hexdigest()
 
-    def add_data(self, json_file: str, max_chunk_chars: int = 1500):
+    def _load_manifest(self, source: str) -> Dict[str, str]:
         """
-        Add each object in a JSON file as its own document. If the file is a list, each item is a document.
-        If the file is a dict, each value is a document. If a document is too large, it is split into chunks.
-        For objectwise JSON (list of dicts), each dict is a document.
+        The ingestion manifest of a source file: {point_id: content_hash} for every chunk stored from it.
+        It lives in the point payloads, so it can never drift from what is actually in the collection.
         """
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        ids, docs = [], []
-        # Objectwise: if data is a list of dicts, treat each dict as a document
-        file_prefix = os.path.splitext(os.path.basename(json_file))[0]
-        if isinstance(data, list) and all(isinstance(item, dict) for item in data):
-            for i, item in enumerate(data):
-                doc_json = json.dumps(item, ensure_ascii=False)
-                if len(doc_json) > max_chunk_chars:
-                    n_chunks = (len(doc_json) + max_chunk_chars - 1) // max_chunk_chars
-                    for j in range(n_chunks):
-                        chunk = doc_json[j * max_chunk_chars : (j + 1) * max_chunk_chars]
-                        ids.append(f"{file_prefix}_{i}_{j}")
-                        docs.append(chunk)
-                else:
-                    ids.append(f"{file_prefix}_{i}")
-                    docs.append(doc_json)
-        elif isinstance(data, dict):
-            # If dict, treat each value as a document
-            for k, v in data.items():
-                doc_json = json.dumps(v, ensure_ascii=False)
-                if len(doc_json) > max_chunk_chars:
-                    n_chunks = (len(doc_json) + max_chunk_chars - 1) // max_chunk_chars
-                    for j in range(n_chunks):
-                        chunk = doc_json[j * max_chunk_chars : (j + 1) * max_chunk_chars]
-                        ids.append(f"{file_prefix}_{k}_{j}")
-                        docs.append(chunk)
-                else:
-                    ids.append(f"{file_prefix}_{k}")
-                    docs.append(doc_json)
-        else:
-            # Fallback: treat the whole thing as one document
-            doc_json = json.dumps(data, ensure_ascii=False)
-            if len(doc_json) > max_chunk_chars:
-                n_chunks = (len(doc_json) + max_chunk_chars - 1) // max_chunk_chars
-                for j in range(n_chunks):
-                    chunk = doc_json[j * max_chunk_chars : (j + 1) * max_chunk_chars]
-                    ids.append(f"{file_prefix}_0_{j}")
-                    docs.append(chunk)
-            else:
-                ids.append(f"{file_prefix}_0")
-                docs.append(doc_json)
-        print(f"Adding {len(docs)} document(s) to the database...")
-        emb_pairs = self._batch_get_embeddings(docs)
+        manifest = {}
+        next_offset = None
+        while True:
+            points, next_offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))]),
+                limit=1024,
+                offset=next_offset,
+                with_payload=["content_hash"],
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload if isinstance(point.payload, dict) else {}
+                manifest[str(point.id)] = payload.get("content_hash")
+            if not next_offset:
+                break
+        return manifest
+
+    def _bump_version(self):
+        with self._version_lock:
+            self.data_version += 1
+
+    def _delete_points(self, ids: List[str], batch_size: int = 1000):
+        for i in range(0, len(ids), batch_size):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=ids[i:i + batch_size])
+            )
+            self._bump_version()
+
+    def _embed_points(self, batch: List[Tuple[str, str]], source: Optional[str] = None) -> List[Optional[PointStruct]]:
+        """Embeds (chunk_id, text) pairs into points; chunks whose dense or late embedding failed become None."""
+        emb_triples = self._batch_get_embeddings([doc for _, doc in batch])
         points = []
-        for i, doc_id in enumerate(ids):
-            dense_vec, late_vec = emb_pairs[i]
+        for (doc_id, doc), (dense_vec, late_vec, sparse_vec) in zip(batch, emb_triples):
+            if dense_vec is None or late_vec is None:
+                print(f"Skipping chunk {doc_id}: embedding failed.")
+                points.append(None)
+                continue
             points.append(
                 PointStruct(
                     id=to_valid_qdrant_id(doc_id),
-                    vector={"dense": dense_vec, "late": late_vec},
-                    payload={"document": docs[i]}
+                    vector=build_point_vectors(dense_vec, late_vec, sparse_vec),
+                    payload={"document": doc, "source": source, "content_hash": self._content_hash(doc)}
                 )
             )
-        # Use upsert in small batches to avoid timeouts
-        BATCH_SIZE = 4  # or even 2 if needed
-        for i in range(0, len(points), BATCH_SIZE):
-            batch = points[i:i+BATCH_SIZE]
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=batch
-            )
-            time.sleep(0.5)  # short pause between batches
-        print(f"Indexed {len(points)} document(s).")
+        return points
+
+    def _upsert_points(self, points: List[PointStruct]):
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=points
+        )
+        self._bump_version()
 
-    def smart_query(self, query_text: str, topk: int = 5, top_l: int = 5, use_late: bool = True, doc_search: bool = True) -> List[str]:
+    def add_data(
+        self,
+        json_file: str,
+        max_chunk_chars: int = 1500,
+        stream: bool = True,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        embed_batch_size: int = 32,
+        embed_workers: int = 2,
+        incremental: bool = True
+    ) -> dict:
         """
-        Hybrid query: first prefetch with dense (topk), then rerank with late embedding (ColBERT-style) and return top_l.
-        If use_late is False, does dense-only search. If True, does dense prefetch + late rerank.
-        If doc_search is True, also filter by fuzzy/substring in the document (case-insensitive) after reranking.
+        Add each object in a JSON file as its own document. If the file is a list, each item is a document.
+        If the file is a dict, each value is a document. If a document is too large, it is split into chunks.
+        For objectwise JSON (list of dicts), each dict is a document.
+        With stream=True the file is parsed incrementally and chunks flow through a bounded
+        chunk -> embed -> upsert pipeline, so memory stays flat regardless of file size. Upsert batch
+        sizes adapt to observed latency and errors. progress_callback receives the pipeline stats.
+        With incremental=True, chunks whose content hash matches the file's manifest are skipped, and
+        chunks from an earlier upload of the same file that no longer exist are deleted afterwards.
+        Returns the final stats.
         """
-        import re
-        dense_vec = get_dense_embedding(query_text)
-        late_vec = get_late_embedding(query_text)
-        # Vector search
-        if use_late:
-            from qdrant_client.models import Prefetch
-            results = self.client.query_points(
-                collection_name=self.collection_name,
-                prefetch=Prefetch(query=dense_vec, using="dense"),
-                query=late_vec,
-                using="late",
-                limit=topk,
-                with_payload=True
-            )
-        else:
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=dense_vec,
-                limit=topk,
-                with_payload=True,
-                with_vectors=False
-            )
-        # Normalize Qdrant results to always be a list of ScoredPoint-like objects
-        points_list = None
-        if isinstance(results, tuple) and len(results) == 2 and isinstance(results[1], list):
-            points_list = results[1]
-        elif isinstance(results, list):
-            points_list = results
-        elif hasattr(results, 'points') and isinstance(results.points, list):
-            points_list = results.points
-        else:
-            points_list = []
+        source = os.path.splitext(os.path.basename(json_file))[0]
+        manifest = self._load_manifest(source) if incremental else {}
+        seen_ids = set()
+        unchanged = 0
 
-        hits = []
-        for hit in points_list:
-            # Qdrant >=1.7 returns ScoredPoint objects
-            if hasattr(hit, 'id') and hasattr(hit, 'payload'):
-                payload = hit.payload if isinstance(hit.payload, dict) else {}
-                hits.append({"id": hit.id, "document": payload.get('document', '')})
-            # Defensive: handle tuple (id, payload) fallback
-            elif isinstance(hit, tuple) and len(hit) >= 2:
-                _id = hit[0]
-                _payload = hit[1] if isinstance(hit[1], dict) else {}
-                hits.append({"id": _id, "document": _payload.get('document', '')})
+        def changed_chunks():
+            nonlocal unchanged
+            for chunk_id, doc in iter_json_chunks(json_file, max_chunk_chars=max_chunk_chars, stream=stream):
+                point_id = to_valid_qdrant_id(chunk_id)
+                seen_ids.add(point_id)
+                if manifest.get(point_id) == self._content_hash(doc):
+                    unchanged += 1
+                    continue
+                yield chunk_id, doc
 
-        # After reranking, take top_l
-        hits = hits[:top_l]
+        print(f"Adding documents from {json_file} to the database...")
+        pipeline = IngestionPipeline(
+            embed_fn=lambda batch: self._embed_points(batch, source=source),
+            upsert_fn=self._upsert_points,
+            embed_batch_size=embed_batch_size,
+            embed_workers=embed_workers,
+            progress_callback=progress_callback
+        )
+        stats = pipeline.run(changed_chunks())
+        orphans = [point_id for point_id in manifest if point_id not in seen_ids]
+        self._delete_points(orphans)
+        stats["chunks_unchanged"] = unchanged
+        stats["chunks_deleted"] = len(orphans)
+        print(f"Indexed {stats['points_upserted']} document(s) in {stats['elapsed']:.1f}s "
+              f"({stats['docs_per_sec']:.1f} docs/sec, {stats['embed_failures']} embedding failure(s)); "
+              f"{unchanged} unchanged, {len(orphans)} removed.")
+        return stats
 
-        # Optionally filter by fuzzy/substring match if doc_search is True
-        if doc_search:
-            # Fuzzy: match any word in query_text (case-insensitive, partial match)
-            query_words = [w for w in re.split(r'\W+', query_text.lower()) if w]
-            def fuzzy_match(doc):
-                doc_l = doc.lower()
-                return any(qw in doc_l for qw in query_words)
+    def smart_query(self, query_text: str, topk: int = 5, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf") -> List[str]:
+        """
+        Hybrid query in a single Qdrant round trip: dense and sparse (BM25) candidates (topk each) are fused
+        with RRF (or DBSF), then reranked with the late embedding (ColBERT-style) and the top_l are returned.
+        If use_late is False, the fused ranking is returned without the late rerank.
+        If doc_search is True, documents containing a query keyword (full-text payload index) join the fusion.
+        Concurrent identical queries share one in-flight embedding + Qdrant round trip.
+        """
+        key = (query_text, topk, top_l, use_late, doc_search, fusion)
+        return list(self._flights.do(key, self._smart_query, query_text, topk, top_l, use_late, doc_search, fusion))
 
-            filtered_hits = [hit for hit in hits if fuzzy_match(hit['document'])]
-            # Now also get all docs in the collection that match the substring/fuzzy (outside top_l reranked)
-            doc_hits = []
-            next_offset = None
-            while True:
-                scroll_result = self.client.scroll(collection_name=self.collection_name, with_payload=True, offset=next_offset)
-                points = scroll_result[0]
-                next_offset = scroll_result[1]
-                for point in points:
-                    doc = point.payload.get('document', '') if hasattr(point, 'payload') else ''
-                    if fuzzy_match(doc):
-                        doc_hits.append({"id": point.id, "document": doc})
-                if not next_offset:
-                    break
-            # Merge and deduplicate by id, prioritizing reranked hits
-            seen_ids = set()
-            merged = []
-            for hit in filtered_hits:
-                if hit['id'] not in seen_ids:
-                    merged.append(hit)
-                    seen_ids.add(hit['id'])
-            for hit in doc_hits:
-                if hit['id'] not in seen_ids:
-                    merged.append(hit)
-                    seen_ids.add(hit['id'])
-            return [f"{hit['document']}" for hit in merged] if merged else []
-        else:
-            return [f"{hit['document']}" for hit in hits] if hits else []
+    def _smart_query(self, query_text: str, topk: int = 5, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf") -> List[str]:
+        dense_vec, late_vec, sparse_vec = get_query_embeddings(query_text, dense=True, late=use_late, sparse=True)
+        results = self.client.query_points(**build_hybrid_query(
+            self.collection_name,
+            dense_vec,
+            late_vec=late_vec if use_late else None,
+            sparse_raw=sparse_vec,
+            keyword_terms=query_terms(query_text) if doc_search else None,
+            topk=topk,
+            top_l=top_l,
+            fusion=fusion
+        ))
+        hits = hits_from_results(results)
+        return [f"{hit['document']}" for hit in hits] if hits else []
+
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(url=self._qdrant_url, api_key=self.api_key)
+        return self._async_client
+
+    async def asmart_query(self, query_text: str, topk: int = 5, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf", executor=None) -> List[str]:
+        """
+        Async smart_query: same search plan, issued through AsyncQdrantClient without blocking the event loop.
+        Concurrent identical queries on the same event loop are coalesced the same way. `executor` is
+        accepted for parity with ShortTermDatabase.asmart_query; nothing here blocks.
+        """
+        key = (query_text, topk, top_l, use_late, doc_search, fusion)
+        return list(await self._flights.ado(key, self._asmart_query, query_text, topk, top_l, use_late, doc_search, fusion))
+
+    async def _asmart_query(self, query_text: str, topk: int = 5, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf") -> List[str]:
+        dense_vec, late_vec, sparse_vec = await aget_query_embeddings(query_text, dense=True, late=use_late, sparse=True)
+        results = await self.async_client.query_points(**build_hybrid_query(
+            self.collection_name,
+            dense_vec,
+            late_vec=late_vec if use_late else None,
+            sparse_raw=sparse_vec,
+            keyword_terms=query_terms(query_text) if doc_search else None,
+            topk=topk,
+            top_l=top_l,
+            fusion=fusion
+        ))
+        hits = hits_from_results(results)
+        return [f"{hit['document']}" for hit in hits] if hits else []
 
     def save(self):
         pass  # Qdrant persists automatically
@@ -1,22 +1,37 @@
 import os
 import sys
+import asyncio
 import time
 import threading
 import json
 import numpy as np
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from typing import Callable, Dict, Optional, List
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import Distance, PointIdsList, VectorParams, PointStruct
 
 
 # Fix import errors for direct script execution
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from L_vecdB import LongTermDatabase
-from embedding import get_dense_embedding, to_valid_qdrant_id
+from embedding import check_vector_dimensions, get_dense_embedding, get_sparse_embeddings, to_valid_qdrant_id
+from keyword_index import ensure_text_index, query_terms
+from hybrid_search import (
+    SPARSE_VECTORS_CONFIG,
+    build_hybrid_query,
+    build_point_vectors,
+    ensure_sparse_vectors,
+    hits_from_results,
+    start_sparse_backfill
+)
+from fuzzy_index import FuzzyTermIndex
+from singleflight import SingleFlight
+from stream_pipeline import Stage, StreamingPipeline
 
 from tools.email_scraper import EmailScraper
+from tools.email_filter import default_filter
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,22 +47,62 @@ class ShortTermDatabase:
         count_threshold: int = None,  # Removed count threshold
         fetch_latest_email: Optional[Callable[[], Dict]] = None,
         poll_interval: float = 60,
+        summarize_emails: Optional[Callable[[List[Dict]], List[Optional[Dict]]]] = None,
+        summarize_workers: int = 2,
+        summarize_batch_size: int = 8,
+        embed_workers: int = 2,
+        embed_batch_size: int = 16,
+        upsert_batch_size: int = 32,
+        upsert_linger: float = 0.5,
+        ack_emails: Optional[Callable[[List[str]], None]] = None,
         qdrant_url: str = "https://df35413f-27c8-419d-aa89-4b3901514560.us-west-1-0.aws.cloud.qdrant.io",
         qdrant_api_key: Optional[str] = None
     ):
         self.collection_prefix = collection_prefix
         self.vector_size = vector_size
         self.client = QdrantClient(url=qdrant_url, api_key=os.getenv('QDRANT_API_KEY', qdrant_api_key))
+        # Used by asmart_query; created lazily inside the running event loop
+        self._qdrant_url = qdrant_url
+        self._qdrant_api_key = os.getenv('QDRANT_API_KEY', qdrant_api_key)
+        self._async_client: Optional[AsyncQdrantClient] = None
         self.collection_name = "short_rag"
         self._ensure_collection()  # Ensure multi-vector config
+        check_vector_dimensions(self.client, self.collection_name)
         self.time_threshold = timedelta(days=time_threshold_days)
         self.count_threshold = count_threshold  # Removed usage
         self.fetch_latest_email = fetch_latest_email
         self.poll_interval = poll_interval
+        # Worker pipeline: fetch -> filter -> summarize -> embed -> upsert (see _build_pipeline)
+        self.summarize_emails = summarize_emails
+        self.summarize_workers = summarize_workers
+        self.summarize_batch_size = summarize_batch_size
+        self.embed_workers = embed_workers
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_linger = upsert_linger
+        self._pipeline: Optional[StreamingPipeline] = None
+        # Called with the ids of emails that are done (upserted, or dropped by the filter on purpose),
+        # so the fetch side can stop redelivering them; emails that fail anywhere stay unacknowledged
+        self.ack_emails = ack_emails
+        self._point_email_ids: Dict[str, str] = {}
         self._last_flush_time = datetime.utcnow()
-        self._last_email_id: Optional[str] = None
-        self._stop_event = threading.Event()
-        self._thread: Optional[threading.Thread] = None
+        # Point ids of recently upserted emails, so an email delivered twice is only embedded once
+        self._recent_ids: "OrderedDict[str, None]" = OrderedDict()
+        # Upserts and flushes run on different threads; never interleave them
+        self._write_lock = threading.Lock()
+        # Points already rewritten with a refined summary; a late first-pass upsert must not undo that
+        self._refined_ids: "OrderedDict[str, None]" = OrderedDict()
+        # Bumped on every write so caches built on query results know when they are stale
+        self.data_version = 0
+        self._version_lock = threading.Lock()
+        # Concurrent identical smart_query calls share one in-flight search
+        self._flights = SingleFlight()
+        # Edit-distance-1 vocabulary for doc_search; loaded from the collection on first query
+        self._fuzzy_index = FuzzyTermIndex()
+        self._fuzzy_index_ready = False
+        self._fuzzy_index_lock = threading.Lock()
+        # Points stored before the sparse vector existed get one in the background
+        self._sparse_backfill = start_sparse_backfill(self.client, self.collection_name, get_sparse_embeddings, lambda _: self._bump_version())
 
     def _ensure_collection(self):
         from qdrant_client.models import MultiVectorConfig, MultiVectorComparator, HnswConfigDiff
@@ -65,24 +120,63 @@ class ShortTermDatabase:
                         ),
                         hnsw_config=HnswConfigDiff(m=0)
                     )
-                }
+                },
+                sparse_vectors_config=SPARSE_VECTORS_CONFIG
             )
+        else:
+            ensure_sparse_vectors(self.client, self.collection_name)
+        # Inverted index used by doc_search keyword lookups
+        ensure_text_index(self.client, self.collection_name)
+
+    def _bump_version(self):
+        with self._version_lock:
+            self.data_version += 1
+
+    def _ensure_fuzzy_index(self) -> FuzzyTermIndex:
+        """Builds the fuzzy vocabulary from the collection once; later changes are applied incrementally."""
+        if self._fuzzy_index_ready:
+            return self._fuzzy_index
+        with self._fuzzy_index_lock:
+            if not self._fuzzy_index_ready:
+                next_offset = None
+                while True:
+                    points, next_offset = self.client.scroll(
+                        collection_name=self.collection_name,
+                        limit=256,
+                        offset=next_offset,
+                        with_payload=True,
+                        with_vectors=False
+                    )
+                    for point in points:
+                        payload = point.payload if isinstance(point.payload, dict) else {}
+                        self._fuzzy_index.add_document(point.id, payload.get('document', ''))
+                    if not next_offset:
+                        break
+                self._fuzzy_index_ready = True
+        return self._fuzzy_index
 
     def _batch_get_embeddings(self, texts: List[str]):
-        # Multi-embedding: dense and late (ColBERT-style)
-        from embedding import get_dense_embedding, get_late_embedding
-        dense_embs = [get_dense_embedding(text) for text in texts]
-        late_embs = [get_late_embedding(text) for text in texts]
-        return list(zip(dense_embs, late_embs))
+        # Multi-embedding: dense, late (ColBERT-style) and sparse (BM25)
+        from embedding import get_dense_embeddings, get_late_embeddings, get_sparse_embeddings
+        dense_embs = get_dense_embeddings(texts)
+        late_embs = get_late_embeddings(texts)
+        sparse_embs = get_sparse_embeddings(texts)
+        return list(zip(dense_embs, late_embs, sparse_embs))
 
     # add_email removed: use add_emails_batch for all ingestion
 
-    def add_emails_batch(self, emails: List[Dict], batch_size: int = 4):
+    def add_emails_batch(self, emails: List[Dict], batch_size: int = 32):
         """
         Batch add multiple emails efficiently using upsert (multi-embedding).
         Uses unique IDs for each email. Skips emails on any exception. Does NOT store metadata in the payload.
         Assumes emails are already summarized if needed.
         """
+        points = self._embed_emails(emails)
+        for i in range(0, len(points), batch_size):
+            self._upsert_points(points[i:i+batch_size])
+
+    def _embed_emails(self, emails: List[Dict]) -> List[PointStruct]:
+        """Embeds a micro-batch of (summarized) emails into points, one embedding call per vector type."""
         ids, raws = [], []
         for email in emails:
             try:
@@ -95,25 +189,63 @@ class ShortTermDatabase:
                 logging.warning(f"Skipping email due to error (id={email.get('id', 'N/A')}): {e}")
                 continue
         if not ids:
-            return
-        emb_pairs = self._batch_get_embeddings(raws)
+            return []
+        emb_triples = self._batch_get_embeddings(raws)
         points = []
         for i, eid in enumerate(ids):
-            dense_vec, late_vec = emb_pairs[i]
+            dense_vec, late_vec, sparse_vec = emb_triples[i]
+            if dense_vec is None or late_vec is None:
+                logging.warning(f"Skipping email {eid}: embedding failed.")
+                continue
+            self._point_email_ids[to_valid_qdrant_id(eid)] = eid
             points.append(
                 PointStruct(
                     id=to_valid_qdrant_id(eid),
-                    vector={"dense": dense_vec, "late": late_vec},
+                    vector=build_point_vectors(dense_vec, late_vec, sparse_vec),
                     payload={"document": raws[i]}
                 )
             )
-        for i in range(0, len(points), batch_size):
-            batch = points[i:i+batch_size]
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=batch
-            )
-            time.sleep(1)  # short pause between batches
+        return points
+
+    def _upsert_points(self, points: List[PointStruct], refined: bool = False) -> List[PointStruct]:
+        incoming = points
+        with self._write_lock:
+            if not refined:
+                # A refined version already landed; this older first pass is done without being written
+                points = [point for point in points if point.id not in self._refined_ids]
+            if points:
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points
+                )
+                self._bump_version()
+            for point in points:
+                self._fuzzy_index.add_document(point.id, point.payload["document"])
+                self._recent_ids[point.id] = None
+                if refined:
+                    self._refined_ids[point.id] = None
+            while len(self._recent_ids) > 1024:
+                self._recent_ids.popitem(last=False)
+            while len(self._refined_ids) > 1024:
+                self._refined_ids.popitem(last=False)
+        self._ack([self._point_email_ids.pop(point.id, None) for point in incoming])
+        return points
+
+    def _ack(self, email_ids: List[Optional[str]]):
+        email_ids = [eid for eid in email_ids if eid is not None]
+        if not (self.ack_emails and email_ids):
+            return
+        try:
+            self.ack_emails(email_ids)
+        except Exception as e:
+            logging.warning(f"Acknowledging {len(email_ids)} email(s) failed: {e}")
+
+    def refine_email(self, email: Dict):
+        """
+        Replaces an ingested email's document (e.g. a quick local summary) with a better one, such as
+        the remote summary arriving later. Safe to call before the first version has been upserted.
+        """
+        self._upsert_points(self._embed_emails([email]), refined=True)
 
     def _maybe_flush(self):
         now = datetime.utcnow()
@@ -122,183 +254,170 @@ class ShortTermDatabase:
             self.flush_to_long_term()
 
     def flush_to_long_term(self):
+        with self._write_lock:
+            self._flush_to_long_term()
+
+    def _flush_to_long_term(self):
         count = self.client.count(collection_name=self.collection_name).count
         print(f"[FLUSH] Short-term DB size before flush: {count} emails")
         
-        # Fetch all points in the short-term collection
-        scroll = self.client.scroll(collection_name=self.collection_name, with_vectors=False, with_payload=False)
-        ids = [to_valid_qdrant_id(point.id) for point in scroll[0]]
+        # Fetch all points in the short-term collection, page by page
+        ids = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name, offset=offset, limit=256,
+                with_vectors=False, with_payload=False,
+            )
+            ids.extend(to_valid_qdrant_id(point.id) for point in points)
+            if offset is None:
+                break
         
         # Delete all points from the short-term collection
-        self.client.delete(collection_name=self.collection_name, points=ids)
+        if ids:
+            self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=ids))
+        for point_id in ids:
+            self._fuzzy_index.remove_document(point_id)
+        self._bump_version()
         
         self._last_flush_time = datetime.utcnow()
         count_after = self.client.count(collection_name=self.collection_name).count
         print(f"[FLUSH] Short-term DB size after flush: {count_after} emails")
 
-    def _worker_loop(self):
-        blocklist = [
-            "no-reply@accounts.google.com", "Security alert", "unstop", "linkedin", "kaggle", "Team Unstop",
-            "Canva", "noreply@github.com", "noreply", "feed, onrender, UptimeRobot"
-        ]
-        while not self._stop_event.is_set():
-            if self.fetch_latest_email:
-                emails = self.fetch_latest_email()
-                if not emails:
-                    logging.info("No new email found. Skipping this iteration.")
-                    self._maybe_flush()
-                    time.sleep(self.poll_interval)
-                    continue
-                # Always treat as a list for robustness
-                if isinstance(emails, dict):
-                    emails = [emails]
-                for email in emails:
-                    # New structure: 'from' and 'subject' are always present (may be empty string)
-                    subject = email.get('subject', '')
-                    from_ = email.get('from', '')
-                    # Block if any blocklist string is a substring (case-insensitive) of subject or from_
-                    if any(k.lower() in subject.lower() for k in blocklist) or any(k.lower() in from_.lower() for k in blocklist):
-                        logging.info(f"Blocked email from: {from_}, subject: {subject}")
-                    elif email['id'] != self._last_email_id:
-                        self._last_email_id = email['id']
-                        self.add_emails_batch([email])
-            self._maybe_flush()
-            count = self.client.count(collection_name=self.collection_name).count
-            print(f"Short-term DB size: {count} emails")
-            time.sleep(self.poll_interval)
+    def _filter_emails(self, emails: List[Dict]) -> List[Dict]:
+        kept = []
+        done = []
+        seen = set()
+        for email in emails:
+            # New structure: 'from' and 'subject' are always present (may be empty string)
+            subject = email.get('subject', '')
+            from_ = email.get('from', '')
+            # Shared compiled blocklist (case-insensitive); this stage is the only place it runs on live email
+            rule = default_filter.match(from_, subject)
+            if rule:
+                logging.info(f"Blocked email from: {from_}, subject: {subject} (rule: {rule})")
+                done.append(email['id'])
+            else:
+                # Only emails already upserted count as seen, so one that failed downstream is retried
+                point_id = to_valid_qdrant_id(email['id'])
+                with self._write_lock:
+                    duplicate = point_id in self._recent_ids
+                if not duplicate and point_id not in seen:
+                    seen.add(point_id)
+                    kept.append(email)
+                elif duplicate:
+                    done.append(email['id'])
+        self._ack(done)
+        return kept
+
+    def _summarize(self, emails: List[Dict]) -> List[Dict]:
+        return [email for email in self.summarize_emails(emails) if email]
+
+    def _build_pipeline(self) -> StreamingPipeline:
+        """
+        fetch -> filter -> summarize -> embed -> upsert. Summaries (remote, slow) run in batches on
+        several workers; embeddings are computed per micro-batch; upserts are grouped into one request per
+        upsert_batch_size points or upsert_linger seconds, whichever comes first. Without a
+        summarize_emails callback, fetch_latest_email is expected to return summarized emails.
+        """
+        stages = [Stage("filter", self._filter_emails, workers=1, batch_size=64)]
+        if self.summarize_emails:
+            # Batches are handed to summarize_emails whole, so a batch-aware summarizer can submit them at once
+            stages.append(Stage("summarize", self._summarize, workers=self.summarize_workers, batch_size=self.summarize_batch_size,
+                                linger=0.1, queue_size=self.summarize_batch_size * self.summarize_workers * 2))
+        stages.append(Stage("embed", self._embed_emails, workers=self.embed_workers,
+                            batch_size=self.embed_batch_size, linger=0.2, queue_size=self.embed_batch_size * 2))
+        stages.append(Stage("upsert", self._upsert_points, workers=1, batch_size=self.upsert_batch_size,
+                            linger=self.upsert_linger, queue_size=self.upsert_batch_size * 2, retries=3))
+        return StreamingPipeline(self.fetch_latest_email, stages, poll_interval=self.poll_interval, idle_fn=self._maybe_flush)
 
     def run_worker(self):
         if not self.fetch_latest_email:
             raise ValueError("fetch_latest_email callback not provided.")
-        if self._thread and self._thread.is_alive():
+        if self._pipeline and self._pipeline.running:
             return
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self._thread.start()
+        self._pipeline = self._build_pipeline()
+        self._pipeline.start()
 
     def stop_worker(self):
-        self._stop_event.set()
-        if self._thread:
-            self._thread.join()
+        if self._pipeline:
+            self._pipeline.stop()
 
-    def smart_query(self, query_text: str, topk: int = 20, top_l: int = 5, use_late: bool = True, doc_search: bool = True):
+    def pipeline_stats(self) -> Optional[dict]:
+        """Per-stage throughput of the ingestion worker, or None if it was never started."""
+        return self._pipeline.stats() if self._pipeline else None
+
+    def smart_query(self, query_text: str, topk: int = 20, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf"):
         """
-        Hybrid query: first prefetch with dense (topk), then rerank with late embedding (ColBERT-style) and return top_l.
-        If use_late is False, does dense-only search. If True, does dense prefetch + late rerank.
-        If doc_search is True, also filter by fuzzy/substring/keyword in the document (case-insensitive) after reranking, and concatenate all fuzzy/substring/keyword matches in the collection.
+        Hybrid query in a single Qdrant round trip: dense and sparse (BM25) candidates (topk each) are fused
+        with RRF (or DBSF), then reranked with the late embedding (ColBERT-style) and the top_l are returned.
+        If use_late is False, the fused ranking is returned without the late rerank.
+        If doc_search is True, documents containing a query keyword, or a token within one edit of one
+        (in-memory fuzzy vocabulary), join the fusion through the full-text payload index.
+        Concurrent identical queries share one in-flight embedding + Qdrant round trip.
         """
-        import re
-        from embedding import get_dense_embedding, get_late_embedding
-        dense_vec = get_dense_embedding(query_text)
-        late_vec = get_late_embedding(query_text)
-        # Vector search
-        if use_late:
-            from qdrant_client.models import Prefetch
-            results = self.client.query_points(
-                collection_name=self.collection_name,
-                prefetch=Prefetch(query=dense_vec, using="dense"),
-                query=late_vec,
-                using="late",
-                limit=topk,
-                with_payload=True
-            )
-        else:
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=dense_vec,
-                limit=topk,
-                with_payload=True,
-                with_vectors=False
-            )
+        key = (query_text, topk, top_l, use_late, doc_search, fusion)
+        return list(self._flights.do(key, self._smart_query, query_text, topk, top_l, use_late, doc_search, fusion))
 
-        # Normalize Qdrant results to always be a list of ScoredPoint-like objects
-        points_list = None
-        if isinstance(results, tuple) and len(results) == 2 and isinstance(results[1], list):
-            points_list = results[1]
-        elif isinstance(results, list):
-            points_list = results
-        elif hasattr(results, 'points') and isinstance(results.points, list):
-            points_list = results.points
-        else:
-            points_list = []
-
-        hits = []
-        for hit in points_list:
-            if hasattr(hit, 'id') and hasattr(hit, 'payload'):
-                payload = hit.payload if isinstance(hit.payload, dict) else {}
-                hits.append({"id": hit.id, "document": payload.get('document', '')})
-            elif isinstance(hit, tuple) and len(hit) >= 2:
-                _id = hit[0]
-                _payload = hit[1] if isinstance(hit[1], dict) else {}
-                hits.append({"id": _id, "document": _payload.get('document', '')})
-
-        # After reranking, take top_l
-        hits = hits[:top_l]
-
-        # Optionally filter by fuzzy/substring/keyword match if doc_search is True
+    def _smart_query(self, query_text: str, topk: int = 20, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf"):
+        from embedding import get_query_embeddings
+        dense_vec, late_vec, sparse_vec = get_query_embeddings(query_text, dense=True, late=use_late, sparse=True)
+        keyword_terms = None
         if doc_search:
-            query_words = set(re.findall(r"\w+", query_text.lower()))
-            def fuzzy_match(doc):
-                doc_text = doc.lower()
-                # Exact substring
-                if query_text.lower() in doc_text:
-                    return True
-                # Any query word present (partial/keyword match)
-                for word in query_words:
-                    if word and word in doc_text:
-                        return True
-                # Fuzzy: allow up to 1 char difference for each word (very basic)
-                for word in query_words:
-                    for token in re.findall(r"\w+", doc_text):
-                        if word and token and abs(len(word) - len(token)) <= 1 and sum(a != b for a, b in zip(word, token)) <= 1:
-                            return True
-                return False
-
-            filtered_hits = [hit for hit in hits if fuzzy_match(hit['document'])]
-            # Now also get all docs in the collection that match the substring/keyword/fuzzy (outside top_l reranked)
-            doc_hits = []
-            next_offset = None
-            while True:
-                scroll_result = self.client.scroll(collection_name=self.collection_name, with_payload=True, offset=next_offset)
-                points = scroll_result[0]
-                next_offset = scroll_result[1]
-                for point in points:
-                    doc = point.payload.get('document', '') if hasattr(point, 'payload') else ''
-                    if fuzzy_match(doc):
-                        doc_hits.append({"id": point.id, "document": doc})
-                if not next_offset:
-                    break
-            # Merge and deduplicate by id, prioritizing reranked hits
-            seen_ids = set()
-            merged = []
-            for hit in filtered_hits:
-                if hit['id'] not in seen_ids:
-                    merged.append(hit)
-                    seen_ids.add(hit['id'])
-            for hit in doc_hits:
-                if hit['id'] not in seen_ids:
-                    merged.append(hit)
-                    seen_ids.add(hit['id'])
-            return [f"{hit['id']} | {hit['document']}" for hit in merged] if merged else []
-        else:
-            return [f"{hit['id']} | {hit['document']}" for hit in hits] if hits else []
-
-    def close(self):
-        self.stop_worker()
-
-    def run_worker(self):
-        if not self.fetch_latest_email:
-            raise ValueError("fetch_latest_email callback not provided.")
-        if self._thread and self._thread.is_alive():
-            return
-        self._stop_event.clear()
-        self._thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self._thread.start()
+            query_words = query_terms(query_text)
+            fuzzy_tokens = {t for tokens in self._ensure_fuzzy_index().match(query_words).values() for t in tokens}
+            keyword_terms = query_words + sorted(fuzzy_tokens - set(query_words))
+        results = self.client.query_points(**build_hybrid_query(
+            self.collection_name,
+            dense_vec,
+            late_vec=late_vec if use_late else None,
+            sparse_raw=sparse_vec,
+            keyword_terms=keyword_terms,
+            topk=topk,
+            top_l=top_l,
+            fusion=fusion
+        ))
+        hits = hits_from_results(results)
+        return [f"{hit['id']} | {hit['document']}" for hit in hits] if hits else []
+
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        if self._async_client is None:
+            self._async_client = AsyncQdrantClient(url=self._qdrant_url, api_key=self._qdrant_api_key)
+        return self._async_client
+
+    async def asmart_query(self, query_text: str, topk: int = 20, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf", executor=None):
+        """
+        Async smart_query: same search plan, issued through AsyncQdrantClient without blocking the event loop.
+        Concurrent identical queries on the same event loop are coalesced the same way. `executor` is
+        the bounded pool for the remaining blocking work (the one-off fuzzy vocabulary load).
+        """
+        key = (query_text, topk, top_l, use_late, doc_search, fusion)
+        return list(await self._flights.ado(key, self._asmart_query, query_text, topk, top_l, use_late, doc_search, fusion, executor))
 
-    def stop_worker(self):
-        self._stop_event.set()
-        if self._thread:
-            self._thread.join()
+    async def _asmart_query(self, query_text: str, topk: int = 20, top_l: int = 5, use_late: bool = True, doc_search: bool = True, fusion: str = "rrf", executor=None):
+        from embedding import aget_query_embeddings
+        dense_vec, late_vec, sparse_vec = await aget_query_embeddings(query_text, dense=True, late=use_late, sparse=True)
+        keyword_terms = None
+        if doc_search:
+            query_words = query_terms(query_text)
+            if not self._fuzzy_index_ready:
+                # One-off vocabulary load scrolls the collection; keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(executor, self._ensure_fuzzy_index)
+            fuzzy_tokens = {t for tokens in self._fuzzy_index.match(query_words).values() for t in tokens}
+            keyword_terms = query_words + sorted(fuzzy_tokens - set(query_words))
+        results = await self.async_client.query_points(**build_hybrid_query(
+            self.collection_name,
+            dense_vec,
+            late_vec=late_vec if use_late else None,
+            sparse_raw=sparse_vec,
+            keyword_terms=keyword_terms,
+            topk=topk,
+            top_l=top_l,
+            fusion=fusion
+        ))
+        hits = hits_from_results(results)
+        return [f"{hit['id']} | {hit['document']}" for hit in hits] if hits else []
 
     # Remove smart_query (use query method instead)
 
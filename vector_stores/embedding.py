@@ -1,8 +1,24 @@
-from gradio_client import Client
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import os
 import uuid
 
-# Point to your deployed Gradio app
-client = Client("IotaCluster/embedding-model")
+from embedding_cache import EmbeddingCache
+from embedding_backends import get_backend
+from singleflight import SingleFlight
+
+# Remote Gradio Space by default; set EMBEDDING_BACKEND=local to embed in-process on CPU
+backend = get_backend()
+
+# Vectors are cached by (text hash, api_name, model version) so the backends never share entries
+cache = EmbeddingCache()
+
+# Identical texts requested at the same moment (many users asking the same question) share one backend call
+_flights = SingleFlight()
+
+# Long-lived pool for query-side embeddings so a single query's vectors are fetched in parallel
+_query_pool = ThreadPoolExecutor(max_workers=int(os.getenv("EMBEDDING_MAX_WORKERS", 4)))
 
 
 def get_dense_embedding(text: str):
@@ -20,23 +36,133 @@ def get_late_embedding(text: str):
     return _call_api(text, api_name="/embed_colbert")
 
 
+def get_dense_embeddings(texts: List[str], batch_size: int = None, max_workers: int = None):
+    """Batched /embed_dense: returns one embedding (or None) per input text, in order."""
+    return _call_api_batch(texts, "/embed_dense", batch_size, max_workers)
+
+
+def get_sparse_embeddings(texts: List[str], batch_size: int = None, max_workers: int = None):
+    """Batched /embed_sparse: returns one term-weight vector (or None) per input text, in order."""
+    return _call_api_batch(texts, "/embed_sparse", batch_size, max_workers)
+
+
+def get_late_embeddings(texts: List[str], batch_size: int = None, max_workers: int = None):
+    """Batched /embed_colbert: returns one multivector (or None) per input text, in order."""
+    return _call_api_batch(texts, "/embed_colbert", batch_size, max_workers)
+
+
+def get_query_embeddings(text: str, dense: bool = True, late: bool = False, sparse: bool = False):
+    """
+    Computes only the requested query embeddings, concurrently.
+    Returns a (dense, late, sparse) tuple with None for every kind that was not requested.
+    """
+    wanted = [
+        (api_name, flag) for api_name, flag in
+        (("/embed_dense", dense), ("/embed_colbert", late), ("/embed_sparse", sparse))
+    ]
+    futures = {api_name: _query_pool.submit(_call_api, text, api_name) for api_name, flag in wanted if flag}
+    return tuple(
+        futures[api_name].result() if api_name in futures else None
+        for api_name, _ in wanted
+    )
+
+
+async def aget_query_embeddings(text: str, dense: bool = True, late: bool = False, sparse: bool = False):
+    """
+    Async get_query_embeddings: the backends are blocking, so each requested embedding runs on the
+    bounded query pool and the event loop only awaits the results.
+    """
+    loop = asyncio.get_running_loop()
+    wanted = (("/embed_dense", dense), ("/embed_colbert", late), ("/embed_sparse", sparse))
+    futures = [
+        loop.run_in_executor(_query_pool, _call_api, text, api_name) if flag else None
+        for api_name, flag in wanted
+    ]
+    return tuple([
+        await fut if fut is not None else None
+        for fut in futures
+    ])
+
+
+def _call_api_batch(texts: List[str], api_name: str, batch_size: int = None, max_workers: int = None):
+    """
+    Embeds a list of texts, serving what it can from the cache and sending only the misses
+    to the backend in one call (concurrent single-text requests for the Gradio Space, ONNX
+    batches of `batch_size` for the local backend).
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    version = backend.version(api_name)
+    keys = [EmbeddingCache.make_key(text, api_name, version) for text in texts]
+    results = [cache.get(key) for key in keys]
+    # Embed each distinct missing text once, even if it repeats within the batch
+    missing = {}
+    for i, r in enumerate(results):
+        if r is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        positions = list(missing.values())
+        vectors = backend.embed([texts[p[0]] for p in positions], api_name, batch_size=batch_size, max_workers=max_workers)
+        for pos, vec in zip(positions, vectors):
+            cache.set(keys[pos[0]], vec)
+            for i in pos:
+                results[i] = vec
+    return results
+
+
 def _call_api(text: str, api_name: str):
-    try:
-        result = client.predict(
-            text=text,
-            api_name=api_name
-        )
-        # Normalize response: return the first value in the dict or the list itself
-        if isinstance(result, dict):
-            return next(iter(result.values()))
-        elif isinstance(result, list):
-            return result
-        else:
-            print(f"Unexpected response from {api_name!r}:", result)
-            return None
-    except Exception as e:
-        print(f"API request to {api_name!r} failed:", e)
-        return None
+    key = EmbeddingCache.make_key(text, api_name, backend.version(api_name))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    return _flights.do(key, _embed_and_cache, key, text, api_name)
+
+
+def _embed_and_cache(key: str, text: str, api_name: str):
+    result = backend.embed([text], api_name)[0]
+    cache.set(key, result)
+    return result
+
+
+# Collection vectors that must have the same size as the backend's output
+_COLLECTION_VECTORS = {"dense": "/embed_dense", "late": "/embed_colbert"}
+
+
+def embedding_dimension(api_name: str):
+    """Output size of `api_name` (per-token size for ColBERT), measured on a short probe text; None if it failed."""
+    vec = _call_api("dimension check", api_name)
+    if vec and api_name == "/embed_colbert":
+        vec = vec[0]
+    return len(vec) if vec else None
+
+
+def check_vector_dimensions(client, collection_name: str):
+    """
+    Raises if the active backend's vectors do not fit the collection, so a model with a different
+    output size fails at startup instead of on the first upsert or query. The probe goes through
+    the cache, so only the first start with a given model pays for it.
+    """
+    vectors = client.get_collection(collection_name).config.params.vectors
+    for vector_name, api_name in _COLLECTION_VECTORS.items():
+        if vector_name not in vectors:
+            continue
+        expected = vectors[vector_name].size
+        actual = embedding_dimension(api_name)
+        if actual is None:
+            print(f"Could not check {collection_name!r} {vector_name} vector size: the {backend.name} backend returned nothing")
+        elif actual != expected:
+            raise RuntimeError(
+                f"The {backend.name!r} embedding backend ({backend.version(api_name)}) returns {actual}-dim "
+                f"{vector_name} vectors but collection {collection_name!r} stores {expected}-dim ones. "
+                f"Configure a model with {expected}-dim output or use a new collection."
+            )
+
+
+def cache_stats():
+    """Hit/miss/eviction counters of the embedding cache, plus how many calls were coalesced."""
+    return {**cache.stats(), "coalesced": _flights.stats()["shared"]}
+
 
 def to_valid_qdrant_id(id_val):
     """Ensures the ID is a valid UUID (for Qdrant)."""
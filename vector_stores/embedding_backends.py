@@ -0,0 +1,183 @@
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+
+class EmbeddingBackend(ABC):
+    """
+    Interface for the three embedders used by the vector stores.
+    `api_name` is one of "/embed_dense", "/embed_sparse" or "/embed_colbert" (the Gradio
+    endpoint names are kept as the kind identifiers). `embed` returns one vector (or None)
+    per input text, in order.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def version(self, api_name: str) -> str:
+        """Identifies the model behind `api_name`; used to namespace cached vectors."""
+
+    @abstractmethod
+    def embed(self, texts: List[str], api_name: str, batch_size: int = None, max_workers: int = None) -> list:
+        """`batch_size` and `max_workers` are hints; each backend documents which it honours."""
+
+
+# Every request to the Space goes through this pool, so EMBEDDING_MAX_WORKERS caps the requests
+# in flight across all callers (ingestion, the short-term worker and query embedding together)
+_request_pool = ThreadPoolExecutor(max_workers=max(1, int(os.getenv("EMBEDDING_MAX_WORKERS", 4))), thread_name_prefix="gradio-embed")
+
+
+class GradioBackend(EmbeddingBackend):
+    """
+    Remote embedding via the IotaCluster/embedding-model Space. Its endpoints take one text per
+    request, so there is no request batching here: a list of texts is embedded by concurrent
+    single-text requests on the shared `_request_pool`.
+    """
+
+    name = "gradio"
+
+    def __init__(self, space: str = "IotaCluster/embedding-model"):
+        from gradio_client import Client
+        self.space = space
+        self.client = Client(space)
+
+    def version(self, api_name: str) -> str:
+        # Bump EMBEDDING_MODEL_VERSION whenever the Space's models change
+        return os.getenv("EMBEDDING_MODEL_VERSION", self.space)
+
+    def embed(self, texts: List[str], api_name: str, batch_size: int = None, max_workers: int = None) -> list:
+        """
+        One request per text, run on the process-wide `_request_pool`. `batch_size` and
+        `max_workers` are ignored: the Space has no multi-text endpoint, and concurrency is
+        bounded globally rather than per call.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        return list(_request_pool.map(lambda text: self._request(text, api_name), texts))
+
+    def _request(self, text: str, api_name: str):
+        try:
+            result = self.client.predict(
+                text=text,
+                api_name=api_name
+            )
+            # Normalize response: keep sparse {indices, values} dicts whole,
+            # otherwise return the first value in the dict or the list itself
+            if isinstance(result, dict):
+                if "indices" in result and "values" in result:
+                    return result
+                return next(iter(result.values()))
+            elif isinstance(result, list):
+                return result
+            else:
+                print(f"Unexpected response from {api_name!r}:", result)
+                return None
+        except Exception as e:
+            print(f"API request to {api_name!r} failed:", e)
+            return None
+
+
+_BM25_TOKEN = re.compile(r"\w+")
+
+
+def bm25_term_weights(text: str, k1: float = 1.2, b: float = 0.75, avg_len: float = 256.0) -> dict:
+    """
+    BM25 term-frequency weights keyed by the lowercased terms themselves, the same shape as the
+    Space's /embed_sparse output, so to_sparse_vector hashes both into one index space. IDF is
+    left to Qdrant (the sparse vector uses Modifier.IDF).
+    """
+    tokens = _BM25_TOKEN.findall(text.lower())
+    if not tokens:
+        return {}
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    norm = k1 * (1.0 - b + b * len(tokens) / avg_len)
+    return {term: tf * (k1 + 1.0) / (tf + norm) for term, tf in counts.items()}
+
+
+class LocalBackend(EmbeddingBackend):
+    """
+    In-process CPU embedding: dense and ColBERT vectors with fastembed (ONNX Runtime), sparse
+    vectors with bm25_term_weights. The default models produce 768-dim vectors like the Space,
+    which is what both collections store; they are only comparable with vectors the Space
+    already wrote if EMBEDDING_LOCAL_*_MODEL names the Space's own checkpoints.
+    Batch size is derived from the input lengths and the thread count from the number of cores.
+    """
+
+    name = "local"
+
+    MODELS = {
+        "/embed_dense": os.getenv("EMBEDDING_LOCAL_DENSE_MODEL", "BAAI/bge-base-en-v1.5"),
+        "/embed_colbert": os.getenv("EMBEDDING_LOCAL_LATE_MODEL", "jinaai/jina-colbert-v1-en"),
+    }
+    SPARSE_VERSION = "local:bm25-terms"
+
+    # Rough number of characters that fit one ONNX batch comfortably for each kind;
+    # ColBERT keeps one vector per token so its batches are kept smaller.
+    CHARS_PER_BATCH = {
+        "/embed_dense": 64 * 512,
+        "/embed_colbert": 16 * 512,
+    }
+
+    def __init__(self, threads: int = None):
+        try:
+            import fastembed  # noqa: F401
+        except ImportError as e:
+            # Not in requirements.txt: the default Gradio backend does not need ONNX Runtime
+            raise RuntimeError("EMBEDDING_BACKEND=local requires the 'fastembed' package: pip install fastembed") from e
+        self.threads = threads or int(os.getenv("EMBEDDING_LOCAL_THREADS", os.cpu_count() or 1))
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def version(self, api_name: str) -> str:
+        if api_name == "/embed_sparse":
+            return self.SPARSE_VERSION
+        return f"local:{self.MODELS[api_name]}"
+
+    def _model(self, api_name: str):
+        with self._lock:
+            if api_name not in self._models:
+                from fastembed import TextEmbedding, LateInteractionTextEmbedding
+                cls = {
+                    "/embed_dense": TextEmbedding,
+                    "/embed_colbert": LateInteractionTextEmbedding,
+                }[api_name]
+                self._models[api_name] = cls(model_name=self.MODELS[api_name], threads=self.threads)
+            return self._models[api_name]
+
+    def batch_size(self, texts: List[str], api_name: str) -> int:
+        avg_len = max(1, sum(len(t) for t in texts) // max(1, len(texts)))
+        return max(1, min(256, self.CHARS_PER_BATCH[api_name] // avg_len))
+
+    def embed(self, texts: List[str], api_name: str, batch_size: int = None, max_workers: int = None) -> list:
+        texts = list(texts)
+        if not texts:
+            return []
+        if api_name == "/embed_sparse":
+            return [bm25_term_weights(text) or None for text in texts]
+        try:
+            model = self._model(api_name)
+            vectors = model.embed(texts, batch_size=batch_size or self.batch_size(texts, api_name))
+            return [v.tolist() for v in vectors]
+        except Exception as e:
+            print(f"Local embedding for {api_name!r} failed:", e)
+            return [None] * len(texts)
+
+
+BACKENDS = {
+    GradioBackend.name: GradioBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+
+def get_backend(name: str = None) -> EmbeddingBackend:
+    """Builds the backend selected by `name` or the EMBEDDING_BACKEND env var (default: gradio)."""
+    name = (name or os.getenv("EMBEDDING_BACKEND", GradioBackend.name)).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
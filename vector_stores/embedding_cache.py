@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache for embedding vectors.
+    Entries are keyed by (sha256(text), api_name, model_version) and stored in a local SQLite
+    file, with an in-memory LRU in front of it. The on-disk store is bounded by `max_entries`;
+    when it grows past that, the least recently used rows are evicted. Reads (memory hits
+    included) refresh a row's last_access in batches, written before any eviction.
+    """
+
+    TOUCH_BATCH = 256
+
+    def __init__(
+        self,
+        path: str = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3"),
+        max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200000)),
+        memory_entries: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", 2048)),
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._touched = {}  # key -> last read time not yet written to disk
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(text: str, api_name: str, model_version: str = "") -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_version}:{api_name}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                self.hits += 1
+                return self._memory[key]
+            row = self._conn.execute("SELECT value FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touch(key)
+            value = json.loads(row[0])
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        if value is None:
+            return
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, value, last_access) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self._touched.pop(key, None)
+            if not exists:
+                self._size += 1
+            self._remember(key, value)
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+            self._conn.commit()
+
+    def _touch(self, key: str):
+        self._touched[key] = time.time()
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(t, k) for k, t in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, n: int):
+        # Drop the n least recently used rows (and any copies held in memory)
+        self._flush_touched()
+        rows = self._conn.execute(
+            "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?", (n,)
+        ).fetchall()
+        keys = [r[0] for r in rows]
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", [(k,) for k in keys])
+        for k in keys:
+            self._memory.pop(k, None)
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.evictions += len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "disk_entries": self._size,
+                "memory_entries": len(self._memory),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._memory.clear()
+            self._touched.clear()
+            self._size = 0
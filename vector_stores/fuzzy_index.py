@@ -0,0 +1,113 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+
+def _deletes(token: str) -> Set[str]:
+    """The token itself plus every string obtained by deleting one character."""
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b are at most one insertion, deletion or substitution apart."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class FuzzyTermIndex:
+    """
+    Vocabulary of document tokens with a SymSpell-style deletion-neighbourhood table for
+    edit-distance-1 lookups. Every token is stored under itself and each of its single-character
+    deletions, so finding the vocabulary tokens within one edit of a query word only takes a
+    hash probe per deletion of the query word instead of a pass over every document.
+    """
+
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, min_token_len: int = 3):
+        self.min_token_len = min_token_len
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Set[str]] = defaultdict(set)   # token -> doc ids
+        self._neighbours: Dict[str, Set[str]] = defaultdict(set)  # deletion variant -> tokens
+        self._doc_tokens: Dict[str, Set[str]] = {}                # doc id -> tokens
+
+    def tokenize(self, text: str) -> Set[str]:
+        return {t for t in self.TOKEN_RE.findall(text.lower()) if len(t) >= self.min_token_len}
+
+    def add_document(self, doc_id, text: str):
+        doc_id = str(doc_id)
+        with self._lock:
+            self._remove(doc_id)
+            tokens = self.tokenize(text)
+            self._doc_tokens[doc_id] = tokens
+            for token in tokens:
+                if not self._postings[token]:
+                    for variant in _deletes(token):
+                        self._neighbours[variant].add(token)
+                self._postings[token].add(doc_id)
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            self._remove(str(doc_id))
+
+    def _remove(self, doc_id: str):
+        for token in self._doc_tokens.pop(doc_id, ()):
+            docs = self._postings.get(token)
+            if docs is None:
+                continue
+            docs.discard(doc_id)
+            if not docs:
+                # Last document using this token: drop it from the vocabulary
+                del self._postings[token]
+                for variant in _deletes(token):
+                    tokens = self._neighbours.get(variant)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._neighbours[variant]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._neighbours.clear()
+            self._doc_tokens.clear()
+
+    def similar_tokens(self, word: str) -> Set[str]:
+        """Vocabulary tokens within one edit of `word`."""
+        word = word.lower()
+        if len(word) < self.min_token_len:
+            return set()
+        with self._lock:
+            candidates = set()
+            for variant in _deletes(word):
+                candidates |= self._neighbours.get(variant, set())
+        return {t for t in candidates if _within_one_edit(word, t)}
+
+    def match(self, words: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Fuzzy-matches each query word against the vocabulary.
+        Returns {doc_id: [matched tokens]} for every document containing a matched token.
+        """
+        matched: Dict[str, Set[str]] = defaultdict(set)
+        for word in words:
+            for token in self.similar_tokens(word):
+                with self._lock:
+                    docs = set(self._postings.get(token, ()))
+                for doc_id in docs:
+                    matched[doc_id].add(token)
+        return {doc_id: sorted(tokens) for doc_id, tokens in matched.items()}
+
+    def __len__(self):
+        return len(self._doc_tokens)
@@ -0,0 +1,181 @@
+import zlib
+import threading
+from typing import Callable, Dict, List, Optional
+from qdrant_client.models import (
+    Filter,
+    Fusion,
+    FusionQuery,
+    HasVectorCondition,
+    Modifier,
+    PointVectors,
+    Prefetch,
+    SparseVector,
+    SparseVectorConfig,
+    SparseVectorNameConfig,
+    SparseVectorParams
+)
+
+from keyword_index import keyword_filter
+
+# Sparse (BM25) vector config shared by both collections; IDF is applied server-side
+SPARSE_VECTORS_CONFIG = {"sparse": SparseVectorParams(modifier=Modifier.IDF)}
+
+FUSIONS = {"rrf": Fusion.RRF, "dbsf": Fusion.DBSF}
+
+
+def ensure_sparse_vectors(client, collection_name: str) -> bool:
+    """Adds the sparse vector to collections created before hybrid search existed; True if it was added."""
+    params = client.get_collection(collection_name).config.params
+    if "sparse" in (params.sparse_vectors or {}):
+        return False
+    # update_collection can only reconfigure sparse vectors that already exist; a new one needs create_vector_name
+    client.create_vector_name(
+        collection_name=collection_name,
+        vector_name="sparse",
+        vector_name_config=SparseVectorNameConfig(sparse=SparseVectorConfig(modifier=Modifier.IDF))
+    )
+    return True
+
+
+def backfill_sparse_vectors(
+    client,
+    collection_name: str,
+    embed_fn: Callable[[List[str]], list],
+    batch_size: int = 64
+) -> int:
+    """
+    Computes sparse vectors for points stored without one (ingested before hybrid search existed):
+    incremental re-ingest skips unchanged chunks, so they would otherwise never get one. Only
+    points missing the vector are scrolled, so re-running it (e.g. after an interrupted run) is
+    cheap. Returns the number of points updated.
+    """
+    missing = Filter(must_not=[HasVectorCondition(has_vector="sparse")])
+    updated = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=missing,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["document"],
+            with_vectors=False
+        )
+        points = [p for p in points if isinstance(p.payload, dict) and p.payload.get("document")]
+        if points:
+            raws = embed_fn([p.payload["document"] for p in points])
+            vectors = [
+                PointVectors(id=p.id, vector={"sparse": sparse_vec})
+                for p, sparse_vec in ((p, to_sparse_vector(raw)) for p, raw in zip(points, raws))
+                if sparse_vec is not None
+            ]
+            if vectors:
+                client.update_vectors(collection_name=collection_name, points=vectors)
+                updated += len(vectors)
+        if not offset:
+            return updated
+
+
+def start_sparse_backfill(client, collection_name: str, embed_fn: Callable[[List[str]], list], on_updated: Callable[[int], None] = None):
+    """Runs backfill_sparse_vectors on a daemon thread so startup is not blocked by re-embedding."""
+    def run():
+        try:
+            updated = backfill_sparse_vectors(client, collection_name, embed_fn)
+        except Exception as e:
+            print(f"[SPARSE BACKFILL] {collection_name} failed: {e}")
+            return
+        if updated:
+            print(f"[SPARSE BACKFILL] Added sparse vectors to {updated} point(s) in {collection_name}")
+            if on_updated:
+                on_updated(updated)
+
+    thread = threading.Thread(target=run, name=f"sparse-backfill-{collection_name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def to_sparse_vector(raw) -> Optional[SparseVector]:
+    """
+    Normalizes a BM25 embedding into a Qdrant SparseVector. Accepts {"indices", "values"},
+    a {term_or_id: weight} mapping or a list of (term_or_id, weight) pairs; string terms are
+    hashed to stable integer ids so documents and queries agree.
+    """
+    if not raw:
+        return None
+    if isinstance(raw, dict) and "indices" in raw and "values" in raw:
+        pairs = zip(raw["indices"], raw["values"])
+    elif isinstance(raw, dict):
+        pairs = raw.items()
+    elif isinstance(raw, list) and all(isinstance(p, (list, tuple)) and len(p) == 2 for p in raw):
+        pairs = raw
+    else:
+        return None
+    weights: Dict[int, float] = {}
+    for term, weight in pairs:
+        if isinstance(term, str) and not term.isdigit():
+            idx = zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+        else:
+            idx = int(term)
+        weights[idx] = weights.get(idx, 0.0) + float(weight)
+    if not weights:
+        return None
+    return SparseVector(indices=list(weights.keys()), values=list(weights.values()))
+
+
+def build_point_vectors(dense_vec, late_vec, sparse_raw=None) -> dict:
+    vectors = {"dense": dense_vec, "late": late_vec}
+    sparse_vec = to_sparse_vector(sparse_raw)
+    if sparse_vec is not None:
+        vectors["sparse"] = sparse_vec
+    return vectors
+
+
+def build_hybrid_query(
+    collection_name: str,
+    dense_vec,
+    late_vec=None,
+    sparse_raw=None,
+    keyword_terms: Optional[List[str]] = None,
+    topk: int = 20,
+    top_l: int = 5,
+    fusion: str = "rrf"
+) -> dict:
+    """
+    Keyword arguments for a single `query_points` call:
+    dense, sparse and (optionally) keyword-filtered dense candidates are fused with RRF/DBSF,
+    then reranked by the `late` multivector when one is given.
+    """
+    prefetch = [Prefetch(query=dense_vec, using="dense", limit=topk)]
+    sparse_vec = to_sparse_vector(sparse_raw)
+    if sparse_vec is not None:
+        prefetch.append(Prefetch(query=sparse_vec, using="sparse", limit=topk))
+    if keyword_terms:
+        # Keyword matches are resolved by the full-text payload index inside the same request
+        prefetch.append(Prefetch(query=dense_vec, using="dense", filter=keyword_filter(keyword_terms), limit=topk))
+    fused = FusionQuery(fusion=FUSIONS[fusion.lower()])
+    if late_vec is not None:
+        return dict(
+            collection_name=collection_name,
+            prefetch=Prefetch(prefetch=prefetch, query=fused, limit=topk),
+            query=late_vec,
+            using="late",
+            limit=top_l,
+            with_payload=True
+        )
+    return dict(
+        collection_name=collection_name,
+        prefetch=prefetch,
+        query=fused,
+        limit=top_l,
+        with_payload=True
+    )
+
+
+def hits_from_results(results) -> List[Dict]:
+    """Normalizes a query_points response to [{"id", "document"}]."""
+    points_list = results.points if hasattr(results, 'points') else (results or [])
+    hits = []
+    for hit in points_list:
+        payload = hit.payload if isinstance(hit.payload, dict) else {}
+        hits.append({"id": hit.id, "document": payload.get('document', '')})
+    return hits
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import ijson
+
+
+def _chunk_document(doc_id: str, doc_json: str, max_chunk_chars: int) -> Iterator[Tuple[str, str]]:
+    if len(doc_json) > max_chunk_chars:
+        n_chunks = (len(doc_json) + max_chunk_chars - 1) // max_chunk_chars
+        for j in range(n_chunks):
+            yield f"{doc_id}_{j}", doc_json[j * max_chunk_chars : (j + 1) * max_chunk_chars]
+    else:
+        yield doc_id, doc_json
+
+
+def _first_char(json_file: str) -> str:
+    with open(json_file, 'r', encoding='utf-8') as f:
+        while True:
+            c = f.read(1)
+            if not c or not c.isspace():
+                return c
+
+
+def _is_list_of_objects(json_file: str) -> bool:
+    """Whether every item of a top-level JSON list is an object; stops at the first one that is not."""
+    with open(json_file, 'rb') as f:
+        for prefix, event, _ in ijson.parse(f):
+            if prefix == 'item' and event not in ('start_map', 'map_key', 'end_map'):
+                return False
+    return True
+
+
+def iter_json_chunks(json_file: str, max_chunk_chars: int = 1500, stream: bool = True) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (chunk_id, text) for every document in a JSON file. A top-level list of objects gives
+    one document per item, a dict one per value, anything else (including a list that holds
+    non-objects) a single document; documents longer than max_chunk_chars are split into chunks.
+    Both modes yield the same sequence. With stream=True the file is parsed
+    incrementally (ijson), so memory does not grow with file size.
+    """
+    file_prefix = os.path.splitext(os.path.basename(json_file))[0]
+    if not stream:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list) and all(isinstance(item, dict) for item in data):
+            items = enumerate(data)
+        elif isinstance(data, dict):
+            items = data.items()
+        else:
+            items = [(0, data)]
+        for key, value in items:
+            yield from _chunk_document(f"{file_prefix}_{key}", json.dumps(value, ensure_ascii=False), max_chunk_chars)
+        return
+
+    first = _first_char(json_file)
+    with open(json_file, 'rb') as f:
+        if first == '[' and _is_list_of_objects(json_file):
+            items = enumerate(ijson.items(f, 'item', use_float=True))
+        elif first == '{':
+            items = ijson.kvitems(f, '', use_float=True)
+        else:
+            items = [(0, json.load(f))]
+        for key, value in items:
+            yield from _chunk_document(f"{file_prefix}_{key}", json.dumps(value, ensure_ascii=False), max_chunk_chars)
+
+
+class AdaptiveBatchSizer:
+    """
+    Additive-increase / multiplicative-decrease upsert batch size: grows while requests finish
+    under target_latency, halves on slow requests or errors.
+    """
+
+    def __init__(self, initial: int = 16, minimum: int = 1, maximum: int = 256, target_latency: float = 2.0):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+
+    def record(self, latency: float, ok: bool = True):
+        if not ok or latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        else:
+            self.size = min(self.maximum, self.size + max(1, self.size // 4))
+
+
+class IngestionPipeline:
+    """
+    Bounded producer/consumer pipeline: chunk -> embed -> upsert.
+    `embed_fn(batch)` turns a list of (chunk_id, text) into Qdrant points (None entries are
+    skipped); `upsert_fn(points)` writes them. Stages are connected by bounded queues, so only a
+    few batches are ever held in memory. Upserts are retried with backoff and sized by an
+    AdaptiveBatchSizer. `progress_callback(stats)` is called at most every `progress_every` seconds
+    and once at the end, with stats["finished"] set: by then every point is written, so that call
+    can no longer abort anything.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[Tuple[str, str]]], list],
+        upsert_fn: Callable[[list], None],
+        embed_batch_size: int = 32,
+        embed_workers: int = 2,
+        queue_size: int = 4,
+        batch_sizer: Optional[AdaptiveBatchSizer] = None,
+        max_retries: int = 5,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        progress_every: float = 1.0
+    ):
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers
+        self.batch_sizer = batch_sizer or AdaptiveBatchSizer()
+        self.max_retries = max_retries
+        self.progress_callback = progress_callback
+        self.progress_every = progress_every
+        self._embed_q = queue.Queue(maxsize=queue_size)
+        self._upsert_q = queue.Queue(maxsize=queue_size)
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._last_progress = 0.0
+        self.stats = {
+            "chunks_read": 0,
+            "chunks_embedded": 0,
+            "embed_failures": 0,
+            "points_upserted": 0,
+            "upsert_batches": 0,
+            "upsert_retries": 0,
+            "upsert_batch_size": self.batch_sizer.size,
+            "elapsed": 0.0,
+            "docs_per_sec": 0.0,
+            "finished": False,
+        }
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._failed.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fail(self, e: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = e
+        self._failed.set()
+
+    def _produce(self, chunks: Iterable[Tuple[str, str]]):
+        try:
+            batch = []
+            for chunk in chunks:
+                if self._failed.is_set():
+                    return
+                batch.append(chunk)
+                with self._lock:
+                    self.stats["chunks_read"] += 1
+                if len(batch) >= self.embed_batch_size:
+                    if not self._put(self._embed_q, batch):
+                        return
+                    batch = []
+            if batch:
+                self._put(self._embed_q, batch)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(self.embed_workers):
+                self._put(self._embed_q, self._DONE)
+
+    def _embed(self):
+        try:
+            while not self._failed.is_set():
+                try:
+                    batch = self._embed_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if batch is self._DONE:
+                    return
+                points = self.embed_fn(batch)
+                kept = [p for p in points if p is not None]
+                with self._lock:
+                    self.stats["chunks_embedded"] += len(kept)
+                    self.stats["embed_failures"] += len(points) - len(kept)
+                if kept and not self._put(self._upsert_q, kept):
+                    return
+        except BaseException as e:
+            self._fail(e)
+
+    def _upsert_with_retry(self, points: list):
+        start = 0
+        attempt = 0
+        while start < len(points):
+            size = self.batch_sizer.size
+            batch = points[start:start + size]
+            t0 = time.monotonic()
+            try:
+                self.upsert_fn(batch)
+            except Exception as e:
+                self.batch_sizer.record(time.monotonic() - t0, ok=False)
+                attempt += 1
+                with self._lock:
+                    self.stats["upsert_retries"] += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"Upsert of {len(batch)} point(s) failed ({e}); retrying with batch size {self.batch_sizer.size}")
+                time.sleep(min(30.0, 0.5 * 2 ** (attempt - 1)))
+                continue
+            self.batch_sizer.record(time.monotonic() - t0, ok=True)
+            attempt = 0
+            start += len(batch)
+            with self._lock:
+                self.stats["points_upserted"] += len(batch)
+                self.stats["upsert_batches"] += 1
+                self.stats["upsert_batch_size"] = self.batch_sizer.size
+
+    def _report(self, started: float, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            self.stats["elapsed"] = now - started
+            self.stats["docs_per_sec"] = self.stats["points_upserted"] / max(1e-9, self.stats["elapsed"])
+            snapshot = dict(self.stats)
+        if self.progress_callback and (force or now - self._last_progress >= self.progress_every):
+            self._last_progress = now
+            self.progress_callback(snapshot)
+
+    def run(self, chunks: Iterable[Tuple[str, str]]) -> dict:
+        """Runs the pipeline to completion and returns the final stats; re-raises the first stage error."""
+        started = time.monotonic()
+        producer = threading.Thread(target=self._produce, args=(chunks,), daemon=True)
+        embedders = [threading.Thread(target=self._embed, daemon=True) for _ in range(self.embed_workers)]
+        producer.start()
+        for t in embedders:
+            t.start()
+
+        def close_upsert_queue():
+            for t in embedders:
+                t.join()
+            self._put(self._upsert_q, self._DONE)
+
+        closer = threading.Thread(target=close_upsert_queue, daemon=True)
+        closer.start()
+
+        pending = []
+        try:
+            while not self._failed.is_set():
+                try:
+                    item = self._upsert_q.get(timeout=0.5)
+                except queue.Empty:
+                    self._report(started)
+                    continue
+                if item is self._DONE:
+                    break
+                pending.extend(item)
+                if len(pending) >= self.batch_sizer.size:
+                    self._upsert_with_retry(pending)
+                    pending = []
+                self._report(started)
+            if pending and not self._failed.is_set():
+                self._upsert_with_retry(pending)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            producer.join()
+            closer.join()
+        if self._error is not None:
+            raise self._error
+        with self._lock:
+            self.stats["finished"] = True
+        self._report(started, force=True)
+        return dict(self.stats)
@@ -0,0 +1,57 @@
+import re
+from typing import List
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    FieldCondition,
+    Filter,
+    MatchText,
+    TextIndexParams,
+    TextIndexType,
+    TokenizerType
+)
+
+# Full-text (inverted) index over the "document" payload. The prefix tokenizer indexes every
+# prefix of every word, so a query word also matches longer words it starts ("mess" -> "message").
+DOCUMENT_TEXT_INDEX = TextIndexParams(
+    type=TextIndexType.TEXT,
+    tokenizer=TokenizerType.PREFIX,
+    min_token_len=2,
+    max_token_len=20,
+    lowercase=True
+)
+
+
+def ensure_text_index(client: QdrantClient, collection_name: str, field_name: str = "document"):
+    """Creates the full-text payload index on `field_name` if the collection does not have it yet."""
+    schema = client.get_collection(collection_name).payload_schema or {}
+    if field_name not in schema:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=DOCUMENT_TEXT_INDEX
+        )
+
+
+# With the prefix tokenizer these would match nearly every document and make the keyword
+# prefetch close to unfiltered, so they never become keyword terms
+MIN_QUERY_TERM_LEN = 3
+QUERY_STOPWORDS = frozenset(
+    "the and are was were for from with that this these those what which who whom whose when where why how "
+    "about into onto over under than then there their them they you your yours our ours his her hers its "
+    "has have had does did done not but can could would should will shall may might must any all some "
+    "tell give show find list please know want need get got also just more most much many very".split()
+)
+
+
+def query_terms(query_text: str) -> List[str]:
+    """Lowercased query keywords, in order, without duplicates, stopwords or tokens shorter than MIN_QUERY_TERM_LEN."""
+    return list(dict.fromkeys(
+        w for w in re.split(r'\W+', query_text.lower())
+        if len(w) >= MIN_QUERY_TERM_LEN and w not in QUERY_STOPWORDS
+    ))
+
+
+def keyword_filter(terms: List[str], field_name: str = "document") -> Filter:
+    """Matches points whose `field_name` contains any of `terms`."""
+    return Filter(should=[FieldCondition(key=field_name, match=MatchText(text=t)) for t in terms])
+
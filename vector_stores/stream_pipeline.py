@@ -0,0 +1,233 @@
+import time
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional
+
+
+class Stage:
+    """
+    One stage of a StreamingPipeline. `workers` threads each take a micro-batch from the stage's
+    bounded input queue (up to `batch_size` items, waiting at most `linger` seconds for the batch
+    to fill) and call `fn(batch)`, which returns the items to pass on (fewer items = dropped).
+    A failing batch is retried `retries` times with backoff, then dropped and counted.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[list], list],
+        workers: int = 1,
+        batch_size: int = 1,
+        linger: float = 0.0,
+        queue_size: int = 64,
+        retries: int = 0
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retries = retries
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._alive = 0
+        self.items_in = 0
+        self.items_out = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def _record(self, n_in: int, n_out: int, busy: float, ok: bool):
+        with self._lock:
+            self.items_in += n_in
+            self.items_out += n_out
+            self.batches += 1
+            self.busy_seconds += busy
+            if ok:
+                self.dropped += n_in - n_out
+            else:
+                self.errors += n_in
+
+    def stats(self, elapsed: float) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self.queue.qsize(),
+                "in": self.items_in,
+                "out": self.items_out,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "batches": self.batches,
+                "avg_batch_seconds": self.busy_seconds / self.batches if self.batches else 0.0,
+                # Items per second of worker time (capacity) and per second of wall time (achieved)
+                "items_per_busy_second": self.items_in / self.busy_seconds if self.busy_seconds else 0.0,
+                "items_per_second": self.items_out / max(1e-9, elapsed),
+            }
+
+
+class StreamingPipeline:
+    """
+    Long-running pipeline: a source thread polls `source()` for new items and feeds them through
+    a chain of Stages connected by bounded queues. A full queue blocks the stage before it, so a
+    slow stage throttles everything upstream (down to the source) instead of piling items up in
+    memory. While the source has nothing, `idle_fn()` is called and the source waits
+    `poll_interval` seconds; as soon as it returns items it is polled again immediately, so bursts
+    flow straight through. stop() drains the items already fetched before returning.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        source: Callable[[], Optional[list]],
+        stages: List[Stage],
+        poll_interval: float = 60,
+        idle_fn: Optional[Callable[[], None]] = None
+    ):
+        if not stages:
+            raise ValueError("StreamingPipeline needs at least one stage.")
+        self.source = source
+        self.stages = stages
+        self.poll_interval = poll_interval
+        self.idle_fn = idle_fn
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started = None
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.fetched = 0
+        self.fetch_errors = 0
+        self.fetch_seconds = 0.0
+
+    def _source_loop(self):
+        first = self.stages[0]
+        try:
+            while not self._stop_event.is_set():
+                t0 = time.monotonic()
+                try:
+                    items = self.source()
+                    ok = True
+                except Exception as e:
+                    logging.warning(f"Pipeline source failed: {e}")
+                    items, ok = None, False
+                if isinstance(items, dict):
+                    items = [items]
+                items = items or []
+                with self._lock:
+                    self.polls += 1
+                    self.fetched += len(items)
+                    self.fetch_seconds += time.monotonic() - t0
+                    if not ok:
+                        self.fetch_errors += 1
+                for item in items:
+                    first.queue.put(item)  # blocks while the pipeline is saturated (backpressure)
+                if items:
+                    continue
+                if self.idle_fn:
+                    try:
+                        self.idle_fn()
+                    except Exception as e:
+                        logging.warning(f"Pipeline idle callback failed: {e}")
+                self._stop_event.wait(self.poll_interval)
+        finally:
+            for _ in range(first.workers):
+                first.queue.put(self._DONE)
+
+    def _next_batch(self, stage: Stage):
+        """Blocks for the first item, then fills the batch for at most stage.linger seconds."""
+        item = stage.queue.get()
+        if item is self._DONE:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + stage.linger
+        while len(batch) < stage.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                item = stage.queue.get(timeout=remaining) if remaining > 0 else stage.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _stage_loop(self, index: int):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            done = False
+            while not done:
+                batch, done = self._next_batch(stage)
+                if not batch:
+                    continue
+                attempt = 0
+                while True:
+                    t0 = time.monotonic()
+                    try:
+                        out = stage.fn(batch) or []
+                    except Exception as e:
+                        attempt += 1
+                        if attempt <= stage.retries:
+                            logging.warning(f"Stage {stage.name} failed on {len(batch)} item(s) ({e}); retry {attempt}/{stage.retries}")
+                            time.sleep(min(30.0, 0.5 * 2 ** (attempt - 1)))
+                            continue
+                        logging.error(f"Stage {stage.name} dropped {len(batch)} item(s): {e}")
+                        stage._record(len(batch), 0, time.monotonic() - t0, ok=False)
+                        break
+                    stage._record(len(batch), len(out), time.monotonic() - t0, ok=True)
+                    if downstream is not None:
+                        for item in out:
+                            downstream.queue.put(item)
+                    break
+        finally:
+            with stage._lock:
+                stage._alive -= 1
+                last = stage._alive == 0
+            # The last worker out tells the next stage that no more items are coming
+            if last and downstream is not None:
+                for _ in range(downstream.workers):
+                    downstream.queue.put(self._DONE)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._started = time.monotonic()
+        self._threads = [threading.Thread(target=self._source_loop, name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            stage._alive = stage.workers
+            for i in range(stage.workers):
+                self._threads.append(
+                    threading.Thread(target=self._stage_loop, args=(index,), name=f"pipeline-{stage.name}-{i}", daemon=True)
+                )
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops polling the source, lets the in-flight items finish and waits for every stage."""
+        self._stop_event.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        with self._lock:
+            source = {
+                "polls": self.polls,
+                "out": self.fetched,
+                "errors": self.fetch_errors,
+                "avg_poll_seconds": self.fetch_seconds / self.polls if self.polls else 0.0,
+                "items_per_second": self.fetched / max(1e-9, elapsed),
+            }
+        return {
+            "running": self.running,
+            "elapsed": elapsed,
+            "stages": dict([("fetch", source)] + [(s.name, s.stats(elapsed)) for s in self.stages]),
+        }